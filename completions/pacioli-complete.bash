@@ -1,28 +1,121 @@
-_pacioli_completion() {
-    local IFS=$'\n'
-    local response
-
-    response=$(env COMP_WORDS="${COMP_WORDS[*]}" COMP_CWORD=$COMP_CWORD _PACIOLI_COMPLETE=bash_complete $1)
-
-    for completion in $response; do
-        IFS=',' read type value <<< "$completion"
-
-        if [[ $type == 'dir' ]]; then
-            COMPREPLY=()
-            compopt -o dirnames
-        elif [[ $type == 'file' ]]; then
-            COMPREPLY=()
-            compopt -o default
-        elif [[ $type == 'plain' ]]; then
-            COMPREPLY+=($value)
-        fi
-    done
+# Bash completion for pacioli.
+#
+# Generated from the click commands by `pacioli completion bash`; run it
+# again rather than editing this file.  Periods and accounts are read from
+# the cache pacioli refreshes whenever the journal changes, so completing
+# never starts pacioli or runs ledger.
 
+_pacioli_commands="balance-sheet income-statement cash-flow-statement general-ledger all consolidate pdf watch serve daemon warm check completion"
+
+_pacioli_command_options() {
+    case "$1" in
+        balance-sheet) echo "--end-date -e --pdf --format --help" ;;
+        income-statement) echo "--begin-date -b --end-date -e --month -m --period -p --pdf --format --help" ;;
+        cash-flow-statement) echo "--begin-date -b --end-date -e --month -m --period -p --pdf --format --help" ;;
+        general-ledger) echo "--begin-date -b --end-date -e --period -p --pdf --help" ;;
+        all) echo "--begin-date -b --end-date -e --period -p --strict --pdf --help" ;;
+        consolidate) echo "--begin-date -b --end-date -e --period -p --entity --by-entity --format --strict --pdf --help" ;;
+        pdf) echo "--workers -j --force --help" ;;
+        watch) echo "--report -r --period -p --interval -i --once --help" ;;
+        serve) echo "--port --help" ;;
+        daemon) echo "--socket --help" ;;
+        warm) echo "--help" ;;
+        check) echo "--help" ;;
+        completion) echo "--help" ;;
+        *) echo "--version --config -c --explain --help" ;;
+    esac
+}
+
+_pacioli_complete_lines() {
+    # Add the lines of a cache file starting with the current word.
+    local file line
+    file="${XDG_CACHE_HOME:-$HOME/.cache}/pacioli/completion/$1"
+    [[ -r $file ]] || return 1
+    while IFS= read -r line; do
+        [[ $line == "$2"* ]] && COMPREPLY+=("$line")
+    done < "$file"
     return 0
 }
 
-_pacioli_completion_setup() {
-    complete -o nosort -F _pacioli_completion pacioli
+_pacioli_periods() {
+    local IFS=$'\n' month
+    # Periods are cached per month since they name months relative to the
+    # month they were written in.
+    printf -v month '%(%Y-%m)T' -1
+    _pacioli_complete_lines "periods-$month" "$1" \
+        || COMPREPLY=($(compgen -W $'this month\nlast month' -- "$1"))
+    # Periods contain spaces; quote them as one word.
+    COMPREPLY=("${COMPREPLY[@]// /\\ }")
+}
+
+_pacioli_completion() {
+    local cur prev word command i
+    cur="${COMP_WORDS[COMP_CWORD]}"
+    prev="${COMP_WORDS[COMP_CWORD-1]}"
+
+    # Account names contain ':', which bash treats as a word break.
+    if declare -F _get_comp_words_by_ref > /dev/null; then
+        _get_comp_words_by_ref -n : cur prev
+    fi
+
+    for (( i = 1; i < COMP_CWORD; i++ )); do
+        word="${COMP_WORDS[i]}"
+        case "$word" in
+            --config|-c) (( i++ )) ;;
+            -*) ;;
+            *) command="$word"; break ;;
+        esac
+    done
+
+    COMPREPLY=()
+    case "$command $prev" in
+        " --config"|" -c"|\
+        "consolidate --entity")
+            compopt -o default 2> /dev/null
+            return 0 ;;
+        "balance-sheet --end-date"|"balance-sheet -e"|\
+        "income-statement --begin-date"|"income-statement -b"|"income-statement --end-date"|"income-statement -e"|"income-statement --month"|"income-statement -m"|\
+        "cash-flow-statement --begin-date"|"cash-flow-statement -b"|"cash-flow-statement --end-date"|"cash-flow-statement -e"|"cash-flow-statement --month"|"cash-flow-statement -m"|\
+        "general-ledger --begin-date"|"general-ledger -b"|"general-ledger --end-date"|"general-ledger -e"|\
+        "all --begin-date"|"all -b"|"all --end-date"|"all -e"|\
+        "consolidate --begin-date"|"consolidate -b"|"consolidate --end-date"|"consolidate -e"|\
+        "pdf --workers"|"pdf -j"|\
+        "watch --interval"|"watch -i"|\
+        "serve --port"|\
+        "daemon --socket")
+            :
+            return 0 ;;
+        "balance-sheet --format"|\
+        "income-statement --format"|\
+        "cash-flow-statement --format"|\
+        "consolidate --format")
+            COMPREPLY=($(compgen -W "tex json csv" -- "$cur"))
+            return 0 ;;
+        "income-statement --period"|"income-statement -p"|\
+        "cash-flow-statement --period"|"cash-flow-statement -p"|\
+        "general-ledger --period"|"general-ledger -p"|\
+        "all --period"|"all -p"|\
+        "consolidate --period"|"consolidate -p"|\
+        "watch --period"|"watch -p")
+            _pacioli_periods "$cur"
+            return 0 ;;
+        "watch --report"|"watch -r")
+            COMPREPLY=($(compgen -W "balance-sheet income-statement cash-flow-statement" -- "$cur"))
+            return 0 ;;
+    esac
+
+    if [[ $cur == -* ]]; then
+        COMPREPLY=($(compgen -W "$(_pacioli_command_options "$command")" -- "$cur"))
+    elif [[ -z $command ]]; then
+        COMPREPLY=($(compgen -W "$_pacioli_commands" -- "$cur"))
+    else
+        case "$command" in
+            completion) COMPREPLY=($(compgen -W "bash zsh" -- "$cur")) ;;
+            # OUT_FILE, OUTPUT_DIR and TEX_FILES arguments
+            *) compopt -o default 2> /dev/null ;;
+        esac
+    fi
+    return 0
 }
 
-_pacioli_completion_setup;
+complete -o nosort -F _pacioli_completion pacioli
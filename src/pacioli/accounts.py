@@ -0,0 +1,317 @@
+"""Index the accounts in a Ledger journal.
+
+Config categories may list account patterns as well as account names:
+
+- Glob patterns, where '*' matches within one account segment and '**'
+  matches any number of segments, e.g. 'Expenses:Travel:*'.
+- Regular expressions prefixed with 're:', matched against the whole
+  account name, e.g. 're:Expenses:(Travel|Meals)'.
+
+Classes
+-------
+AccountIndex
+
+Functions
+---------
+is_pattern
+compile_pattern
+ledger_selection
+ledger_selects
+"""
+
+import difflib
+import functools
+import os
+import re
+import threading
+
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+
+
+def is_pattern(entry) -> bool:
+    """Return True if a config entry is an account pattern, not an account name."""
+    return entry.startswith("re:") or bool(GLOB_CHARACTERS.search(entry))
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern) -> re.Pattern:
+    """Compile an account pattern to a regular expression.
+
+    Parameters
+    ----------
+    pattern: str
+        Glob pattern or regular expression prefixed with 're:'.
+
+    Returns
+    -------
+    re.Pattern
+        Expression to fullmatch against full account names.
+    """
+    if pattern.startswith("re:"):
+        return re.compile(pattern[3:])
+
+    expression = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**", index):
+            expression.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            expression.append("[^:]*")
+        elif char == "?":
+            expression.append("[^:]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                expression.append(re.escape(char))
+            else:
+                body = pattern[index + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                expression.append(f"[{body}]")
+                index = end
+        else:
+            expression.append(re.escape(char))
+        index += 1
+    return re.compile("".join(expression))
+
+
+@functools.lru_cache(maxsize=None)
+def ledger_selection(account) -> re.Pattern:
+    """Return the expression ledger selects accounts with for an account argument.
+
+    ledger reads an account argument as a case-insensitive regular
+    expression searched for in full account names, so 'Assets:Checking'
+    also selects 'Assets:Checking Joint'.  Arguments that aren't valid
+    expressions are searched for literally.
+
+    Parameters
+    ----------
+    account: str
+        Account argument of a ledger query.
+
+    Returns
+    -------
+    re.Pattern
+        Expression to search full account names with.
+    """
+    try:
+        return re.compile(account, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(account), re.IGNORECASE)
+
+
+def ledger_selects(account, name) -> bool:
+    """Return True if ledger includes account name in the balance of account.
+
+    Results of one query for several accounts are split per account with
+    this, so they agree with a query for each account on its own.
+    """
+    return ledger_selection(account).search(name) is not None
+
+
+class AccountIndex:
+    """Every account in a journal along with the names reports use for it.
+
+    The index is built once from `ledger accounts` and includes the parents
+    of every account, so config mappings to parent accounts are known too.
+
+    Methods
+    -------
+    load(journal, run_system_command)
+        Returns the index for a journal, reusing it until the journal changes.
+    short_name(account)
+        Returns the template variable name of an account.
+    display_name(account)
+        Returns the name shown for an account on a report.
+    parent(account)
+        Returns the parent of an account.
+    children(account)
+        Returns the direct sub-accounts of an account.
+    expand(entries)
+        Returns the accounts named or matched by config entries.
+    validate(mappings)
+        Returns the mapped accounts that are not in the journal.
+    """
+
+    # Indexes shared by every report in the process, keyed on journal path
+    loaded: dict[str, "AccountIndex"] = {}
+    lock = threading.Lock()
+
+    def __init__(self, accounts, fingerprint=None) -> None:
+        """Build the index.
+
+        Parameters
+        ----------
+        accounts: iterable
+            Full account names, one per account with postings.
+        fingerprint: str
+            Fingerprint of the journal the accounts were read from.
+        """
+        self.fingerprint = fingerprint
+        self.accounts: set[str] = set()
+        for account in accounts:
+            account = account.strip()
+            if not account:
+                continue
+            parts = account.split(":")
+            for depth in range(1, len(parts) + 1):
+                self.accounts.add(":".join(parts[:depth]))
+
+        self.sorted_accounts = sorted(self.accounts)
+        self.expanded: dict[tuple[str, ...], list[str]] = {}
+
+        self.short_names = {}
+        self.display_names = {}
+        self.parents = {}
+        self.child_accounts: dict[str, list[str]] = {}
+        for account in self.sorted_accounts:
+            name = account.rsplit(":", 1)[-1]
+            self.short_names[account] = name.lower().replace(" ", "_")
+            self.display_names[account] = name
+            parent = account.rpartition(":")[0] or None
+            self.parents[account] = parent
+            if parent:
+                self.child_accounts.setdefault(parent, []).append(account)
+
+    @classmethod
+    def load(cls, journal, run_system_command) -> "AccountIndex":
+        """Return the index of a journal's accounts.
+
+        The index is built with one `ledger accounts` call and shared until
+        the journal's fingerprint changes.
+
+        Parameters
+        ----------
+        journal: Journal
+            The journal to index.
+        run_system_command: callable
+            Runs a ledger command and returns its output.
+
+        Returns
+        -------
+        AccountIndex
+            Index of the journal's accounts.
+        """
+        path = os.path.abspath(journal.journal_file)
+        fingerprint = journal.fingerprint()
+        with cls.lock:
+            index = cls.loaded.get(path)
+            if index is None or index.fingerprint != fingerprint:
+                output = run_system_command(["ledger", "-f", journal.journal_file, "accounts"])
+                index = cls(output.splitlines(), fingerprint)
+                cls.loaded[path] = index
+            return index
+
+    def __contains__(self, account) -> bool:
+        """Return True if the account, or one of its sub-accounts, has postings."""
+        return account in self.accounts
+
+    def __len__(self) -> int:
+        """Return the number of accounts, including parent accounts."""
+        return len(self.accounts)
+
+    def short_name(self, account) -> str:
+        """Return the account name used as a template variable.
+
+        Parameters
+        ----------
+        account: str
+            Full account path.
+
+        Returns
+        -------
+        str
+            Final segment of the path in lower case with spaces replaced by '_'.
+        """
+        name = self.short_names.get(account)
+        if name is None:
+            name = account.split(":")[-1].lower().replace(" ", "_")
+        return name
+
+    def display_name(self, account) -> str:
+        """Return the final segment of the account path."""
+        return self.display_names.get(account) or account.split(":")[-1]
+
+    def parent(self, account) -> str | None:
+        """Return the parent account, or None for top level accounts."""
+        return self.parents.get(account)
+
+    def children(self, account) -> list[str]:
+        """Return the direct sub-accounts of an account in sorted order."""
+        return self.child_accounts.get(account, [])
+
+    def expand(self, entries) -> list[str]:
+        """Return the accounts a config category refers to.
+
+        Account names are kept in order, whether or not they are in the
+        journal.  Each pattern is replaced by the matching accounts in sorted
+        order, leaving out accounts already selected or below a selected
+        account, so no balance is counted twice.  Results are cached for the
+        life of the index.
+
+        Parameters
+        ----------
+        entries: list
+            Account names and patterns from the config file.
+
+        Returns
+        -------
+        list[str]
+            Full account names.
+        """
+        key = tuple(entries or [])
+        cached = self.expanded.get(key)
+        if cached is not None:
+            return cached
+
+        selected: dict[str, None] = {}
+        for entry in key:
+            if not is_pattern(entry):
+                selected[entry] = None
+                continue
+            matcher = compile_pattern(entry)
+            for account in self.sorted_accounts:
+                if matcher.fullmatch(account) and not self.is_selected(account, selected):
+                    selected[account] = None
+
+        result = list(selected)
+        self.expanded[key] = result
+        return result
+
+    def is_selected(self, account, selected) -> bool:
+        """Return True if the account or one of its parents is in selected."""
+        while account:
+            if account in selected:
+                return True
+            account = self.parents.get(account)
+        return False
+
+    def validate(self, mappings) -> dict[str, dict[str, list[str]]]:
+        """Return the mapped accounts that are not in the journal.
+
+        Parameters
+        ----------
+        mappings: dict
+            Config category mapped to its list of account names and patterns.
+
+        Returns
+        -------
+        dict
+            Category mapped to {unknown account: close matches}.  Patterns
+            that match no accounts are included without matches.  Categories
+            without unknown accounts are left out.
+        """
+        unknown: dict[str, dict[str, list[str]]] = {}
+        for category, accounts in mappings.items():
+            for account in accounts or []:
+                if is_pattern(account):
+                    matcher = compile_pattern(account)
+                    if not any(matcher.fullmatch(name) for name in self.sorted_accounts):
+                        unknown.setdefault(category, {})[account] = []
+                elif account not in self.accounts:
+                    matches = difflib.get_close_matches(account, self.accounts, n=3)
+                    unknown.setdefault(category, {})[account] = matches
+        return unknown
@@ -0,0 +1,627 @@
+"""Keep report objects warm for long running processes.
+
+Classes
+-------
+ReportBackend
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pacioli.balance_sheet import BalanceSheet
+from pacioli.cash_flow_statement import CashFlowStatement
+from pacioli.config import Config
+from pacioli.general_ledger import GeneralLedger
+from pacioli.income_statement import IncomeStatement
+from pacioli.journal import Journal
+from pacioli.outputs import OutputCache, TeeWriter, config_digest, templates_digest
+from pacioli.planner import Balance, QueryPlan
+from pacioli.results import Statement
+from pacioli.utils import common_periods, period_to_dates
+
+logger = logging.getLogger(__name__)
+
+REPORTS = ("balance-sheet", "income-statement", "cash-flow-statement")
+# Reports too large to cache or serve, which are only streamed to files
+DETAIL_REPORTS = ("general-ledger",)
+
+
+class ReportBackend:
+    """Loads the config once and renders reports on demand.
+
+    Methods
+    -------
+    get_report(report)
+        Returns the report object for a report name.
+    render(report, start_date, end_date)
+        Returns the report in tex format.
+    get_response(report, start_date, end_date, output_format)
+        Returns a cached rendering of the report and its ETag.
+    warm()
+        Precomputes commonly requested reports after the journal changes.
+    """
+
+    def __init__(self, config_file=None, journal_file=None) -> None:
+        """Create the report objects.
+
+        Parameters
+        ----------
+        config_file: str
+            Path to config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
+        """
+        self.balance_sheet = BalanceSheet(config_file=config_file, journal_file=journal_file)
+        self.income_statement = IncomeStatement(config_file=config_file, journal_file=journal_file)
+        self.cash_flow_statement = CashFlowStatement(
+            config_file=config_file, journal_file=journal_file
+        )
+        self.general_ledger = GeneralLedger(config_file=config_file, journal_file=journal_file)
+        self.config = self.balance_sheet.config
+        self.journal = Journal(self.config.journal_file)
+
+        # The reports share a template directory, so they share one
+        # environment and its compiled template cache.
+        self.income_statement.share_templates(self.balance_sheet)
+        self.cash_flow_statement.share_templates(self.balance_sheet)
+        self.general_ledger.share_templates(self.balance_sheet)
+        # They read the same journal, so they share the stores of its
+        # closed periods.
+        for report_object in (self.income_statement, self.cash_flow_statement, self.general_ledger):
+            report_object.share_stores(self.balance_sheet)
+
+        # Rendered reports kept on disk across runs
+        self.outputs = None
+        if self.config.output_cache:
+            self.outputs = OutputCache(os.path.join(Config.get_cache_path(), "outputs"))
+
+        # Rendered responses keyed on (report, dates, format, data version,
+        # templates digest)
+        self.cache: dict[tuple, tuple[str, str]] = {}
+        self.cache_lock = threading.Lock()
+        self.key_locks: dict[tuple, threading.Lock] = {}
+        self.warm_fingerprint: str | None = None
+
+    def get_report(self, report):
+        """Return the report object for a report name.
+
+        Parameters
+        ----------
+        report: str
+            One of 'balance-sheet', 'income-statement',
+            'cash-flow-statement' or 'general-ledger'.
+
+        Returns
+        -------
+        Pacioli
+            The report object.
+        """
+        if report not in REPORTS + DETAIL_REPORTS:
+            raise ValueError(f"Unknown report: {report}")
+        return getattr(self, report.replace("-", "_"))
+
+    def output_key(self, report, start_date, end_date) -> str | None:
+        """Return the output cache key of a report's inputs other than the journal.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        str or None
+            None when the output cache is off, for reports that aren't
+            cached, or when the templates a template uses can't be known.
+        """
+        if self.outputs is None or report not in REPORTS:
+            return None
+        report_object = self.get_report(report)
+        sources = report_object.get_template_sources(report_object.template)
+        if sources is None:
+            return None
+        if report == "balance-sheet":
+            start_date = ""
+        return self.outputs.key(
+            report,
+            start_date,
+            end_date,
+            config_digest(self.config, report_object.formatter),
+            templates_digest(sources),
+        )
+
+    def data_version(self) -> str:
+        """Return a digest of the journal and price database reports are read from."""
+        version = self.journal.fingerprint()
+        if self.config.price_db:
+            try:
+                stat = os.stat(self.config.price_db)
+                version += f"-{stat.st_mtime_ns}-{stat.st_size}"
+            except OSError:
+                pass
+        return version
+
+    @staticmethod
+    def period_dates(period) -> list[str]:
+        """Return [start_date, end_date] for a period description."""
+        return period_to_dates(period)
+
+    def render(self, report, start_date, end_date) -> str:
+        """Render a report.
+
+        The balance sheet is run as of end_date and ignores start_date.  Ledger
+        queries are limited to the config's report timeout.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        str
+            The report in tex format.
+        """
+        report_object = self.get_report(report)
+        key = self.output_key(report, start_date, end_date)
+        if key is not None and self.outputs is not None:
+            version = self.data_version()
+            text = self.outputs.get(key, version)
+            if text is not None:
+                report_object.logger.debug(f"Output cache hit: {report} {start_date} {end_date}")
+                return text
+
+        with report_object.report_deadline():
+            if report == "balance-sheet":
+                text = self.balance_sheet.print_report(date=end_date)
+            else:
+                text = report_object.print_report(start_date, end_date)
+        if key is not None and self.outputs is not None:
+            self.outputs.put(key, version, text)
+        return text
+
+    def write(self, report, start_date, end_date, out) -> None:
+        """Render a report straight to a file.
+
+        The report's data is gathered before anything is written, so a
+        failed ledger query leaves out untouched.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        start_date: str
+        end_date: str
+        out: file
+            Text file the report is written to in tex format.
+        """
+        report_object = self.get_report(report)
+        key = self.output_key(report, start_date, end_date)
+        if key is not None and self.outputs is not None:
+            version = self.data_version()
+            text = self.outputs.get(key, version)
+            if text is not None:
+                report_object.logger.debug(f"Output cache hit: {report} {start_date} {end_date}")
+                out.write(text)
+                return
+
+        variables = report_object.get_template_variables(report_object.template)
+        values = report_object.formatter.format(
+            self.report_data(report, start_date, end_date, variables)
+        )
+        if key is None or self.outputs is None:
+            report_object.stream_template(report_object.template, values, out)
+            return
+        with self.outputs.writer(key, version) as stored:
+            report_object.stream_template(report_object.template, values, TeeWriter(out, stored))
+
+    def report_data(self, report, start_date, end_date, variables=None) -> dict:
+        """Return the unformatted report values.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        start_date: str
+        end_date: str
+        variables: set
+            Names of the variables the template uses.  The balance sheet
+            only queries the balances behind them.  None returns every
+            variable.
+
+        Returns
+        -------
+        dict
+            Report variables mapped to their integer balances.
+        """
+        report_object = self.get_report(report)
+        with report_object.report_deadline():
+            if report == "balance-sheet":
+                return self.balance_sheet.get_report_data(date=end_date, variables=variables)
+            return report_object.get_report_data(start_date, end_date)
+
+    def build_report(self, report, start_date, end_date) -> Statement:
+        """Return a statement's results without rendering it.
+
+        Parameters
+        ----------
+        report: str
+            One of REPORTS.  The balance sheet is as of end_date.
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        Statement
+            The statement with integer amounts.
+        """
+        if report not in REPORTS:
+            raise ValueError(f"Unknown statement: {report}")
+        report_object = self.get_report(report)
+        with report_object.report_deadline():
+            if report == "balance-sheet":
+                return self.balance_sheet.build_report(end_date)
+            return report_object.build_report(start_date, end_date)
+
+    def explain(self, report, start_date, end_date) -> str:
+        """Return the plan of ledger queries behind a report.
+
+        Parameters
+        ----------
+        report: str
+            Report name, or 'all' for every statement of the period.
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        str
+            Description of the queries, see QueryPlan.explain().
+        """
+        if report == "all":
+            return QueryPlan(self.balance_sheet, self.all_needs(start_date, end_date)).explain()
+        report_object = self.get_report(report)
+        if report == "general-ledger":
+            return report_object.explain(start_date, end_date)
+        if report == "balance-sheet":
+            needs = report_object.get_needs(
+                end_date, report_object.get_template_variables(report_object.template)
+            )
+        else:
+            needs = report_object.get_needs(start_date, end_date)
+        return QueryPlan(report_object, needs).explain()
+
+    def all_needs(self, start_date, end_date) -> list:
+        """Return the ledger data needed by every statement for a period.
+
+        The balance sheet is as of end_date.
+        """
+        return (
+            self.balance_sheet.get_needs(end_date)
+            + self.income_statement.get_needs(start_date, end_date)
+            + self.cash_flow_statement.get_needs(start_date, end_date)
+        )
+
+    def all_report_data(self, start_date, end_date) -> tuple[dict[str, dict], list[str]]:
+        """Return the values of every statement for a period from one query plan.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+            The balance sheet is as of end_date.
+
+        Returns
+        -------
+        tuple
+            Report name mapped to its unformatted values, and the problems
+            found by check_consistency().
+        """
+        with self.balance_sheet.report_deadline():
+            results = self.balance_sheet.run_plan(self.all_needs(start_date, end_date))
+            data = {
+                "balance-sheet": self.balance_sheet.get_report_data(end_date, results),
+                "income-statement": self.income_statement.get_report_data(
+                    start_date, end_date, results
+                ),
+                "cash-flow-statement": self.cash_flow_statement.get_report_data(
+                    start_date, end_date, results
+                ),
+            }
+        return data, self.check_consistency(data, results, end_date)
+
+    def build_all(self, start_date, end_date) -> dict[str, Statement]:
+        """Return every statement of a period from one query plan.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+            The balance sheet is as of end_date.
+
+        Returns
+        -------
+        dict
+            Report name mapped to its Statement.
+        """
+        with self.balance_sheet.report_deadline():
+            results = self.balance_sheet.run_plan(self.all_needs(start_date, end_date))
+            return {
+                "balance-sheet": self.balance_sheet.build_report(end_date, results),
+                "income-statement": self.income_statement.build_report(
+                    start_date, end_date, results
+                ),
+                "cash-flow-statement": self.cash_flow_statement.build_report(
+                    start_date, end_date, results
+                ),
+            }
+
+    def check_consistency(self, data, results, end_date) -> list[str]:
+        """Return the ways the statements of a period disagree.
+
+        Parameters
+        ----------
+        data: dict
+            Report name mapped to its unformatted values.
+        results: dict
+            Answers to the needs of the reports.
+        end_date: str
+            Date of the balance sheet.
+
+        Returns
+        -------
+        list[str]
+            One message per problem; empty when the statements agree.
+        """
+        problems = []
+        accounts = self.balance_sheet.get_account_index()
+        cash_accounts = [
+            account for account in accounts.expand(self.config.cash_accounts) if account in accounts
+        ]
+        asset_lines = accounts.expand(self.config.current_assets) + accounts.expand(
+            self.config.longterm_assets
+        )
+
+        # Ending cash can only be compared when no balance sheet line mixes
+        # cash with other accounts, i.e. no line is a parent of a cash account.
+        comparable = True
+        for cash_account in cash_accounts:
+            parents = [
+                line for line in asset_lines if accounts.is_selected(cash_account, {line: None})
+            ]
+            parts = [
+                line for line in asset_lines if accounts.is_selected(line, {cash_account: None})
+            ]
+            if not parents and not parts:
+                problems.append(f"Cash account {cash_account} is not on the balance sheet")
+            elif parents and cash_account not in parents:
+                comparable = False
+
+        cash_flow = data["cash-flow-statement"]
+        if comparable:
+            # Balance sheet lines that are cash accounts or held within them
+            balance_sheet_cash = sum(
+                results.get(Balance(line, end_date), 0)
+                for line in asset_lines
+                if any(accounts.is_selected(line, {cash: None}) for cash in cash_accounts)
+            )
+            if cash_flow["ending_cash"] != balance_sheet_cash:
+                problems.append(
+                    f"Ending cash on the cash flow statement ({cash_flow['ending_cash']}) does "
+                    f"not match the cash accounts on the balance sheet ({balance_sheet_cash})"
+                )
+
+        calculated = cash_flow["beginning_cash"] + cash_flow["net_change_in_cash"]
+        if calculated != cash_flow["ending_cash"]:
+            problems.append(
+                f"Beginning cash plus the net change in cash ({calculated}) does not match "
+                f"ending cash ({cash_flow['ending_cash']})"
+            )
+        return problems
+
+    def report_templates(self, report) -> dict[str, str]:
+        """Return the templates render_all() renders a statement with.
+
+        Parameters
+        ----------
+        report: str
+            One of REPORTS.
+
+        Returns
+        -------
+        dict
+            Variant name mapped to template path: '' for the report's own
+            template, then the config's variants of the report.
+        """
+        return {"": self.get_report(report).template, **self.config.variants.get(report, {})}
+
+    def render_all(self, start_date, end_date) -> tuple[dict[tuple[str, str], str], list[str]]:
+        """Render every template of every statement for a period from shared data.
+
+        The statements are queried and formatted once, then each template,
+        including the config's variants, is rendered in parallel.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+            The balance sheet is as of end_date.
+
+        Returns
+        -------
+        tuple
+            (report, variant) mapped to the rendered template, see
+            report_templates(), and the problems found by
+            check_consistency().
+
+        Raises
+        ------
+        ValueError
+            If the config has variants of an unknown report.
+        """
+        unknown = sorted(set(self.config.variants) - set(REPORTS))
+        if unknown:
+            raise ValueError(f"Unknown report in variants: {', '.join(unknown)}")
+        data, problems = self.all_report_data(start_date, end_date)
+
+        # Templates are loaded here so each is compiled once, and only
+        # rendering runs in the workers.
+        jobs = {}
+        for report, values in data.items():
+            report_object = self.get_report(report)
+            formatted = report_object.formatter.format(values)
+            for variant, template in self.report_templates(report).items():
+                jobs[(report, variant)] = (report_object.get_template(template), formatted)
+
+        with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+            futures = {
+                key: executor.submit(template.render, values)
+                for key, (template, values) in jobs.items()
+            }
+            rendered = {key: future.result() for key, future in futures.items()}
+        return rendered, problems
+
+    def get_response(self, report, start_date, end_date, output_format="tex") -> tuple[str, str]:
+        """Return a rendered report from the cache, rendering it on a miss.
+
+        Entries are keyed on data_version() and, for tex, a digest of the
+        templates the report uses, so a change to the journal, the price
+        database or a template invalidates them.  Concurrent requests for
+        the same report wait for a single rendering instead of each running
+        ledger.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        start_date: str
+        end_date: str
+        output_format: str
+            'tex' or 'json'.
+
+        Returns
+        -------
+        tuple[str, str]
+            The ETag and body of the response.
+        """
+        if output_format not in ("tex", "json"):
+            raise ValueError(f"Unknown format: {output_format}")
+        if report == "balance-sheet":
+            start_date = ""
+
+        version = self.data_version()
+        template_version = ""
+        if output_format == "tex":
+            report_object = self.get_report(report)
+            sources = report_object.get_template_sources(report_object.template)
+            if sources is None:
+                # Without knowing the templates used, a rendering can't be reused
+                body = self.render(report, start_date, end_date)
+                return hashlib.sha1(body.encode()).hexdigest(), body
+            template_version = templates_digest(sources)
+        key = (report, start_date, end_date, output_format, version, template_version)
+        with self.cache_lock:
+            if key in self.cache:
+                return self.cache[key]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.cache_lock:
+                if key in self.cache:
+                    return self.cache[key]
+
+            if output_format == "json":
+                body = json.dumps(self.report_data(report, start_date, end_date))
+            else:
+                body = self.render(report, start_date, end_date)
+            etag = hashlib.sha1(body.encode()).hexdigest()
+
+            with self.cache_lock:
+                # Entries for older versions of the data or of this report's
+                # templates can never be hit again.
+                stale_keys = [
+                    k
+                    for k in self.cache
+                    if k[4] != version
+                    or ((k[0], k[3]) == (report, output_format) and k[5] != template_version)
+                ]
+                for stale in stale_keys:
+                    del self.cache[stale]
+                    self.key_locks.pop(stale, None)
+                self.cache[key] = (etag, body)
+            return etag, body
+
+    def warm_targets(self) -> list[tuple[str, str, str]]:
+        """Return the reports precomputed by warm().
+
+        Every period report is run for each warm period (the config's
+        `warm_periods` or common_periods()) and the balance sheet is run as
+        of today, the default of the balance-sheet command.
+
+        Returns
+        -------
+        list[tuple[str, str, str]]
+            (report, start_date, end_date) for each report.
+        """
+        targets = [("balance-sheet", "", "")]
+        for period in self.config.warm_periods or common_periods():
+            start_date, end_date = period_to_dates(period)
+            targets.append(("income-statement", start_date, end_date))
+            targets.append(("cash-flow-statement", start_date, end_date))
+        return targets
+
+    def warm(self) -> int:
+        """Precompute commonly requested reports if the journal or prices changed.
+
+        Returns
+        -------
+        int
+            Number of reports rendered.
+        """
+        fingerprint = self.data_version()
+        if fingerprint == self.warm_fingerprint:
+            return 0
+
+        rendered = 0
+        for report, start_date, end_date in self.warm_targets():
+            try:
+                self.get_response(report, start_date, end_date)
+            except Exception as error:
+                logger.warning(f"Unable to warm {report} {start_date} {end_date}: {error}")
+            else:
+                rendered += 1
+        self.warm_fingerprint = fingerprint
+        logger.debug(f"Warmed {rendered} reports")
+        return rendered
+
+    def start_warming(self, interval=5) -> threading.Thread:
+        """Warm the cache in a background thread whenever the journal changes.
+
+        Parameters
+        ----------
+        interval: float
+            Seconds between checks for journal changes.
+
+        Returns
+        -------
+        threading.Thread
+            The daemon thread doing the warming.
+        """
+
+        def run():
+            while True:
+                self.warm()
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="pacioli-warm", daemon=True)
+        thread.start()
+        return thread
@@ -1,7 +1,28 @@
 from typing import Dict
 
 from pacioli.pacioli import Pacioli
-from pacioli.utils import format_balance, reverse_sign
+from pacioli.planner import Balance
+from pacioli.results import Line, Section, Statement
+
+# Totals and the categories they are summed from
+TOTALS = {
+    "total_assets": ("current_assets", "longterm_assets"),
+    "total_liabilities": ("secured_liabilities", "unsecured_liabilities"),
+    "total_equity": (
+        "current_assets",
+        "longterm_assets",
+        "secured_liabilities",
+        "unsecured_liabilities",
+    ),
+    "total_liabilities_equity": (
+        "current_assets",
+        "longterm_assets",
+        "secured_liabilities",
+        "unsecured_liabilities",
+    ),
+}
+# Sections shown sign reversed, so that amounts owed are positive
+LIABILITIES = ("secured_liabilities", "unsecured_liabilities")
 
 
 class BalanceSheet(Pacioli):
@@ -11,24 +32,30 @@ class BalanceSheet(Pacioli):
     -------
     print_report:
         Creates tex formated report.
+    build_report:
+        Returns the balance sheet as a Statement.
+    statement_totals:
+        Returns the totals of the balance sheet's sections.
     """
 
-    def __init__(self, config_file) -> None:
+    def __init__(self, config_file, journal_file=None) -> None:
         """Load Config.
 
         Parameters
         ----------
         config_file: str
             Path to config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
         """
-        Pacioli.__init__(self, config_file)
+        Pacioli.__init__(self, config_file, journal_file)
         self.template = self.config.balance_sheet_template
 
     def print_report(self, date) -> str:
         """Generate the balance sheet.
 
         Generates the balance sheet from the category mappings in the config
-        file.
+        file.  Only the balances the template shows are queried.
 
         Parameters
         ----------
@@ -40,47 +67,252 @@ class BalanceSheet(Pacioli):
         str
             Balance sheet in tex format.
         """
-        current_assets = self.process_accounts(
-            self.config.current_assets, "current_assets", date=date
-        )
-        longterm_assets = self.process_accounts(
-            self.config.longterm_assets, "longterm_assets", date=date
-        )
-        secured_liabilities = reverse_sign(
-            self.process_accounts(self.config.secured_liabilities, "secured_liabilities", date=date)
+        variables = self.get_template_variables(self.template)
+        return self.render_template(
+            self.template, self.formatter.format(self.get_report_data(date, variables=variables))
         )
 
-        unsecured_liabilities = reverse_sign(
-            self.process_accounts(
-                self.config.unsecured_liabilities, "unsecured_liabilities", date=date
+    def select_accounts(self, variables=None) -> dict[str, list[str]]:
+        """Return the accounts of each category that the report shows.
+
+        A category's accounts are all selected when its list, its total or
+        a total summed from it is shown, otherwise only the accounts shown by
+        their short names.
+
+        Parameters
+        ----------
+        variables: set
+            Names of the variables the template uses, see
+            get_template_variables().  None selects every account.
+
+        Returns
+        -------
+        dict
+            Category name, e.g. 'current_assets', mapped to full account
+            names and account patterns.
+        """
+        accounts = self.get_account_index()
+        categories = {
+            "current_assets": self.config.current_assets,
+            "longterm_assets": self.config.longterm_assets,
+            "secured_liabilities": self.config.secured_liabilities,
+            "unsecured_liabilities": self.config.unsecured_liabilities,
+        }
+        if variables is None:
+            return categories
+
+        summed = {name for total, names in TOTALS.items() if total in variables for name in names}
+        selected = {}
+        for name, category in categories.items():
+            if name in summed or {f"{name}_accounts", f"{name}_total"} & variables:
+                selected[name] = category
+            else:
+                selected[name] = [
+                    account
+                    for account in accounts.expand(category)
+                    if accounts.short_name(account) in variables
+                ]
+        return selected
+
+    def get_needs(self, date, variables=None) -> list:
+        """Return the ledger data the balance sheet needs.
+
+        Parameters
+        ----------
+        date: str
+            End date for ledger balances.
+        variables: set
+            Names of the variables the template uses.  None needs every
+            account.
+
+        Returns
+        -------
+        list
+            A Balance need for every known account in the balance sheet
+            categories that the report shows.
+        """
+        accounts = self.get_account_index()
+        return [
+            Balance(account, date)
+            for category in self.select_accounts(variables).values()
+            for account in accounts.expand(category)
+            if account in accounts
+        ]
+
+    def build_report(self, date, results=None, variables=None) -> Statement:
+        """Return the balance sheet as a statement.
+
+        Liabilities are sign reversed so that amounts owed are positive.
+
+        Parameters
+        ----------
+        date: str
+            End date for ledger balances.
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
+        variables: set
+            Names of the variables the template uses.  Only the accounts
+            behind them are included, so totals of partly selected sections
+            are incomplete.  None includes every account.
+
+        Returns
+        -------
+        Statement
+            Sections current_assets, longterm_assets, secured_liabilities and
+            unsecured_liabilities, with totals total_assets,
+            total_liabilities, total_equity and total_liabilities_equity.
+        """
+        if results is None:
+            results = self.run_plan(self.get_needs(date, variables))
+
+        sections = {
+            name: self.build_section(
+                category, name, date, results, sign=-1 if name in LIABILITIES else 1
             )
+            for name, category in self.select_accounts(variables).items()
+        }
+        return Statement(
+            "balance-sheet",
+            self.title,
+            "",
+            date,
+            tuple(sections.values()),
+            self.statement_totals(sections),
         )
 
-        total_assets = current_assets.get("current_assets_total", 0) + longterm_assets.get(
-            "longterm_assets_total", 0
+    @staticmethod
+    def statement_totals(sections, totals=()) -> tuple[tuple[str, int], ...]:
+        """Return the balance sheet's totals of its sections.
+
+        Parameters
+        ----------
+        sections: dict
+            Section name mapped to Section.
+        totals: tuple
+            Unused; every balance sheet total is summed from sections.
+
+        Returns
+        -------
+        tuple
+            (name, amount) pairs as in Statement.totals.
+        """
+        total_assets = sections["current_assets"].total + sections["longterm_assets"].total
+        total_liabilities = (
+            sections["secured_liabilities"].total + sections["unsecured_liabilities"].total
         )
-        total_liabilities = secured_liabilities.get(
-            "secured_liabilities_total", 0
-        ) + unsecured_liabilities.get("unsecured_liabilities_total", 0)
         total_equity = total_assets - total_liabilities
-        total_liabilities_equity = total_liabilities + total_equity
-        ledger = {
-            "total_assets": total_assets,
-            "total_liabilities": total_liabilities,
-            "total_equity": total_equity,
-            "total_liabilities_equity": total_liabilities_equity,
-            "title": self.title,
-            "date": date,
-        }
+        return (
+            ("total_assets", total_assets),
+            ("total_liabilities", total_liabilities),
+            ("total_equity", total_equity),
+            ("total_liabilities_equity", total_liabilities + total_equity),
+        )
+
+    def get_report_data(self, date, results=None, variables=None) -> dict:
+        """Return the balance sheet values before formatting.
+
+        Parameters
+        ----------
+        date: str
+            End date for ledger balances.
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
+        variables: set
+            Names of the variables the template uses.  Only these are
+            returned and only the balances behind them are queried.  None
+            returns every variable.
+
+        Returns
+        -------
+        dict
+            Template variables mapped to their integer balances.
+        """
+        return self.template_data(self.build_report(date, results, variables), variables)
 
-        ledger.update(current_assets)
-        ledger.update(longterm_assets)
-        ledger.update(secured_liabilities)
-        ledger.update(unsecured_liabilities)
+    def template_data(self, statement, variables=None) -> dict:
+        """Return the template variables of a balance sheet.
 
-        return self.render_template(self.template, format_balance(ledger))
+        Parameters
+        ----------
+        statement: Statement
+            From build_report().
+        variables: set
+            Names of the variables to return.  None returns every variable.
 
-    def process_accounts(self, category, category_name, date) -> dict[(str, int)]:
+        Returns
+        -------
+        dict
+            Totals, 'title', 'date' and the variables of each section, see
+            section_variables().
+        """
+        ledger = dict(statement.totals)
+        ledger["title"] = statement.title
+        ledger["date"] = statement.end_date
+        for section in statement.sections:
+            ledger.update(self.section_variables(section))
+        if variables is not None:
+            # Totals of partly selected categories are incomplete
+            return {name: value for name, value in ledger.items() if name in variables}
+        return ledger
+
+    def section_variables(self, section) -> dict:
+        """Return the template variables of a balance sheet section.
+
+        Parameters
+        ----------
+        section: Section
+
+        Returns
+        -------
+        dict
+            Account short names mapped to their balances, plus
+            '<section>_accounts' mapping display names to balances for
+            templates that loop over the section and '<section>_total'.
+        """
+        accounts = self.get_account_index()
+        result: dict = {accounts.short_name(line.account): line.amount for line in section.lines}
+        result[f"{section.name}_accounts"] = {line.name: line.amount for line in section.lines}
+        result[f"{section.name}_total"] = section.total
+        return result
+
+    def build_section(self, category, category_name, date, results=None, sign=1) -> Section:
+        """Return the lines of a balance sheet category.
+
+        Parameters
+        ----------
+        category: list
+            Full account names and account patterns in a category.
+        category_name: str
+            Section name, i.e 'current_assets'.
+        date: str
+            The end date for the balance.
+        results: dict
+            Balance needs mapped to their values.  Balances missing from it
+            are queried one account at a time.
+        sign: int
+            -1 to reverse the sign of the balances.
+
+        Returns
+        -------
+        Section
+            A line for each account with its display name, and the total.
+        """
+        accounts = self.get_account_index()
+        lines = []
+        for account in accounts.expand(category):
+            # Unknown accounts have already been reported and have no balance.
+            if account not in accounts:
+                balance = 0
+            elif results is not None and Balance(account, date) in results:
+                balance = results[Balance(account, date)]
+            else:
+                balance = self.get_balance(account, date)
+            lines.append(Line(accounts.display_name(account), account, sign * balance))
+        return Section(category_name, tuple(lines), sum(line.amount for line in lines))
+
+    def process_accounts(self, category, category_name, date, results=None) -> dict[(str, int)]:
         """Process account names and balances.
 
         Returns a dictionary of account short names and their corresponding balances
@@ -90,25 +322,22 @@ class BalanceSheet(Pacioli):
         Parameters
         ----------
         category: list
-            List of full account names in a category.
+            Full account names and account patterns in a category.
         cateogry_name: str
             The parent acount name, i.e 'Current Assets'.
         date: str
             The end date for the balance.
+        results: dict
+            Balance needs mapped to their values.  Balances missing from it
+            are queried one account at a time.
 
         Returns
         -------
         dict
-            account short names and corresponding balances
+            account short names and corresponding balances, plus
+            '<category_name>_accounts' mapping display names to balances for
+            templates that loop over the category.
         """
-        total = 0
-        result = {}
-        for account in category:
-            name = self.get_account_short_name(account)
-            balance = self.get_balance(account, date)
-            total += balance
-            result[name] = balance
-
-        name = f"{category_name}_total"
-        result[name] = total
-        return result
+        return self.section_variables(
+            self.build_section(category, category_name, date, results=results)
+        )
@@ -9,7 +9,8 @@ CashFlowStatement
 from typing import Dict
 
 from pacioli.pacioli import Pacioli, logging
-from pacioli.utils import format_balance
+from pacioli.planner import Balance, RelatedFlows
+from pacioli.results import Line, Section, Statement
 
 
 class CashFlowStatement(Pacioli):
@@ -20,17 +21,23 @@ class CashFlowStatement(Pacioli):
     -------
     print_report(start_date, end_date)
         Returns cash flow statement for the time period specified.
+    build_report(start_date, end_date)
+        Returns the cash flow statement as a Statement.
+    statement_totals(sections, totals)
+        Returns the totals of the cash flow statement's sections.
     """
 
-    def __init__(self, config_file) -> None:
+    def __init__(self, config_file, journal_file=None) -> None:
         """Read template path from config file.
 
         Parameters
         ----------
         config_file: str
             Path to config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
         """
-        Pacioli.__init__(self, config_file)
+        Pacioli.__init__(self, config_file, journal_file)
         self.template = self.config.cash_flow_template
 
     def print_report(self, start_date, end_date) -> str:
@@ -51,57 +58,182 @@ class CashFlowStatement(Pacioli):
         str
             The cash flow statement in tex format.
         """
-        result = {
-            "title": self.title,
-            "start_date": start_date,
-            "end_date": end_date,
-        }
+        result = self.get_report_data(start_date, end_date)
+        logging.debug(result)
+        return self.render_template(self.template, self.formatter.format(result))
 
-        # Calculate cash balances
-        beginning_cash = self.get_total_cash_balance(start_date)
-        ending_cash = self.get_total_cash_balance(end_date)
+    def get_needs(self, start_date, end_date) -> list:
+        """Return the ledger data the cash flow statement needs.
 
-        # Process activity categories
-        operating = self.process_accounts(self.config.operating_activities, start_date, end_date)
-        result["operating_activities_total"] = operating.pop("category_total", 0)
-        result["operating_activities"] = operating
+        Parameters
+        ----------
+        start_date: str
+            Start date for the reporting period (YYYY/MM/DD format)
+        end_date: str
+            End date for the reporting period (YYYY/MM/DD format)
 
-        investing = self.process_accounts(self.config.investing_activities, start_date, end_date)
-        result["investing_activities_total"] = investing.pop("category_total", 0)
-        result["investing_activities"] = investing
+        Returns
+        -------
+        list
+            Cash balances at both dates and the flows related to cash.
+        """
+        accounts = self.get_account_index()
+        cash_accounts = accounts.expand(self.config.cash_accounts)
+        needs: list = [
+            Balance(account, date)
+            for date in (start_date, end_date)
+            for account in cash_accounts
+            if account in accounts
+        ]
+        needs.append(RelatedFlows(tuple(cash_accounts), start_date, end_date))
+        return needs
 
-        financing = self.process_accounts(self.config.financing_activities, start_date, end_date)
-        result["financing_activities_total"] = financing.pop("category_total", 0)
-        result["financing_activities"] = financing
+    def build_report(self, start_date, end_date, results=None) -> Statement:
+        """Return the cash flow statement as a statement.
 
-        if result["operating_activities_total"] == 0 and not operating:
-            logging.warning("No operating activities found for the specified period")
-        if result["investing_activities_total"] == 0 and not investing:
-            logging.warning("No investing activities found for the specified period")
-        if result["financing_activities_total"] == 0 and not financing:
-            logging.warning("No financing activities found for the specified period")
+        Parameters
+        ----------
+        start_date: str
+            Start date for the reporting period (YYYY/MM/DD format)
+        end_date: str
+            End date for the reporting period (YYYY/MM/DD format)
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
+
+        Returns
+        -------
+        Statement
+            Sections operating_activities, investing_activities and
+            financing_activities, with totals net_change_in_cash,
+            beginning_cash and ending_cash.
+        """
+        if results is None:
+            results = self.run_plan(self.get_needs(start_date, end_date))
+        flows = results[self.get_needs(start_date, end_date)[-1]]
+
+        # Calculate cash balances
+        beginning_cash = self.get_total_cash_balance(start_date, results)
+        ending_cash = self.get_total_cash_balance(end_date, results)
+
+        # Process activity categories
+        sections = (
+            self.build_section(
+                self.config.operating_activities,
+                "operating_activities",
+                start_date,
+                end_date,
+                flows,
+            ),
+            self.build_section(
+                self.config.investing_activities,
+                "investing_activities",
+                start_date,
+                end_date,
+                flows,
+            ),
+            self.build_section(
+                self.config.financing_activities,
+                "financing_activities",
+                start_date,
+                end_date,
+                flows,
+            ),
+        )
+        for section in sections:
+            if section.total == 0 and not section.lines:
+                activity = section.name.split("_")[0]
+                logging.warning(f"No {activity} activities found for the specified period")
 
         # Calculate totals
-        result["net_change_in_cash"] = (
-            result["operating_activities_total"]
-            + result["investing_activities_total"]
-            + result["financing_activities_total"]
+        totals = self.statement_totals(
+            {section.name: section for section in sections},
+            (("beginning_cash", beginning_cash), ("ending_cash", ending_cash)),
         )
-        result["beginning_cash"] = beginning_cash
-        result["ending_cash"] = ending_cash
+        net_change_in_cash = totals[0][1]
 
         # Verification (for debugging)
-        calculated_ending = beginning_cash + result["net_change_in_cash"]
+        calculated_ending = beginning_cash + net_change_in_cash
         if calculated_ending != ending_cash:
             self.logger.warning(
                 f"Cash reconciliation mismatch: calculated {calculated_ending} "
                 f"vs actual {ending_cash}"
             )
 
-        logging.debug(result)
-        return self.render_template(self.template, format_balance(result))
+        return Statement("cash-flow-statement", self.title, start_date, end_date, sections, totals)
+
+    @staticmethod
+    def statement_totals(sections, totals) -> tuple[tuple[str, int], ...]:
+        """Return the cash flow statement's totals of its sections.
+
+        Parameters
+        ----------
+        sections: dict
+            Section name mapped to Section.
+        totals: tuple
+            (name, amount) pairs including beginning_cash and ending_cash,
+            which are balances of the cash accounts rather than sums of
+            sections.
+
+        Returns
+        -------
+        tuple
+            (name, amount) pairs as in Statement.totals.
+        """
+        cash = dict(totals)
+        return (
+            ("net_change_in_cash", sum(section.total for section in sections.values())),
+            ("beginning_cash", cash["beginning_cash"]),
+            ("ending_cash", cash["ending_cash"]),
+        )
+
+    def get_report_data(self, start_date, end_date, results=None) -> dict:
+        """Return the cash flow statement values before formatting.
+
+        Parameters
+        ----------
+        start_date: str
+            Start date for the reporting period (YYYY/MM/DD format)
+        end_date: str
+            End date for the reporting period (YYYY/MM/DD format)
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
+
+        Returns
+        -------
+        dict
+            Template variables mapped to their integer balances.
+        """
+        return self.template_data(self.build_report(start_date, end_date, results))
 
-    def get_total_cash_balance(self, date) -> int:
+    def template_data(self, statement) -> dict:
+        """Return the template variables of a cash flow statement.
+
+        Parameters
+        ----------
+        statement: Statement
+            From build_report().
+
+        Returns
+        -------
+        dict
+            'title', the dates, '<section>_total' and '<section>' mapping
+            display names to net cash flows for each section, and the
+            totals.
+        """
+        result: dict = {
+            "title": statement.title,
+            "start_date": statement.start_date,
+            "end_date": statement.end_date,
+        }
+        for section in statement.sections:
+            result[f"{section.name}_total"] = section.total
+            result[section.name] = {line.name: line.amount for line in section.lines}
+        result.update(statement.totals)
+        return result
+
+    def get_total_cash_balance(self, date, results=None) -> int:
         """Calculate total cash balance as of a specific date.
 
         Sums all accounts defined in Cash Accounts configuration.
@@ -110,18 +242,27 @@ class CashFlowStatement(Pacioli):
         ----------
         date: str
             Date for balance calculation (YYYY/MM/DD format)
+        results: dict
+            Balance needs mapped to their values.  Balances missing from it
+            are queried one account at a time.
 
         Returns
         -------
         int
             Total cash balance
         """
+        accounts = self.get_account_index()
         total = 0
-        for account in self.config.cash_accounts:
-            total += self.get_balance(account, date)
+        for account in accounts.expand(self.config.cash_accounts):
+            if account not in accounts:
+                continue
+            if results is not None and Balance(account, date) in results:
+                total += results[Balance(account, date)]
+            else:
+                total += self.get_balance(account, date)
         return total
 
-    def process_accounts(self, category, start_date, end_date) -> dict[str, int]:
+    def process_accounts(self, category, start_date, end_date, flows=None) -> dict[str, int]:
         """Process account cash flow changes within time period.
 
         Uses Ledger's --related flag to get only cash-basis transactions.
@@ -129,76 +270,70 @@ class CashFlowStatement(Pacioli):
         Parameters
         ----------
         category: list
-            List of full account paths to process
+            Full account paths and account patterns to process
         start_date: str
             Start date (YYYY/MM/DD format)
         end_date: str
             End date (YYYY/MM/DD format)
+        flows: dict
+            The answer to the RelatedFlows need of the period.  Queried when
+            not given.
 
         Returns
         -------
         dict
             Short account names and their net cash flow changes
         """
-        total = 0
-        result = {}
-
-        # Query cash accounts with --related to get only cash-basis transactions
-        ledger_command = [
-            "ledger",
-            "-f",
-            self.journal_file,
-            "bal",
-            "--related",
-            "-b",
-            start_date,
-            "-e",
-            end_date,
-            "--format",
-            "%(account)|%(quantity(amount))\n",
-        ]
+        section = self.build_section(category, "category", start_date, end_date, flows)
+        result = {line.name: line.amount for line in section.lines}
+        result["category_total"] = section.total
+        return result
 
-        # Add cash accounts to query
-        for cash_account in self.config.cash_accounts:
-            ledger_command.append(cash_account)
+    def build_section(self, category, category_name, start_date, end_date, flows=None) -> Section:
+        """Return the net cash flows of the accounts in a category.
 
-        if self.effective:
-            ledger_command.append("--effective")
-        if self.cleared:
-            ledger_command.append("--cleared")
-        if self.market:
-            ledger_command.extend(self.market.split())
+        Parameters
+        ----------
+        category: list
+            Full account paths and account patterns to process
+        category_name: str
+            Section name, i.e 'operating_activities'.
+        start_date: str
+            Start date (YYYY/MM/DD format)
+        end_date: str
+            End date (YYYY/MM/DD format)
+        flows: dict
+            The answer to the RelatedFlows need of the period.  Queried when
+            not given.
 
-        # Get all cash-related transactions
-        output = self.run_system_command(ledger_command)
+        Returns
+        -------
+        Section
+            A line for each account on the other side of cash postings, and
+            the total.
+        """
+        accounts = self.get_account_index()
+        lines = []
 
-        # Parse output and filter for accounts in this category
-        for line in output.strip().split("\n"):
-            if not line or "|" not in line:
-                continue
+        if flows is None:
+            # Query cash accounts with --related to get only cash-basis transactions
+            flows = self.query_period_amounts(
+                accounts.expand(self.config.cash_accounts), start_date, end_date, related=True
+            )
 
-            account, amount_str = line.split("|", 1)
-            account = account.strip()
+        category = accounts.expand(category)
 
+        # Filter for accounts in this category
+        for account, amount in flows.items():
             # Check if this account matches any in our category
             for category_account in category:
                 if account.startswith(category_account):
-                    try:
-                        amount = round(float(amount_str.strip()))
-                    except ValueError:
-                        continue
-
-                    name = self.get_account_short_name(account)
                     # Convert underscores to spaces for display
-                    display_name = name.replace("_", " ")
+                    display_name = accounts.short_name(account).replace("_", " ")
 
                     # Reverse sign for cash flow presentation
                     # Related accounts show the opposite side of the transaction
-                    cash_flow = -amount
-
-                    result[display_name] = cash_flow
-                    total += cash_flow
+                    lines.append(Line(display_name, account, -round(amount)))
                     break
 
-        result["category_total"] = total
-        return result
+        return Section(category_name, tuple(lines), sum(line.amount for line in lines))
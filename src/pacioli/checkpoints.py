@@ -0,0 +1,126 @@
+"""Persist account balances at the start of closed periods.
+
+Classes
+-------
+CheckpointStore
+
+Functions
+---------
+latest_closed_month
+"""
+
+import datetime
+import re
+
+from pacioli.stores import JsonStore
+
+DATE_PATTERN = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+
+
+def latest_closed_month(close_after_days, today=None) -> datetime.date:
+    """Return the first day of the month after the last closed month.
+
+    Everything before this date is closed.
+
+    Parameters
+    ----------
+    close_after_days: int
+        Days after the end of a month before it is closed.
+    today: datetime.date
+        Defaults to today.
+
+    Returns
+    -------
+    datetime.date
+        Start of the earliest open month.
+    """
+    today = today or datetime.date.today()
+    closed = today - datetime.timedelta(days=close_after_days)
+    return datetime.date(closed.year, closed.month, 1)
+
+
+class CheckpointStore(JsonStore):
+    """Closing balances of every account at month boundaries.
+
+    A month is closed once it ended more than close_after_days ago.  The
+    checkpoint for a closed boundary holds each account's own balance from
+    all transactions before that date, so a balance at a later date only
+    needs the transactions after the boundary.
+
+    Methods
+    -------
+    boundary(date)
+        Returns the nearest closed boundary on or before date.
+    get(boundary)
+        Returns the stored checkpoint for a boundary.
+    put(boundary, fingerprint, balances)
+        Stores a checkpoint.
+    """
+
+    kind = "checkpoints"
+
+    def __init__(self, path, close_after_days) -> None:
+        """Load the stored checkpoints.
+
+        Parameters
+        ----------
+        path: str
+            JSON file the checkpoints are stored in.
+        close_after_days: int
+            Days after the end of a month before it is closed.
+        """
+        super().__init__(path)
+        self.close_after_days = close_after_days
+
+    def boundary(self, date, today=None) -> str | None:
+        """Return the nearest closed month boundary on or before date.
+
+        Parameters
+        ----------
+        date: str
+            Ledger end date in YYYY/MM/DD form, or '' for no end date.
+        today: datetime.date
+            Defaults to today.
+
+        Returns
+        -------
+        str or None
+            The boundary as YYYY/MM/DD, or None if no checkpoint applies
+            (e.g. the date is not in YYYY/MM/DD form).
+        """
+        latest = latest_closed_month(self.close_after_days, today)
+
+        if date == "":
+            boundary = latest
+        else:
+            match = DATE_PATTERN.match(date)
+            if not match:
+                return None
+            year, month, _ = (int(part) for part in match.groups())
+            boundary = min(datetime.date(year, month, 1), latest)
+
+        return f"{boundary.year}/{boundary.month}/1"
+
+    def get(self, boundary) -> dict | None:
+        """Return the checkpoint for a boundary.
+
+        Returns
+        -------
+        dict or None
+            {'fingerprint': str, 'balances': {account: balance}}
+        """
+        return self.read(boundary)
+
+    def put(self, boundary, fingerprint, balances) -> None:
+        """Store a checkpoint.
+
+        Parameters
+        ----------
+        boundary: str
+            Boundary date.
+        fingerprint: str
+            Journal fingerprint the balances were computed from.
+        balances: dict
+            Full account name mapped to the account's own balance.
+        """
+        self.write(boundary, {"fingerprint": fingerprint, "balances": balances})
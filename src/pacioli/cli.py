@@ -1,50 +1,161 @@
+import os
+import sys
+
 import click
 
 from pacioli import __version__
-from pacioli.balance_sheet import BalanceSheet
-from pacioli.cash_flow_statement import CashFlowStatement
-from pacioli.income_statement import IncomeStatement
-from pacioli.utils import month_to_dates, period_to_dates
+from pacioli.accounts import is_pattern
+from pacioli.backend import REPORTS, ReportBackend
+from pacioli.completion import bash_script, complete_period, zsh_script
+from pacioli.consolidation import Consolidation
+from pacioli.daemon import FORWARDED_COMMANDS, Daemon, forward
+from pacioli.pacioli import LedgerError
+from pacioli.pdf import PdfBuilder
+from pacioli.server import ReportServer
+from pacioli.utils import atomic_open, month_to_dates, period_to_dates, slugify
+from pacioli.watch import Watcher
+
+
+class PacioliGroup(click.Group):
+    """Command group that remembers its arguments so they can be forwarded."""
 
+    def parse_args(self, ctx, args):
+        """Save the raw arguments before parsing them."""
+        ctx.meta["pacioli.argv"] = list(args)
+        return super().parse_args(ctx, args)
 
-@click.group()
+
+@click.group(cls=PacioliGroup)
 @click.version_option(version=__version__, prog_name="pacioli")
 @click.option(
     "--config",
     "-c",
     default="~/.config/pacioli/config.yml",
+    type=click.Path(dir_okay=False),
     help="Path of config file.",
 )
+@click.option(
+    "--explain",
+    is_flag=True,
+    help="Print the ledger queries a report would run instead of the report.",
+)
 @click.pass_context
-def cli(ctx, config) -> None:
+def cli(ctx, config, explain) -> None:
     """
     Pacioli generates LaTeX financial reports from Ledger CLI journal
     files.
     """
     ctx.ensure_object(dict)
-    ctx.obj["balance_sheet"] = BalanceSheet(config_file=config)
-    ctx.obj["income_statement"] = IncomeStatement(config_file=config)
-    ctx.obj["cash_flow_statement"] = CashFlowStatement(config_file=config)
+    if ctx.invoked_subcommand == "completion":
+        # Scripts are generated from the commands alone, without a config
+        return
+
+    # Answer from a running daemon when there is one; it already has the
+    # config, templates and recent reports loaded.
+    if "backend" not in ctx.obj and ctx.invoked_subcommand in FORWARDED_COMMANDS:
+        code = forward(config, ctx.meta["pacioli.argv"], sys.stdout, sys.stderr)
+        if code is not None:
+            ctx.exit(code)
+
+    backend = ctx.obj.get("backend") or ReportBackend(config_file=config)
+    ctx.obj["backend"] = backend
+    ctx.obj["explain"] = explain
+    ctx.obj["balance_sheet"] = backend.balance_sheet
+    ctx.obj["income_statement"] = backend.income_statement
+    ctx.obj["cash_flow_statement"] = backend.cash_flow_statement
+
+
+def write_report(
+    ctx, report, start_date, end_date, out_file, pdf=False, output_format="tex"
+) -> None:
+    """Render a report to OUT_FILE, reusing cached output when running in the daemon.
+
+    Reports are streamed to the file as they are rendered, and files are
+    only replaced once the report is complete.  With --explain the report's
+    query plan is printed and the command exits.  With pdf the file is then
+    built into a PDF next to it.  The json and csv formats write the
+    statement's amounts without rendering or formatting them.
+    """
+    backend = ctx.obj["backend"]
+    if pdf and out_file == "-":
+        raise click.UsageError("--pdf needs an OUT_FILE.")
+    if pdf and output_format != "tex":
+        raise click.UsageError("--pdf needs the tex format.")
+    try:
+        if ctx.obj.get("explain"):
+            click.echo(backend.explain(report, start_date, end_date))
+            ctx.exit(0)
+        if output_format != "tex":
+            statement = backend.build_report(report, start_date, end_date)
+            text = statement.to_json() + "\n" if output_format == "json" else statement.to_csv()
+            if out_file == "-":
+                click.echo(text, nl=False)
+            else:
+                with atomic_open(out_file) as f:
+                    f.write(text)
+        elif ctx.obj.get("daemon"):
+            text = backend.get_response(report, start_date, end_date)[1]
+            if out_file == "-":
+                click.echo(text)
+            else:
+                with atomic_open(out_file) as f:
+                    f.write(text)
+        elif out_file == "-":
+            backend.write(report, start_date, end_date, sys.stdout)
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+        else:
+            with atomic_open(out_file) as f:
+                backend.write(report, start_date, end_date, f)
+    except LedgerError as error:
+        raise click.ClickException(str(error))
+    if pdf:
+        build_pdfs(ctx, [out_file])
+
+
+def build_pdfs(ctx, tex_files, force=False) -> None:
+    """Build tex files into PDFs in parallel, skipping unchanged files.
+
+    Exits with status 1 if any build failed.
+    """
+    try:
+        builder = PdfBuilder.from_config(ctx.obj["backend"].config)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    failed = False
+    for build in builder.build(tex_files, force=force):
+        if build.error:
+            click.echo(f"Unable to build {build.pdf_file}: {build.error}", err=True)
+            failed = True
+        elif build.built:
+            click.echo(f"Wrote {build.pdf_file}", err=True)
+        else:
+            click.echo(f"Unchanged {build.pdf_file}", err=True)
+    if failed:
+        ctx.exit(1)
 
 
 @cli.command()
 @click.argument("out-file", type=click.Path(allow_dash=True), default="-")
 @click.option("--end-date", "-e", default="", help="Limit the report to transactions before date.")
+@click.option("--pdf", is_flag=True, help="Also build OUT_FILE into a PDF.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["tex", "json", "csv"]),
+    default="tex",
+    show_default=True,
+    help="Output format. json and csv write the unformatted amounts.",
+)
 @click.pass_context
-def balance_sheet(ctx, out_file, end_date) -> None:
+def balance_sheet(ctx, out_file, end_date, pdf, output_format) -> None:
     """
     Run a balance report using the  account mappings defined in the config file.
 
     OUT_FILE is the path to the file to write the tex file. Defaults to standard
     output if not specified. Use '-' for explicit stdout.
     """
-    balance_sheet = ctx.obj["balance_sheet"]
-
-    if out_file != "-":
-        with click.open_file(out_file, "w") as f:
-            f.write(balance_sheet.print_report(date=end_date))
-    else:
-        click.echo(balance_sheet.print_report(date=end_date))
+    write_report(ctx, "balance-sheet", "", end_date, out_file, pdf, output_format)
 
 
 @cli.command()
@@ -57,19 +168,29 @@ def balance_sheet(ctx, out_file, end_date) -> None:
     "--period",
     "-p",
     default="",
+    shell_complete=complete_period,
     help="Period description (e.g., 'last month', 'Jan to Mar', 'Jan 2024 to Mar 2024').",
 )
+@click.option("--pdf", is_flag=True, help="Also build OUT_FILE into a PDF.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["tex", "json", "csv"]),
+    default="tex",
+    show_default=True,
+    help="Output format. json and csv write the unformatted amounts.",
+)
 @click.argument("out-file", type=click.Path(allow_dash=True), default="-")
 @click.pass_context
-def income_statement(ctx, begin_date, end_date, month, period, out_file) -> None:
+def income_statement(
+    ctx, begin_date, end_date, month, period, pdf, output_format, out_file
+) -> None:
     """
     Run a income statement for a set time period.
 
     OUT_FILE is the path to the file to write the tex file. Defaults to standard
     output if not specified. Use '-' for explicit stdout.
     """
-    income_statement = ctx.obj["income_statement"]
-
     if begin_date == end_date == month == period == "":
         raise click.UsageError("Please enter a valid begin-date and end-date, month, or period.")
     elif period != "":
@@ -81,12 +202,7 @@ def income_statement(ctx, begin_date, end_date, month, period, out_file) -> None
         )
         begin_date, end_date = month_to_dates(month)
 
-    report = income_statement.print_report(begin_date, end_date)
-    if out_file != "-":
-        with click.open_file(out_file, "w") as f:
-            f.write(report)
-    else:
-        click.echo(report)
+    write_report(ctx, "income-statement", begin_date, end_date, out_file, pdf, output_format)
 
 
 @cli.command()
@@ -99,19 +215,29 @@ def income_statement(ctx, begin_date, end_date, month, period, out_file) -> None
     "--period",
     "-p",
     default="",
+    shell_complete=complete_period,
     help="Period description (e.g., 'last month', 'Jan to Mar', 'Jan 2024 to Mar 2024').",
 )
+@click.option("--pdf", is_flag=True, help="Also build OUT_FILE into a PDF.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["tex", "json", "csv"]),
+    default="tex",
+    show_default=True,
+    help="Output format. json and csv write the unformatted amounts.",
+)
 @click.argument("out-file", type=click.Path(allow_dash=True), default="-")
 @click.pass_context
-def cash_flow_statement(ctx, begin_date, end_date, month, period, out_file) -> None:
+def cash_flow_statement(
+    ctx, begin_date, end_date, month, period, pdf, output_format, out_file
+) -> None:
     """
     Run a cash flow statement for a set time period.
 
     OUT_FILE is the path to the file to write the tex file. Defaults to standard
     output if not specified. Use '-' for explicit stdout.
     """
-    cash_flow_statement = ctx.obj["cash_flow_statement"]
-
     if begin_date == end_date == month == period == "":
         raise click.UsageError("Please enter a valid begin-date and end-date, month, or period.")
     elif period != "":
@@ -123,9 +249,363 @@ def cash_flow_statement(ctx, begin_date, end_date, month, period, out_file) -> N
         )
         begin_date, end_date = month_to_dates(month)
 
-    report = cash_flow_statement.print_report(begin_date, end_date)
-    if out_file != "-":
-        with click.open_file(out_file, "w") as f:
-            f.write(report)
+    write_report(ctx, "cash-flow-statement", begin_date, end_date, out_file, pdf, output_format)
+
+
+@cli.command()
+@click.option("--begin-date", "-b", default="", help="Start date for transactions.")
+@click.option("--end-date", "-e", default="", help="Limit the report to transactions BEFORE date.")
+@click.option(
+    "--period",
+    "-p",
+    default="",
+    shell_complete=complete_period,
+    help="Period description (e.g., 'last month', 'Jan to Mar', 'Jan 2024 to Mar 2024').",
+)
+@click.option("--pdf", is_flag=True, help="Also build OUT_FILE into a PDF.")
+@click.argument("out-file", type=click.Path(allow_dash=True), default="-")
+@click.pass_context
+def general_ledger(ctx, begin_date, end_date, period, pdf, out_file) -> None:
+    """
+    Run the general ledger, every posting to the mapped accounts in a period.
+
+    Postings are grouped by account with opening balances and running
+    balances, for use as an appendix to the statements. OUT_FILE is the path
+    to the file to write the tex file. Defaults to standard output if not
+    specified. Use '-' for explicit stdout.
+    """
+    if begin_date == end_date == period == "":
+        raise click.UsageError("Please enter a valid begin-date and end-date, or period.")
+    elif period != "":
+        begin_date, end_date = period_to_dates(period)
+
+    write_report(ctx, "general-ledger", begin_date, end_date, out_file, pdf)
+
+
+@cli.command(name="all")
+@click.argument("output-dir", type=click.Path(file_okay=False), default=".")
+@click.option("--begin-date", "-b", default="", help="Start date for transactions.")
+@click.option("--end-date", "-e", default="", help="Limit the reports to transactions BEFORE date.")
+@click.option(
+    "--period",
+    "-p",
+    default="",
+    shell_complete=complete_period,
+    help="Period description (e.g., 'last month', 'Jan to Mar', 'Jan 2024 to Mar 2024').",
+)
+@click.option("--strict", is_flag=True, help="Exit with status 1 if the statements disagree.")
+@click.option("--pdf", is_flag=True, help="Also build the statements into PDFs in parallel.")
+@click.pass_context
+def all_statements(ctx, output_dir, begin_date, end_date, period, strict, pdf) -> None:
+    """
+    Run every statement for one period from a single data load.
+
+    Writes the balance sheet as of the end of the period, the income statement
+    and the cash flow statement to OUTPUT_DIR as <report>_<period>.tex, and
+    each variant template in the config as <report>-<variant>_<period> with
+    its template's extension, then checks that the statements agree, e.g.
+    that ending cash matches the cash accounts on the balance sheet. With
+    --pdf the tex files are then built into PDFs.
+    """
+    if period != "":
+        begin_date, end_date = period_to_dates(period)
+        label = period
+    elif begin_date and end_date:
+        label = f"{begin_date} to {end_date}"
     else:
-        click.echo(report)
+        raise click.UsageError("Please enter a period or begin-date and end-date.")
+
+    backend = ctx.obj["backend"]
+    try:
+        if ctx.obj.get("explain"):
+            click.echo(backend.explain("all", begin_date, end_date))
+            return
+        reports, problems = backend.render_all(begin_date, end_date)
+    except (LedgerError, ValueError) as error:
+        raise click.ClickException(str(error))
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for (report, variant), text in reports.items():
+        name = f"{report}-{slugify(variant)}" if variant else report
+        extension = os.path.splitext(backend.report_templates(report)[variant])[1] or ".tex"
+        path = os.path.join(output_dir, f"{name}_{slugify(label)}{extension}")
+        with atomic_open(path) as f:
+            f.write(text)
+        click.echo(f"Wrote {path}", err=True)
+        if extension == ".tex":
+            paths.append(path)
+
+    for problem in problems:
+        click.echo(f"Warning: {problem}", err=True)
+    if pdf:
+        build_pdfs(ctx, paths)
+    if problems and strict:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument("output-dir", type=click.Path(file_okay=False), default=".")
+@click.option("--begin-date", "-b", default="", help="Start date for transactions.")
+@click.option("--end-date", "-e", default="", help="Limit the reports to transactions BEFORE date.")
+@click.option(
+    "--period",
+    "-p",
+    default="",
+    shell_complete=complete_period,
+    help="Period description (e.g., 'last month', 'Jan to Mar', 'Jan 2024 to Mar 2024').",
+)
+@click.option(
+    "--entity",
+    "entities",
+    multiple=True,
+    type=click.Path(dir_okay=False),
+    help="Entity config file or journal, as PATH or NAME=PATH. Repeat for each entity.",
+)
+@click.option("--by-entity", is_flag=True, help="Add each entity's amounts next to the totals.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["tex", "json", "csv"]),
+    default="tex",
+    show_default=True,
+    help="Output format. json and csv write the unformatted amounts.",
+)
+@click.option("--strict", is_flag=True, help="Exit with status 1 if eliminations don't net out.")
+@click.option("--pdf", is_flag=True, help="Also build the statements into PDFs in parallel.")
+@click.pass_context
+def consolidate(
+    ctx, output_dir, begin_date, end_date, period, entities, by_entity, output_format, strict, pdf
+) -> None:
+    """
+    Run consolidated statements of several entities for one period.
+
+    Each entity is queried in parallel, its statements are added together
+    and the config's intercompany accounts are eliminated. Writes the
+    consolidated balance sheet, income statement and cash flow statement to
+    OUTPUT_DIR as consolidated-<report>_<period> in the chosen format.
+    Entities default to the consolidation section of the config file.
+    """
+    if pdf and output_format != "tex":
+        raise click.UsageError("--pdf needs the tex format.")
+    if period != "":
+        begin_date, end_date = period_to_dates(period)
+        label = period
+    elif begin_date and end_date:
+        label = f"{begin_date} to {end_date}"
+    else:
+        raise click.UsageError("Please enter a period or begin-date and end-date.")
+
+    sources = {}
+    for entity in entities:
+        name, _, path = entity.rpartition("=")
+        sources[name or os.path.splitext(os.path.basename(path))[0]] = path
+
+    try:
+        consolidation = Consolidation.from_config(ctx.obj["backend"], sources)
+        if ctx.obj.get("explain"):
+            click.echo(consolidation.explain(begin_date, end_date))
+            return
+        statements, problems = consolidation.build_all(begin_date, end_date)
+        outputs = {}
+        for report, consolidated in statements.items():
+            if output_format == "json":
+                outputs[report] = consolidated.to_json(by_entity) + "\n"
+            elif output_format == "csv":
+                outputs[report] = consolidated.to_csv(by_entity)
+            else:
+                outputs[report] = consolidation.render(consolidated, by_entity)
+    except (LedgerError, ValueError, FileNotFoundError) as error:
+        raise click.ClickException(str(error))
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for report, text in outputs.items():
+        path = os.path.join(output_dir, f"consolidated-{report}_{slugify(label)}.{output_format}")
+        with atomic_open(path) as f:
+            f.write(text)
+        click.echo(f"Wrote {path}", err=True)
+        paths.append(path)
+
+    for problem in problems:
+        click.echo(f"Warning: {problem}", err=True)
+    if pdf:
+        build_pdfs(ctx, paths)
+    if problems and strict:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument("tex-files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", "-j", type=int, help="LaTeX builds to run at a time.")
+@click.option("--force", is_flag=True, help="Build every file, even if unchanged.")
+@click.pass_context
+def pdf(ctx, tex_files, workers, force) -> None:
+    """
+    Build tex files into PDFs in parallel.
+
+    Each PDF is written next to its TEX_FILE. Files unchanged since their
+    last successful build are skipped. Exits with status 1 if any build
+    failed.
+    """
+    if workers:
+        ctx.obj["backend"].config.pdf_workers = workers
+    build_pdfs(ctx, list(tex_files), force=force)
+
+
+@cli.command()
+@click.argument("output-dir", type=click.Path(file_okay=False), required=False)
+@click.option(
+    "--report",
+    "-r",
+    "reports",
+    multiple=True,
+    type=click.Choice(REPORTS),
+    help="Report to keep current. May be repeated. Defaults to the config file.",
+)
+@click.option(
+    "--period",
+    "-p",
+    "periods",
+    multiple=True,
+    shell_complete=complete_period,
+    help="Period to generate reports for. May be repeated. Defaults to the config file.",
+)
+@click.option("--interval", "-i", type=float, help="Seconds between checks for changes.")
+@click.option("--once", is_flag=True, help="Regenerate stale reports once and exit.")
+@click.pass_context
+def watch(ctx, output_dir, reports, periods, interval, once) -> None:
+    """
+    Regenerate reports whenever the journal or templates change.
+
+    Every report is generated for every period and written to OUTPUT_DIR,
+    replacing the previous file atomically. Only reports whose inputs changed
+    are re-run.
+    """
+    backend = ctx.obj["backend"]
+    config = backend.config
+    watcher = Watcher(
+        backend,
+        output_dir=output_dir or config.watch_output_dir,
+        reports=list(reports) or config.watch_reports,
+        periods=list(periods) or config.watch_periods,
+        interval=interval or config.watch_interval,
+    )
+
+    def echo_written(paths):
+        for path in paths:
+            click.echo(f"Wrote {path}", err=True)
+
+    if once:
+        echo_written(watcher.poll())
+        return
+
+    try:
+        watcher.run(callback=echo_written)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option("--port", default=8000, show_default=True, help="Port to listen on.")
+@click.pass_context
+def serve(ctx, port) -> None:
+    """
+    Serve reports over HTTP on localhost.
+
+    Reports are available at /balance-sheet?date=, /income-statement?period=
+    and /cash-flow?period=. Add format=json for the unformatted values.
+    Responses are cached until the journal changes.
+    """
+    server = ReportServer(ctx.obj["backend"], port=port)
+    server.backend.start_warming()
+    click.echo(f"Serving reports on http://127.0.0.1:{server.server_port}/", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@cli.command()
+@click.option("--socket", "socket_file", help="Path of the Unix socket to listen on.")
+@click.pass_context
+def daemon(ctx, socket_file) -> None:
+    """
+    Answer report commands from a warm background process.
+
+    While the daemon is running, balance-sheet, income-statement and
+    cash-flow-statement are forwarded to it over a Unix socket. Reports are
+    cached until the journal changes. Without a daemon, commands run
+    in-process as usual.
+    """
+    backend = ctx.obj["backend"]
+    server = Daemon(path=socket_file, backends={backend.config.config_file: backend})
+    server.start_warming()
+    click.echo(f"Listening on {server.server_address}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@cli.command()
+@click.pass_context
+def warm(ctx) -> None:
+    """
+    Precompute the most commonly requested reports.
+
+    Renders this month, last month, year to date and the last closed quarter,
+    plus today's balance sheet, if the journal changed since they were last
+    computed. Run it from cron or an editor save hook while a daemon is
+    running so the next request is answered from the cache. Without a
+    daemon the reports are written to the output cache, which must be on.
+    """
+    backend = ctx.obj["backend"]
+    if not ctx.obj.get("daemon") and backend.outputs is None:
+        raise click.ClickException(
+            "No daemon is running and the output cache is off, so there is nothing to warm. "
+            "Start `pacioli daemon` or set output: cache: true in the config file."
+        )
+    count = backend.warm()
+    click.echo(f"Warmed {count} reports", err=True)
+
+
+@cli.command()
+@click.pass_context
+def check(ctx) -> None:
+    """
+    Check the accounts in the config file against the journal.
+
+    Lists every account mapped in the config file that has no postings in the
+    journal, with the closest matching accounts. Exits with status 1 if any
+    are found.
+    """
+    unknown = ctx.obj["backend"].balance_sheet.check_accounts()
+    for category, accounts in unknown.items():
+        for account, matches in accounts.items():
+            if is_pattern(account):
+                click.echo(f"{category}: pattern '{account}' matches no accounts")
+                continue
+            hint = f" (did you mean {', '.join(matches)}?)" if matches else ""
+            click.echo(f"{category}: unknown account '{account}'{hint}")
+    if unknown:
+        ctx.exit(1)
+    click.echo("All accounts in the config file are in the journal.")
+
+
+@cli.command()
+@click.argument("shell", type=click.Choice(["bash", "zsh"]))
+def completion(shell) -> None:
+    """
+    Print the completion script of a shell.
+
+    The script lists every command and option and reads periods from the
+    completion cache, so completing never starts pacioli. The scripts in
+    completions/ are its output; install it again after upgrading.
+    """
+    script = bash_script(cli) if shell == "bash" else zsh_script(cli)
+    click.echo(script, nl=False)
@@ -0,0 +1,514 @@
+"""Shell completion scripts and the values they offer.
+
+The completion scripts in completions/ are generated from the click
+commands by `pacioli completion SHELL`, so they list every command and
+option without starting Python.  Values of options completed by
+complete_period or complete_account are read from a cache directory, so
+completing an account or period never runs ledger either.  It holds one
+value per line in:
+
+- accounts: every account in the most recently used journal.
+- periods-YYYY-MM: period descriptions understood by --period, which
+  name months relative to the month they were written in.
+
+Functions
+---------
+cache_dir
+periods_cache_name
+period_suggestions
+write_cache
+read_cache
+complete_period
+complete_account
+value_kind
+bash_script
+zsh_script
+"""
+
+import calendar
+import datetime
+import os
+
+import click
+from click.shell_completion import CompletionItem
+
+from pacioli.config import Config
+from pacioli.utils import atomic_write, common_periods
+
+
+def cache_dir() -> str:
+    """Return the directory the completion cache is stored in."""
+    return os.path.join(Config.get_cache_path(), "completion")
+
+
+def periods_cache_name(today=None) -> str:
+    """Return the name of the cached periods of a month, e.g. 'periods-2024-02'.
+
+    Parameters
+    ----------
+    today: datetime.date
+        Defaults to today.
+    """
+    today = today or datetime.date.today()
+    return f"periods-{today.year}-{today.month:02d}"
+
+
+def period_suggestions(today=None) -> list[str]:
+    """Return the period descriptions offered for --period.
+
+    Parameters
+    ----------
+    today: datetime.date
+        Defaults to today.
+
+    Returns
+    -------
+    list[str]
+        Common periods followed by each of the last twelve months.
+    """
+    today = today or datetime.date.today()
+    periods = common_periods()
+    year, month = today.year, today.month
+    for _ in range(12):
+        periods.append(f"{calendar.month_name[month]} {year}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(dict.fromkeys(periods))
+
+
+def write_cache(accounts, directory=None) -> None:
+    """Store the values offered by completion.
+
+    Files are only rewritten when their contents change.
+
+    Parameters
+    ----------
+    accounts: iterable
+        Full account names.
+    directory: str
+        Cache directory. Defaults to cache_dir().
+    """
+    directory = directory or cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    periods = periods_cache_name()
+    contents = {
+        "accounts": "".join(f"{account}\n" for account in sorted(accounts)),
+        periods: "".join(f"{period}\n" for period in period_suggestions()),
+    }
+    # Periods of earlier months are never read again
+    for name in os.listdir(directory):
+        if name.startswith("periods-") and name != periods:
+            os.remove(os.path.join(directory, name))
+    for name, text in contents.items():
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as cached:
+                if cached.read() == text:
+                    continue
+        except OSError:
+            pass
+        atomic_write(path, text)
+
+
+def read_cache(name, directory=None) -> list[str]:
+    """Return the cached values of one kind, e.g. 'accounts'.
+
+    Returns
+    -------
+    list[str]
+        Cached values, or an empty list if nothing is cached yet.
+    """
+    path = os.path.join(directory or cache_dir(), name)
+    try:
+        with open(path) as cached:
+            return cached.read().splitlines()
+    except OSError:
+        return []
+
+
+def complete_period(ctx, param, incomplete) -> list[CompletionItem]:
+    """Complete --period options from the cache."""
+    periods = read_cache(periods_cache_name()) or period_suggestions()
+    return [
+        CompletionItem(period)
+        for period in periods
+        if period.lower().startswith(incomplete.lower())
+    ]
+
+
+def complete_account(ctx, param, incomplete) -> list[CompletionItem]:
+    """Complete account options from the cache."""
+    return [
+        CompletionItem(account)
+        for account in read_cache("accounts")
+        if account.lower().startswith(incomplete.lower())
+    ]
+
+
+# Option values the scripts read from the cache, by the shell_complete
+# function dynamic completion uses for them
+CACHED_VALUES = {complete_period: "periods", complete_account: "accounts"}
+
+
+def value_kind(param) -> str | None:
+    """Return how the completion scripts complete a parameter's values.
+
+    Parameters
+    ----------
+    param: click.Parameter
+
+    Returns
+    -------
+    str or None
+        'periods' or 'accounts' for values read from the cache, 'choice',
+        'dirs' or 'files', or None for values that aren't completed.
+    """
+    # click keeps the shell_complete function of a parameter here
+    completer = getattr(param, "_custom_shell_complete", None)
+    if completer in CACHED_VALUES:
+        return CACHED_VALUES[completer]
+    if isinstance(param.type, click.Choice):
+        return "choice"
+    if isinstance(param.type, click.Path):
+        return "files" if param.type.file_okay else "dirs"
+    return None
+
+
+def option_names(params) -> list[str]:
+    """Return the option strings of parameters, e.g. ['--period', '-p']."""
+    names = []
+    for param in params:
+        if isinstance(param, click.Option):
+            names.extend(param.opts + param.secondary_opts)
+    return names
+
+
+def option_values(group) -> list[tuple[str, list[str], str | None, list[str]]]:
+    """Return the options that take a value, with how it is completed.
+
+    Returns
+    -------
+    list
+        (command, option strings, kind, choices) for each option, where
+        command is '' for options of the group.  See value_kind().
+    """
+    commands = [("", group), *group.commands.items()]
+    values = []
+    for name, command in commands:
+        for param in command.params:
+            if not isinstance(param, click.Option) or param.is_flag or param.count:
+                continue
+            kind = value_kind(param)
+            choices = list(param.type.choices) if isinstance(param.type, click.Choice) else []
+            values.append((name, param.opts + param.secondary_opts, kind, choices))
+    return values
+
+
+def argument_choices(group) -> list[tuple[str, list[str]]]:
+    """Return the commands whose arguments are choices, with the choices."""
+    return [
+        (name, list(param.type.choices))
+        for name, command in group.commands.items()
+        for param in command.params
+        if isinstance(param, click.Argument) and isinstance(param.type, click.Choice)
+    ]
+
+
+def command_options(group) -> list[tuple[str, str]]:
+    """Return each command and its option strings, then the group's options."""
+    options = [
+        (name, " ".join([*option_names(command.params), "--help"]))
+        for name, command in group.commands.items()
+    ]
+    return [*options, ("*", " ".join([*option_names(group.params), "--help"]))]
+
+
+SCRIPT_HEADER = """# {shell} completion for pacioli.
+#
+# Generated from the click commands by `pacioli completion {command}`; run it
+# again rather than editing this file.  Periods and accounts are read from
+# the cache pacioli refreshes whenever the journal changes, so completing
+# never starts pacioli or runs ledger.
+"""
+
+BASH_HELPERS = """
+_pacioli_complete_lines() {
+    # Add the lines of a cache file starting with the current word.
+    local file line
+    file="${XDG_CACHE_HOME:-$HOME/.cache}/pacioli/completion/$1"
+    [[ -r $file ]] || return 1
+    while IFS= read -r line; do
+        [[ $line == "$2"* ]] && COMPREPLY+=("$line")
+    done < "$file"
+    return 0
+}
+"""
+
+BASH_PERIODS = """
+_pacioli_periods() {
+    local IFS=$'\\n' month
+    # Periods are cached per month since they name months relative to the
+    # month they were written in.
+    printf -v month '%(%Y-%m)T' -1
+    _pacioli_complete_lines "periods-$month" "$1" \\
+        || COMPREPLY=($(compgen -W $'this month\\nlast month' -- "$1"))
+    # Periods contain spaces; quote them as one word.
+    COMPREPLY=("${COMPREPLY[@]// /\\\\ }")
+}
+"""
+
+BASH_ACCOUNTS = """
+_pacioli_accounts() {
+    _pacioli_complete_lines accounts "$1"
+    if declare -F __ltrim_colon_completions > /dev/null; then
+        __ltrim_colon_completions "$1"
+    fi
+}
+"""
+
+
+def value_cases(values, actions) -> list[tuple[str, str]]:
+    """Return the case patterns of options completed the same way and their action.
+
+    Parameters
+    ----------
+    values: list
+        From option_values().
+    actions: dict
+        Value kind mapped to the shell code completing it; choices are
+        completed by calling it with the choices.
+
+    Returns
+    -------
+    list
+        ('"cmd -p"|"cmd --period"|...', action) in the order options appear,
+        with the patterns of each command on a line of their own.
+    """
+    cases: dict[str, dict[str, list[str]]] = {}
+    for command, opts, kind, choices in values:
+        action = actions["choice"](choices) if kind == "choice" else actions[kind]
+        patterns = cases.setdefault(action, {}).setdefault(command, [])
+        patterns.extend(f'"{command} {opt}"' for opt in opts)
+    return [
+        ("|\\\n        ".join("|".join(patterns) for patterns in commands.values()), action)
+        for action, commands in cases.items()
+    ]
+
+
+def bash_script(group) -> str:
+    """Return the bash completion script of a click group.
+
+    Parameters
+    ----------
+    group: click.Group
+        The pacioli command group.
+
+    Returns
+    -------
+    str
+        Script completing commands, options and their values.
+    """
+    values = option_values(group)
+    kinds = {kind for _, _, kind, _ in values}
+    lines = [SCRIPT_HEADER.format(shell="Bash", command="bash")]
+    lines.append(f'_pacioli_commands="{" ".join(group.commands)}"\n')
+    lines.append("_pacioli_command_options() {")
+    lines.append('    case "$1" in')
+    for name, options in command_options(group):
+        lines.append(f'        {name}) echo "{options}" ;;')
+    lines.append("    esac")
+    lines.append("}")
+    lines.append(BASH_HELPERS.rstrip("\n"))
+    if "periods" in kinds:
+        lines.append(BASH_PERIODS.rstrip("\n"))
+    if "accounts" in kinds:
+        lines.append(BASH_ACCOUNTS.rstrip("\n"))
+
+    group_values = [opt for name, opts, _, _ in values if not name for opt in opts]
+    lines.append(
+        """
+_pacioli_completion() {
+    local cur prev word command i
+    cur="${COMP_WORDS[COMP_CWORD]}"
+    prev="${COMP_WORDS[COMP_CWORD-1]}"
+
+    # Account names contain ':', which bash treats as a word break.
+    if declare -F _get_comp_words_by_ref > /dev/null; then
+        _get_comp_words_by_ref -n : cur prev
+    fi
+
+    for (( i = 1; i < COMP_CWORD; i++ )); do
+        word="${COMP_WORDS[i]}"
+        case "$word" in"""
+    )
+    if group_values:
+        lines.append(f"            {'|'.join(group_values)}) (( i++ )) ;;")
+    lines.append(
+        """            -*) ;;
+            *) command="$word"; break ;;
+        esac
+    done
+
+    COMPREPLY=()
+    case "$command $prev" in"""
+    )
+    actions = {
+        "periods": '_pacioli_periods "$cur"',
+        "accounts": '_pacioli_accounts "$cur"',
+        "files": "compopt -o default 2> /dev/null",
+        "dirs": "compopt -o dirnames 2> /dev/null",
+        "choice": lambda choices: f'COMPREPLY=($(compgen -W "{" ".join(choices)}" -- "$cur"))',
+        # Values such as dates and numbers aren't completed
+        None: ":",
+    }
+    for patterns, action in value_cases(values, actions):
+        lines.append(f"        {patterns})")
+        lines.append(f"            {action}")
+        lines.append("            return 0 ;;")
+    lines.append(
+        """    esac
+
+    if [[ $cur == -* ]]; then
+        COMPREPLY=($(compgen -W "$(_pacioli_command_options "$command")" -- "$cur"))
+    elif [[ -z $command ]]; then
+        COMPREPLY=($(compgen -W "$_pacioli_commands" -- "$cur"))
+    else
+        case "$command" in"""
+    )
+    for name, choices in argument_choices(group):
+        lines.append(
+            f'            {name}) COMPREPLY=($(compgen -W "{" ".join(choices)}" -- "$cur")) ;;'
+        )
+    lines.append(
+        """            # OUT_FILE, OUTPUT_DIR and TEX_FILES arguments
+            *) compopt -o default 2> /dev/null ;;
+        esac
+    fi
+    return 0
+}
+
+complete -o nosort -F _pacioli_completion pacioli"""
+    )
+    return "\n".join(lines) + "\n"
+
+
+ZSH_HELPERS = """
+_pacioli_cache_lines() {
+    local file="${XDG_CACHE_HOME:-$HOME/.cache}/pacioli/completion/$1"
+    [[ -r $file ]] || return 1
+    reply=("${(@f)$(<$file)}")
+}
+"""
+
+ZSH_PERIODS = """
+_pacioli_periods() {
+    local -a reply
+    local month
+    # Periods are cached per month since they name months relative to the
+    # month they were written in.
+    zmodload -F zsh/datetime b:strftime p:EPOCHSECONDS
+    strftime -s month %Y-%m $EPOCHSECONDS
+    _pacioli_cache_lines periods-$month || reply=("this month" "last month")
+    compadd -V periods -a reply
+}
+"""
+
+ZSH_ACCOUNTS = """
+_pacioli_accounts() {
+    local -a reply
+    _pacioli_cache_lines accounts && compadd -a reply
+}
+"""
+
+
+def zsh_script(group) -> str:
+    """Return the zsh completion script of a click group.
+
+    Parameters
+    ----------
+    group: click.Group
+        The pacioli command group.
+
+    Returns
+    -------
+    str
+        Script completing commands, with their short help, options and
+        their values.
+    """
+    values = option_values(group)
+    kinds = {kind for _, _, kind, _ in values}
+    lines = ["#compdef pacioli\n", SCRIPT_HEADER.format(shell="Zsh", command="zsh").rstrip("\n")]
+    lines.append(ZSH_HELPERS.rstrip("\n"))
+    if "periods" in kinds:
+        lines.append(ZSH_PERIODS.rstrip("\n"))
+    if "accounts" in kinds:
+        lines.append(ZSH_ACCOUNTS.rstrip("\n"))
+
+    lines.append(
+        """
+_pacioli_completion() {
+    local -a commands
+    local command i
+    commands=("""
+    )
+    for name, command in group.commands.items():
+        description = command.get_short_help_str(limit=45).replace(":", "\\:")
+        description = description.replace('"', '\\"')
+        lines.append(f'        "{name}:{description}"')
+    lines.append("    )")
+    group_values = [opt for name, opts, _, _ in values if not name for opt in opts]
+    lines.append(
+        """
+    for (( i = 2; i < CURRENT; i++ )); do
+        case "${words[i]}" in"""
+    )
+    if group_values:
+        lines.append(f"            {'|'.join(group_values)}) (( i++ )) ;;")
+    lines.append(
+        """            -*) ;;
+            *) command="${words[i]}"; break ;;
+        esac
+    done
+
+    case "$command ${words[CURRENT-1]}" in"""
+    )
+    actions = {
+        "periods": "_pacioli_periods",
+        "accounts": "_pacioli_accounts",
+        "files": "_files",
+        "dirs": "_files -/",
+        "choice": lambda choices: f"compadd -- {' '.join(choices)}",
+        # Values such as dates and numbers aren't completed
+        None: ":",
+    }
+    for patterns, action in value_cases(values, actions):
+        lines.append(f"        {patterns})")
+        lines.append(f"            {action}; return ;;")
+    lines.append("    esac")
+    lines.append(
+        """
+    if [[ ${words[CURRENT]} == -* ]]; then
+        case "$command" in"""
+    )
+    for name, options in command_options(group):
+        lines.append(f"            {name}) compadd -- {options} ;;")
+    lines.append(
+        """        esac
+    elif [[ -z $command ]]; then
+        _describe -V unsorted command commands
+    else
+        case "$command" in"""
+    )
+    for name, choices in argument_choices(group):
+        lines.append(f"            {name}) compadd -- {' '.join(choices)} ;;")
+    lines.append(
+        """            # OUT_FILE, OUTPUT_DIR and TEX_FILES arguments
+            *) _files ;;
+        esac
+    fi
+}
+
+compdef _pacioli_completion pacioli"""
+    )
+    return "\n".join(lines) + "\n"
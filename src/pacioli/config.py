@@ -13,13 +13,16 @@ import yaml
 class Config:
     """Reads the configuration settings from config file."""
 
-    def __init__(self, config_file=None):
+    def __init__(self, config_file=None, journal_file=None):
         """Verify the path for the config file.
 
         Parameters
         ----------
         config_file: str
             File path of config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file, e.g. for
+            one entity of a consolidation.
         """
         if not config_file:
             config_file = self.get_config_path()
@@ -32,6 +35,8 @@ class Config:
             raise FileNotFoundError(f"Config file not found: {self.config_file}")
 
         self.parse_config()
+        if journal_file:
+            self.journal_file = os.path.expanduser(journal_file)
 
     @staticmethod
     def get_config_path() -> str:
@@ -52,6 +57,22 @@ class Config:
 
         return config_file
 
+    @staticmethod
+    def get_cache_path() -> str:
+        """Get the cache directory based on XDG_CACHE_HOME.
+
+        If XDG_CACHE_HOME not set defaults to ~/.cache/pacioli.
+
+        Return
+        ------
+        str
+            Path of the cache directory.
+        """
+        xdg_cache = os.environ.get("XDG_CACHE_HOME")
+        if not xdg_cache:
+            return os.path.expanduser("~/.cache/pacioli")
+        return os.path.join(xdg_cache, "pacioli")
+
     def parse_config(self):
         """Read the config file and import settings."""
         with open(self.config_file) as config:
@@ -62,6 +83,17 @@ class Config:
 
             self.income_sheet_template = os.path.expanduser(data["income_sheet_template"])
             self.cash_flow_template = os.path.expanduser(data["cash_flow_template"])
+            self.general_ledger_template = os.path.expanduser(
+                data.get("general_ledger_template", "templates/general_ledger.tex")
+            )
+
+            # Further templates of each statement rendered by `pacioli all`
+            # from the same data: report name mapped to variant name and
+            # template path.
+            self.variants = {
+                report: {name: os.path.expanduser(path) for name, path in templates.items()}
+                for report, templates in (data.get("variants") or {}).items()
+            }
             if data["effective"]:
                 self.effective = "--effective"
             else:
@@ -82,6 +114,15 @@ class Config:
                     self.market = "--market"
             else:
                 self.market = None
+            # Currency market values are converted to, or None for each
+            # commodity's own price currency
+            self.exchange = data["market"] if isinstance(data.get("market"), str) else None
+
+            # Commodities are valued from an in-process index of the price
+            # history unless index is false.  db is an extra price database.
+            prices = data.get("prices") or {}
+            self.price_index = prices.get("index", True)
+            self.price_db = prices.get("db") and os.path.expanduser(prices["db"])
 
             # Process Balance Sheet account mappings
             self.current_assets = data["Current Assets"]
@@ -96,3 +137,89 @@ class Config:
             self.financing_activities = data["Financing Activities"]
 
             self.title = data["title"]
+
+            # Depth of the accounts listed on the income statement, either one
+            # depth or a depth per section, e.g. {Income: 2, Expenses: 3}.
+            self.income_statement_depth = data.get("income_statement_depth", 2)
+
+            # Number formatting: a locale name ('' for the environment's),
+            # digits after the decimal point and whether to add a currency
+            # symbol (true for the locale's, or the symbol itself).
+            formatting = data.get("formatting") or {}
+            self.locale = formatting.get("locale", "")
+            self.decimals = formatting.get("decimals", 0)
+            self.currency = formatting.get("currency", False)
+
+            # Characters of a rendered report collected before each write, and
+            # whether rendered reports are reused while their inputs are
+            # unchanged.
+            output = data.get("output") or {}
+            self.buffer_size = output.get("buffer_size", 65536)
+            self.output_cache = output.get("cache", False)
+
+            # Reports regenerated by `pacioli watch`
+            watch = data.get("watch") or {}
+            self.watch_output_dir = os.path.expanduser(watch.get("output_dir", "."))
+            self.watch_interval = watch.get("interval", 2)
+            self.watch_reports = watch.get(
+                "reports", ["balance-sheet", "income-statement", "cash-flow-statement"]
+            )
+            self.watch_periods = watch.get("periods", ["this month"])
+
+            # Periods precomputed by long running processes; None uses the
+            # most commonly requested periods.
+            self.warm_periods = data.get("warm_periods")
+
+            # Limits on each ledger process; None means no limit.
+            ledger = data.get("ledger") or {}
+            self.query_timeout = ledger.get("query_timeout")
+            self.report_timeout = ledger.get("report_timeout")
+            self.cpu_limit = ledger.get("cpu_limit")
+            self.memory_limit = ledger.get("memory_limit")
+
+            # Long periods are split into shards of this unit ('month',
+            # 'quarter' or 'year') that are queried in parallel.
+            sharding = data.get("sharding") or {}
+            self.shard_unit = sharding.get("unit")
+            self.shard_workers = sharding.get("workers", 4)
+
+            # LaTeX builds of --pdf and `pacioli pdf`: the engine ('latexmk',
+            # 'xelatex' or 'pdflatex'), builds run at a time (None for one
+            # per CPU) and seconds each build may take.
+            pdf = data.get("pdf") or {}
+            self.pdf_engine = pdf.get("engine", "latexmk")
+            self.pdf_workers = pdf.get("workers")
+            self.pdf_timeout = pdf.get("timeout", 300)
+
+            # Entities combined by `pacioli consolidate`: name mapped to an
+            # entity config file or to a journal read with this config, the
+            # intercompany accounts eliminated and entities queried at a time.
+            consolidation = data.get("consolidation") or {}
+            self.consolidation_entities = consolidation.get("entities") or {}
+            self.eliminations = consolidation.get("eliminations") or []
+            self.consolidation_workers = consolidation.get("workers", 4)
+
+            # Months that ended more than close_after_days ago are closed and
+            # get balance checkpoints.
+            closed_periods = data.get("closed_periods") or {}
+            self.close_after_days = closed_periods.get("close_after_days")
+
+    def account_mappings(self) -> dict[str, list[str]]:
+        """Return every config category that maps to ledger accounts.
+
+        Returns
+        -------
+        dict
+            Category name as written in the config file mapped to its list of
+            full account names.
+        """
+        return {
+            "Current Assets": self.current_assets,
+            "Longterm Assets": self.longterm_assets,
+            "Unsecured Liabilities": self.unsecured_liabilities,
+            "Secured Liabilities": self.secured_liabilities,
+            "Cash Accounts": self.cash_accounts,
+            "Operating Activities": self.operating_activities,
+            "Investing Activities": self.investing_activities,
+            "Financing Activities": self.financing_activities,
+        }
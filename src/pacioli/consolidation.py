@@ -0,0 +1,399 @@
+"""Combine the statements of several entities into consolidated statements.
+
+Each entity is a config file, or a journal read with the consolidating
+config's mappings.  Entities are queried in parallel, each answering every
+statement of the period from one query plan, and their statements are
+added line by line.  Intercompany accounts are then eliminated and the
+totals recomputed, so a group's internal balances and transactions don't
+inflate it.
+
+Classes
+-------
+Consolidated
+Consolidation
+
+Functions
+---------
+merge_lines
+merge_statements
+is_eliminated
+eliminate
+"""
+
+import csv
+import dataclasses
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from pacioli.accounts import compile_pattern, is_pattern
+from pacioli.backend import REPORTS, ReportBackend
+from pacioli.balance_sheet import BalanceSheet
+from pacioli.cash_flow_statement import CashFlowStatement
+from pacioli.income_statement import IncomeStatement
+from pacioli.results import CSV_COLUMNS, Line, Section, Statement
+
+# Report classes, which know how a statement's totals follow from its sections
+STATEMENT_CLASSES: dict[
+    str, type[BalanceSheet] | type[IncomeStatement] | type[CashFlowStatement]
+] = {
+    "balance-sheet": BalanceSheet,
+    "income-statement": IncomeStatement,
+    "cash-flow-statement": CashFlowStatement,
+}
+# Totals that eliminations leave unchanged when both sides of every
+# intercompany balance or transaction are eliminated
+BOTTOM_LINES = {
+    "balance-sheet": "total_equity",
+    "income-statement": "net_income",
+    "cash-flow-statement": "net_change_in_cash",
+}
+
+
+def merge_lines(line_groups) -> tuple[Line, ...]:
+    """Add up lines of the same account.
+
+    Parameters
+    ----------
+    line_groups: list
+        Tuples of lines, e.g. one section's lines from each entity.
+
+    Returns
+    -------
+    tuple
+        One line per account in the order accounts first appear, with the
+        children of each account merged in the same way.
+    """
+    accounts: dict[str, list[Line]] = {}
+    for lines in line_groups:
+        for line in lines:
+            accounts.setdefault(line.account, []).append(line)
+    return tuple(
+        Line(
+            same[0].name,
+            account,
+            sum(line.amount for line in same),
+            merge_lines([line.children for line in same]),
+        )
+        for account, same in accounts.items()
+    )
+
+
+def merge_statements(statements, title) -> Statement:
+    """Add up statements of the same report and period.
+
+    Parameters
+    ----------
+    statements: list
+        Statements of one report for the same dates.
+    title: str
+        Title of the combined statement.
+
+    Returns
+    -------
+    Statement
+        Sections and totals added by name, in the order they first appear.
+    """
+    names = dict.fromkeys(
+        section.name for statement in statements for section in statement.sections
+    )
+    sections = []
+    for name in names:
+        parts = [
+            section
+            for statement in statements
+            for section in statement.sections
+            if section.name == name
+        ]
+        sections.append(
+            Section(
+                name,
+                merge_lines([section.lines for section in parts]),
+                sum(section.total for section in parts),
+            )
+        )
+    totals: dict[str, int] = {}
+    for statement in statements:
+        for name, amount in statement.totals:
+            totals[name] = totals.get(name, 0) + amount
+    first = statements[0]
+    return Statement(
+        first.report,
+        title,
+        first.start_date,
+        first.end_date,
+        tuple(sections),
+        tuple(totals.items()),
+    )
+
+
+def is_eliminated(account, eliminations) -> bool:
+    """Return True if an account is one of the eliminated accounts or below one.
+
+    Parameters
+    ----------
+    account: str
+        Full account name.
+    eliminations: list
+        Account names and account patterns, as in config categories.
+    """
+    for entry in eliminations:
+        if is_pattern(entry):
+            if compile_pattern(entry).fullmatch(account):
+                return True
+        elif account == entry or account.startswith(entry + ":"):
+            return True
+    return False
+
+
+def eliminate_lines(lines, eliminations) -> tuple[tuple[Line, ...], int]:
+    """Return lines without eliminated accounts and the amount taken out."""
+    kept = []
+    removed = 0
+    for line in lines:
+        if is_eliminated(line.account, eliminations):
+            removed += line.amount
+            continue
+        children, removed_below = eliminate_lines(line.children, eliminations)
+        if removed_below:
+            line = Line(line.name, line.account, line.amount - removed_below, children)
+        kept.append(line)
+        removed += removed_below
+    return tuple(kept), removed
+
+
+def eliminate(statement, eliminations) -> Statement:
+    """Take intercompany accounts out of a statement.
+
+    Lines of eliminated accounts are removed, their amounts are taken out
+    of their parent lines and section, and the statement's totals are
+    recomputed from the sections.  Accounts are only found on lines of
+    their own, so an account rolled up into its parent by the income
+    statement depth isn't eliminated.
+
+    Parameters
+    ----------
+    statement: Statement
+    eliminations: list
+        Account names and account patterns.
+
+    Returns
+    -------
+    Statement
+    """
+    if not eliminations:
+        return statement
+    sections = {}
+    for section in statement.sections:
+        lines, removed = eliminate_lines(section.lines, eliminations)
+        sections[section.name] = Section(section.name, lines, section.total - removed)
+    totals = STATEMENT_CLASSES[statement.report].statement_totals(sections, statement.totals)
+    return dataclasses.replace(statement, sections=tuple(sections.values()), totals=totals)
+
+
+class Consolidated(NamedTuple):
+    """A consolidated statement and the entity statements it was built from.
+
+    Attributes
+    ----------
+    statement: Statement
+        The combined statement after eliminations.
+    entities: dict
+        Entity name mapped to its own statement.
+    """
+
+    statement: Statement
+    entities: dict[str, Statement]
+
+    def to_json(self, by_entity=False) -> str:
+        """Return the consolidated statement as JSON.
+
+        With by_entity it is under 'consolidated', next to 'entities'
+        mapping entity names to their statements.
+        """
+        if not by_entity:
+            return self.statement.to_json()
+        return json.dumps(
+            {
+                "consolidated": self.statement.to_dict(),
+                "entities": {name: entity.to_dict() for name, entity in self.entities.items()},
+            }
+        )
+
+    def to_csv(self, by_entity=False) -> str:
+        """Return the consolidated statement as CSV.
+
+        The rows are those of Statement.to_csv().  With by_entity the
+        amount column is followed by one column per entity and an
+        'eliminations' column, the consolidated amount less the entities'
+        amounts.
+        """
+        if not by_entity:
+            return self.statement.to_csv()
+        entity_amounts = [
+            {tuple(row[3:6]): row[6] for row in entity.rows()} for entity in self.entities.values()
+        ]
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow((*CSV_COLUMNS, *self.entities, "eliminations"))
+        for row in self.statement.rows():
+            amounts = [amounts.get(tuple(row[3:6]), 0) for amounts in entity_amounts]
+            writer.writerow((*row, *amounts, row[6] - sum(amounts)))
+        return out.getvalue()
+
+
+class Consolidation:
+    """Consolidated statements of several entities.
+
+    Methods
+    -------
+    from_config(backend, sources=None)
+        Returns the consolidation of the entities in a config.
+    build_all(start_date, end_date)
+        Returns every consolidated statement of a period.
+    render(consolidated, by_entity=False)
+        Returns a consolidated statement in tex format.
+    explain(start_date, end_date)
+        Returns the ledger queries of each entity.
+    """
+
+    def __init__(self, backend, entities, eliminations=(), workers=4) -> None:
+        """Set the entities.
+
+        Parameters
+        ----------
+        backend: ReportBackend
+            Backend of the consolidating config, whose title, templates
+            and formatting are used for the consolidated statements.
+        entities: dict
+            Entity name mapped to its ReportBackend.
+        eliminations: list
+            Intercompany account names and patterns.
+        workers: int
+            Entities queried at a time.
+        """
+        self.backend = backend
+        self.entities = entities
+        self.eliminations = list(eliminations)
+        self.workers = workers or 1
+
+    @classmethod
+    def from_config(cls, backend, sources=None) -> "Consolidation":
+        """Return the consolidation of the entities in a config.
+
+        Parameters
+        ----------
+        backend: ReportBackend
+            Backend of the consolidating config.
+        sources: dict
+            Entity name mapped to a config file or journal.  Defaults to
+            the config's consolidation entities.
+
+        Raises
+        ------
+        ValueError
+            If there are no entities.
+        """
+        config = backend.config
+        sources = sources or config.consolidation_entities
+        if not sources:
+            raise ValueError("No entities to consolidate.")
+        entities = {
+            name: cls.entity_backend(source, config.config_file) for name, source in sources.items()
+        }
+        return cls(backend, entities, config.eliminations, config.consolidation_workers)
+
+    @staticmethod
+    def entity_backend(source, config_file) -> ReportBackend:
+        """Return the backend of an entity.
+
+        Parameters
+        ----------
+        source: str
+            Entity config file ending in .yml or .yaml, or a journal read
+            with config_file.
+        config_file: str
+            The consolidating config file.
+        """
+        source = os.path.expanduser(source)
+        if source.endswith((".yml", ".yaml")):
+            return ReportBackend(config_file=source)
+        return ReportBackend(config_file=config_file, journal_file=source)
+
+    def build_all(self, start_date, end_date) -> tuple[dict[str, Consolidated], list[str]]:
+        """Return every consolidated statement of a period.
+
+        Entities are queried in parallel.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+            The balance sheets are as of end_date.
+
+        Returns
+        -------
+        tuple
+            Report name mapped to its Consolidated statement, and problems
+            with the eliminations: eliminated amounts that change a bottom
+            line don't net to zero across the entities.
+        """
+        workers = min(self.workers, len(self.entities))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(entity.build_all, start_date, end_date)
+                for name, entity in self.entities.items()
+            }
+            statements = {name: future.result() for name, future in futures.items()}
+
+        consolidated = {}
+        problems = []
+        for report in REPORTS:
+            entities = {name: statements[name][report] for name in self.entities}
+            combined = merge_statements(list(entities.values()), self.backend.config.title)
+            statement = eliminate(combined, self.eliminations)
+            bottom_line = BOTTOM_LINES[report]
+            difference = combined.total(bottom_line) - statement.total(bottom_line)
+            if difference:
+                problems.append(
+                    f"Eliminations change {bottom_line} on the {report} by {difference}; "
+                    "the intercompany accounts don't net to zero"
+                )
+            consolidated[report] = Consolidated(statement, entities)
+        return consolidated, problems
+
+    def render(self, consolidated, by_entity=False) -> str:
+        """Return a consolidated statement in tex format.
+
+        The statement's own template is rendered with the consolidated
+        values.  With by_entity, 'entities' is a list of each entity's
+        values with its 'name', for templates with entity columns.
+
+        Parameters
+        ----------
+        consolidated: Consolidated
+        by_entity: bool
+
+        Returns
+        -------
+        str
+        """
+        report_object = self.backend.get_report(consolidated.statement.report)
+        values = report_object.template_data(consolidated.statement)
+        if by_entity:
+            values["entities"] = [
+                {**report_object.template_data(statement), "name": name}
+                for name, statement in consolidated.entities.items()
+            ]
+        return report_object.render_template(
+            report_object.template, report_object.formatter.format(values)
+        )
+
+    def explain(self, start_date, end_date) -> str:
+        """Return the ledger queries of each entity, see QueryPlan.explain()."""
+        return "\n".join(
+            f"{name}:\n{entity.explain('all', start_date, end_date)}"
+            for name, entity in self.entities.items()
+        )
@@ -0,0 +1,311 @@
+"""Answer CLI commands from a long running process over a Unix socket.
+
+The client sends one JSON line describing the command.  The daemon replies
+with JSON lines carrying chunks of standard output ('out') and standard
+error ('err') as they are written, followed by the exit code ('exit').
+
+Classes
+-------
+Daemon
+
+Functions
+---------
+socket_path
+forward
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+from pacioli import __version__
+from pacioli.backend import ReportBackend
+
+logger = logging.getLogger(__name__)
+
+# Commands that are worth forwarding; long running commands always run locally.
+FORWARDED_COMMANDS = ("balance-sheet", "income-statement", "cash-flow-statement", "all", "warm")
+
+
+def socket_path() -> str:
+    """Return the path of the daemon's socket.
+
+    Uses PACIOLI_SOCKET if set, otherwise pacioli.sock in XDG_RUNTIME_DIR or
+    the temp directory.
+
+    Returns
+    -------
+    str
+        Socket file path.
+    """
+    path = os.environ.get("PACIOLI_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "pacioli.sock")
+    return os.path.join(tempfile.gettempdir(), f"pacioli-{os.getuid()}.sock")
+
+
+def forward(config_file, argv, stdout, stderr, path=None):
+    """Run a command in the daemon if one is listening.
+
+    Parameters
+    ----------
+    config_file: str
+        Path of the config file given to the CLI.
+    argv: list
+        Command line arguments of the CLI invocation.
+    stdout, stderr: file
+        Streams the command's output is copied to.
+    path: str
+        Socket path. Defaults to socket_path().
+
+    Returns
+    -------
+    int or None
+        The command's exit code, or None if no compatible daemon answered and
+        the command should run in-process.
+    """
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+
+    request = {
+        "version": __version__,
+        "config": os.path.abspath(os.path.expanduser(config_file)),
+        "argv": argv,
+        "cwd": os.getcwd(),
+    }
+    with client, client.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                stdout.write(message["out"])
+                stdout.flush()
+            elif "err" in message:
+                stderr.write(message["err"])
+                stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+            elif "fallback" in message:
+                return None
+    # The daemon went away mid-command.
+    return None
+
+
+class FrameWriter(io.TextIOBase):
+    """Text stream that sends everything written to it to the client."""
+
+    def __init__(self, stream, name) -> None:
+        """Set the socket stream and the frame name ('out' or 'err')."""
+        self.stream = stream
+        self.name = name
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        """Return the encoding click should assume for this stream."""
+        return "utf-8"
+
+    def writable(self) -> bool:
+        """Return True; the stream is write only."""
+        return True
+
+    def write(self, text) -> int:
+        """Send text to the client."""
+        if not isinstance(text, str):
+            raise TypeError("FrameWriter only accepts str")
+        if text:
+            self.stream.write(json.dumps({self.name: text}).encode() + b"\n")
+            self.stream.flush()
+        return len(text)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Runs one forwarded command."""
+
+    server: "Daemon"
+
+    def handle(self) -> None:
+        """Read the request, run the command and stream back its output."""
+        line = self.rfile.readline()
+        if not line:
+            # A connection probe, e.g. from a second daemon starting.
+            return
+        request = json.loads(line)
+        if request.get("version") != __version__:
+            self.wfile.write(json.dumps({"fallback": True}).encode() + b"\n")
+            return
+
+        stdout = FrameWriter(self.wfile, "out")
+        stderr = FrameWriter(self.wfile, "err")
+        code = self.server.run_command(request, stdout, stderr)
+        self.wfile.write(json.dumps({"exit": code}).encode() + b"\n")
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """Unix socket server that runs CLI commands with warm report backends.
+
+    Commands run one at a time because they share the process's working
+    directory and standard streams.  Between commands a background thread
+    precomputes common reports for every backend whose journal changed.
+    """
+
+    def __init__(self, path=None, backends=None) -> None:
+        """Bind the socket, replacing a stale socket file.
+
+        Parameters
+        ----------
+        path: str
+            Socket path. Defaults to socket_path().
+        backends: dict
+            Already loaded backends keyed on config path.  They are assumed
+            to have been loaded from the current working directory.
+        """
+        path = path or socket_path()
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                probe.close()
+                raise OSError(f"A pacioli daemon is already listening on {path}")
+
+        # Journal paths in the config may be relative to the working
+        # directory, so backends are kept per (config file, directory).
+        self.backends: dict[tuple[str, str], tuple[int, ReportBackend]] = {}
+        for config_file, backend in (backends or {}).items():
+            config_file = os.path.abspath(config_file)
+            key = (config_file, os.getcwd())
+            self.backends[key] = (os.stat(config_file).st_mtime_ns, backend)
+
+        self.lock = threading.Lock()
+
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self) -> None:
+        """Close the socket and remove the socket file."""
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.server_address)  # type: ignore[arg-type]
+
+    def get_backend(self, config_file) -> ReportBackend:
+        """Return the warm backend for a config file, reloading it if edited.
+
+        Parameters
+        ----------
+        config_file: str
+            Absolute path of the config file.
+
+        Returns
+        -------
+        ReportBackend
+            Backend for the config file and current working directory.
+        """
+        key = (config_file, os.getcwd())
+        mtime = os.stat(config_file).st_mtime_ns
+        cached = self.backends.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        backend = ReportBackend(config_file=config_file)
+        self.backends[key] = (mtime, backend)
+        return backend
+
+    def run_command(self, request, stdout, stderr) -> int:
+        """Run a forwarded command.
+
+        Parameters
+        ----------
+        request: dict
+            The client's request.
+        stdout, stderr: file
+            Streams the command's output is written to.
+
+        Returns
+        -------
+        int
+            Exit code.
+        """
+        from pacioli.cli import cli
+
+        cwd = os.getcwd()
+        with self.lock:
+            try:
+                os.chdir(request["cwd"])
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                    try:
+                        backend = self.get_backend(request["config"])
+                        cli.main(
+                            args=request["argv"],
+                            prog_name="pacioli",
+                            obj={"backend": backend, "daemon": True},
+                        )
+                    except SystemExit as exit:
+                        return exit.code if isinstance(exit.code, int) else 1
+                    except Exception as error:
+                        logger.exception("Forwarded command failed")
+                        stderr.write(f"Error: {error}\n")
+                        return 1
+                return 0
+            finally:
+                os.chdir(cwd)
+
+    def warm(self) -> None:
+        """Precompute common reports for every backend whose journal changed."""
+        cwd = os.getcwd()
+        for (_, directory), (_, backend) in list(self.backends.items()):
+            with self.lock:
+                try:
+                    os.chdir(directory)
+                    backend.warm()
+                finally:
+                    os.chdir(cwd)
+
+    def start_warming(self, interval=5) -> threading.Thread:
+        """Warm the backends in a background thread.
+
+        Parameters
+        ----------
+        interval: float
+            Seconds between checks for journal changes.
+
+        Returns
+        -------
+        threading.Thread
+            The daemon thread doing the warming.
+        """
+
+        def run():
+            while True:
+                try:
+                    self.warm()
+                except Exception:
+                    # Keep warming once the journal or config is fixed
+                    logger.exception("Warming failed")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="pacioli-warm", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,222 @@
+"""Format report balances for a locale.
+
+Locale conventions are read once per locale and kept in a Formatter, so
+formatting never touches the process-wide locale and reports for
+different locales can be formatted at the same time in different threads.
+
+Classes
+-------
+Formatter
+
+Functions
+---------
+locale_conventions
+group_digits
+"""
+
+import locale
+import threading
+
+# Changing the process locale to read a locale's conventions is not thread
+# safe, so conventions are read under a lock and cached.
+_conventions_lock = threading.Lock()
+_conventions: dict[str, dict] = {}
+
+
+def locale_conventions(name="") -> dict:
+    """Return the numeric and monetary conventions of a locale.
+
+    The process locale is restored afterwards.
+
+    Parameters
+    ----------
+    name: str
+        Locale name, e.g. 'de_DE.UTF-8'.  '' is the locale set by the
+        environment, falling back to the C locale if it isn't installed.
+
+    Returns
+    -------
+    dict
+        The locale's localeconv().
+
+    Raises
+    ------
+    locale.Error
+        If a named locale isn't installed.
+    """
+    with _conventions_lock:
+        conventions = _conventions.get(name)
+        if conventions is None:
+            saved = {
+                category: locale.setlocale(category)
+                for category in (locale.LC_NUMERIC, locale.LC_MONETARY)
+            }
+            try:
+                try:
+                    for category in saved:
+                        locale.setlocale(category, name)
+                except locale.Error:
+                    if name:
+                        raise
+                    for category in saved:
+                        locale.setlocale(category, "C")
+                conventions = dict(locale.localeconv())
+            finally:
+                for category, value in saved.items():
+                    locale.setlocale(category, value)
+            _conventions[name] = conventions
+        return conventions
+
+
+def group_digits(digits, grouping, separator) -> str:
+    """Insert thousands separators into a string of digits.
+
+    Parameters
+    ----------
+    digits: str
+        e.g. '1234567'.
+    grouping: list
+        Group sizes from the right as in localeconv(), where 0 repeats the
+        previous size and CHAR_MAX stops grouping.
+    separator: str
+        e.g. ','.
+
+    Returns
+    -------
+    str
+        e.g. '1,234,567'.
+    """
+    if not separator:
+        return digits
+    groups = []
+    size = None
+    sizes = iter(grouping)
+    while digits:
+        next_size = next(sizes, 0)
+        if next_size == locale.CHAR_MAX:
+            break
+        if next_size:
+            size = next_size
+        if size is None or len(digits) <= size:
+            break
+        groups.append(digits[-size:])
+        digits = digits[:-size]
+    groups.append(digits)
+    return separator.join(reversed(groups))
+
+
+class Formatter:
+    """Formats balances with fixed locale conventions.
+
+    Negative balances are enclosed in parentheses instead of signed.
+
+    Methods
+    -------
+    from_locale(name="", decimals=0, currency=False)
+        Returns a formatter with a locale's conventions.
+    format_number(number)
+        Returns one balance as a string.
+    format(data)
+        Returns report data with every balance formatted.
+    """
+
+    def __init__(self, conventions=None, decimals=0, currency_symbol=None) -> None:
+        """Set the conventions.
+
+        Parameters
+        ----------
+        conventions: dict
+            localeconv() of the locale.  Defaults to the C locale.
+        decimals: int
+            Digits after the decimal point.
+        currency_symbol: str
+            Symbol added to every balance, placed as the locale places its
+            own currency symbol.  None adds no symbol.
+        """
+        conventions = conventions or {}
+        self.decimal_point = conventions.get("decimal_point") or "."
+        self.thousands_sep = conventions.get("thousands_sep", "")
+        self.grouping = list(conventions.get("grouping") or [])
+        self.symbol_precedes = conventions.get("p_cs_precedes", 1) in (1, True)
+        self.symbol_space = conventions.get("p_sep_by_space", 0) in (1, True)
+        self.decimals = decimals
+        self.currency_symbol = currency_symbol
+
+    @classmethod
+    def from_locale(cls, name="", decimals=0, currency=False) -> "Formatter":
+        """Return a formatter with a locale's conventions.
+
+        Parameters
+        ----------
+        name: str
+            Locale name, or '' for the environment's locale.
+        decimals: int
+            Digits after the decimal point.
+        currency: bool or str
+            True adds the locale's currency symbol and a string adds that
+            symbol.
+
+        Returns
+        -------
+        Formatter
+        """
+        conventions = locale_conventions(name)
+        symbol = None
+        if currency is True:
+            symbol = conventions.get("currency_symbol") or None
+        elif currency:
+            symbol = currency
+        return cls(conventions, decimals, symbol)
+
+    def format_number(self, number) -> str:
+        """Return a balance formatted for the locale.
+
+        Parameters
+        ----------
+        number: int or float
+
+        Returns
+        -------
+        str
+            e.g. '1,234' or '(1,234)' for -1234.
+        """
+        text = f"{abs(number):.{self.decimals}f}"
+        digits, _, fraction = text.partition(".")
+        text = group_digits(digits, self.grouping, self.thousands_sep)
+        if fraction:
+            text += self.decimal_point + fraction
+
+        if self.currency_symbol:
+            space = " " if self.symbol_space else ""
+            if self.symbol_precedes:
+                text = f"{self.currency_symbol}{space}{text}"
+            else:
+                text = f"{text}{space}{self.currency_symbol}"
+
+        if round(number, self.decimals) < 0:
+            return f"({text})"
+        return text
+
+    def format(self, data):
+        """Return report data with every balance formatted.
+
+        The data is not modified.
+
+        Parameters
+        ----------
+        data: dict, list, int or float
+            Balances, or dicts and lists of them such as account trees.
+            Other values are returned unchanged.
+
+        Returns
+        -------
+        dict, list or str
+            A copy of data with balances replaced by formatted strings.
+        """
+        if isinstance(data, dict):
+            return {key: self.format(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.format(item) for item in data]
+        if isinstance(data, (int, float)) and not isinstance(data, bool):
+            return self.format_number(data)
+        return data
@@ -0,0 +1,247 @@
+"""
+The general_ledger module lists the postings behind the statements.
+
+Every posting to a mapped account in the period is read from one streamed
+register query, grouped by account and passed to the template as it
+arrives, so the report never holds all of its rows in memory.
+
+Classes
+-------
+Posting
+LedgerAccount
+GeneralLedger
+"""
+
+import io
+import itertools
+from typing import NamedTuple
+
+from pacioli.pacioli import Pacioli
+from pacioli.utils import escape_latex
+
+# Separates the fields of register lines; payees may contain '|'.
+FIELD_SEPARATOR = "\x1f"
+# Roots of the income statement accounts, which are listed with the mapped
+# balance sheet accounts and open every period at zero.
+PROFIT_AND_LOSS_ROOTS = ("Income", "Expenses")
+
+
+class Posting(NamedTuple):
+    """One formatted row of the general ledger."""
+
+    date: str
+    payee: str
+    amount: str
+    balance: str
+
+
+class LedgerAccount:
+    """The postings of one account, read as the template iterates them.
+
+    Attributes
+    ----------
+    account: str
+        Full account name.
+    name: str
+        Account name escaped for LaTeX.
+    opening: str
+        Formatted balance before the period.
+    postings: iterator
+        Posting rows in date order.  Can be iterated once.
+    closing: str
+        Formatted balance after the postings read so far, i.e. the closing
+        balance once postings is exhausted.
+    """
+
+    def __init__(self, account, opening, lines, formatter) -> None:
+        """Set the account and the register lines of its postings.
+
+        Parameters
+        ----------
+        account: str
+            Full account name.
+        opening: float
+            Balance before the period.
+        lines: iterator
+            Register fields (account, date, payee, amount) of the account's
+            postings.
+        formatter: Formatter
+            Formats amounts and balances.
+        """
+        self.account = account
+        self.name = escape_latex(account)
+        self.formatter = formatter
+        self.balance = opening
+        self.opening = formatter.format_number(round(opening))
+        self.postings = self.read_postings(lines)
+
+    def read_postings(self, lines):
+        """Yield formatted postings, keeping the running balance."""
+        for _, date, payee, amount in lines:
+            quantity = float(amount or 0)
+            self.balance += quantity
+            yield Posting(
+                date,
+                escape_latex(payee),
+                self.formatter.format_number(quantity),
+                self.formatter.format_number(self.balance),
+            )
+
+    @property
+    def closing(self) -> str:
+        """Return the formatted balance after the postings read so far."""
+        return self.formatter.format_number(round(self.balance))
+
+
+class GeneralLedger(Pacioli):
+    """
+    A class to create the general ledger, the detailed transactions appendix.
+
+    Methods
+    -------
+    print_report(start_date, end_date)
+        Returns the general ledger for the time period specified.
+    get_report_data(start_date, end_date)
+        Returns the template variables, with the accounts read lazily.
+    get_balance_sheet_accounts(accounts)
+        Returns the accounts with opening balances.
+    explain(start_date, end_date)
+        Returns the ledger queries behind the report.
+    """
+
+    def __init__(self, config_file, journal_file=None) -> None:
+        """Read template path from config file.
+
+        Parameters
+        ----------
+        config_file: str
+            Path to config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
+        """
+        Pacioli.__init__(self, config_file, journal_file)
+        self.template = self.config.general_ledger_template
+
+    def print_report(self, start_date, end_date) -> str:
+        """Generate the general ledger.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        str
+            The general ledger in tex format.
+        """
+        out = io.StringIO()
+        self.stream_template(self.template, self.get_report_data(start_date, end_date), out)
+        return out.getvalue()
+
+    def get_accounts_listed(self) -> list[str]:
+        """Return the accounts whose postings are listed.
+
+        Returns
+        -------
+        list[str]
+            Every account mapped in the config file plus Income and Expenses,
+            with patterns expanded and accounts under a listed account left
+            out.
+        """
+        entries = [
+            entry for accounts in self.config.account_mappings().values() for entry in accounts
+        ]
+        return self.get_account_index().expand(
+            list(dict.fromkeys(entries + list(PROFIT_AND_LOSS_ROOTS)))
+        )
+
+    @staticmethod
+    def get_balance_sheet_accounts(accounts) -> list[str]:
+        """Return the accounts that carry a balance into a period.
+
+        Income and expense accounts measure one period, so their balances
+        before it aren't part of the general ledger's opening balances.
+        """
+        return [
+            account for account in accounts if account.split(":")[0] not in PROFIT_AND_LOSS_ROOTS
+        ]
+
+    def get_register_command(self, accounts, start_date, end_date) -> list[str]:
+        """Return the register query listing every posting by account."""
+        ledger_command = ["ledger", "-f", self.journal_file, "reg", *accounts]
+        if start_date:
+            ledger_command.extend(["-b", start_date])
+        if end_date:
+            ledger_command.extend(["-e", end_date])
+        fields = ["%(account)", "%(date)", "%(payee)", "%(quantity(amount))"]
+        ledger_command.extend(
+            [
+                "--sort",
+                "account,date",
+                "--date-format",
+                "%Y/%m/%d",
+                "--format",
+                FIELD_SEPARATOR.join(fields) + "\n",
+            ]
+        )
+        ledger_command.extend(self.ledger_flags())
+        return ledger_command
+
+    def get_report_data(self, start_date, end_date) -> dict:
+        """Return the template variables of the general ledger.
+
+        The opening balances are queried and the register query is started
+        before returning, but postings are only read as the template
+        iterates 'accounts'.  Accounts without postings in the period are
+        left out, and income and expense accounts open at zero.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        dict
+            'title', 'start_date', 'end_date' and 'accounts', an iterator
+            of LedgerAccount in account order.
+        """
+        accounts = self.get_accounts_listed()
+        balance_sheet = self.get_balance_sheet_accounts(accounts)
+        opening = (
+            self.query_amounts(balance_sheet, end_date=start_date)
+            if start_date and balance_sheet
+            else {}
+        )
+        lines = self.stream_system_command(
+            self.get_register_command(accounts, start_date, end_date)
+        )
+        fields = (line.split(FIELD_SEPARATOR, 3) for line in lines if line)
+        groups = itertools.groupby(fields, key=lambda field: field[0])
+        return {
+            "title": self.title,
+            "start_date": start_date,
+            "end_date": end_date,
+            "accounts": (
+                LedgerAccount(account, opening.get(account, 0.0), rows, self.formatter)
+                for account, rows in groups
+            ),
+        }
+
+    def explain(self, start_date, end_date) -> str:
+        """Return the ledger queries behind the general ledger.
+
+        Returns
+        -------
+        str
+            Described as in QueryPlan.explain().
+        """
+        accounts = self.get_accounts_listed()
+        queries = [f"postings to {len(accounts)} accounts from {start_date} to {end_date}"]
+        balance_sheet = self.get_balance_sheet_accounts(accounts)
+        if start_date and balance_sheet:
+            queries.insert(0, f"balances of {len(balance_sheet)} accounts at {start_date}")
+        lines = [f"Query plan: 1 needs answered by {len(queries)} ledger invocations"]
+        lines.extend(f"  {number}. {query}" for number, query in enumerate(queries, start=1))
+        return "\n".join(lines)
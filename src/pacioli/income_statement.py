@@ -6,10 +6,9 @@ Classes
 IncomeStatement
 """
 
-import re
-
 from pacioli.pacioli import Pacioli, logging
-from pacioli.utils import format_balance
+from pacioli.planner import PeriodBalances
+from pacioli.results import Line, Section, Statement
 
 
 class IncomeStatement(Pacioli):
@@ -20,17 +19,23 @@ class IncomeStatement(Pacioli):
     -------
     print_report(start_date, end_date)
         Returns income state for the time period specified.
+    build_report(start_date, end_date)
+        Returns the income statement as a Statement.
+    statement_totals(sections, totals)
+        Returns the totals of the income statement's sections.
     """
 
-    def __init__(self, config_file) -> None:
+    def __init__(self, config_file, journal_file=None) -> None:
         """Read template path from config file.
 
         Parameters
         ----------
         config_file: str
             Path to config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
         """
-        Pacioli.__init__(self, config_file)
+        Pacioli.__init__(self, config_file, journal_file)
         self.template = self.config.income_sheet_template
 
     def print_report(self, start_date, end_date) -> str:
@@ -50,29 +55,171 @@ class IncomeStatement(Pacioli):
             The income statement in tex format.
 
         """
-        result = {
-            "title": self.title,
-            "start_date": start_date,
-            "end_date": end_date,
-        }
+        result = self.get_report_data(start_date, end_date)
+        logging.debug(result)
+        return self.render_template(self.template, self.formatter.format(result))
+
+    def get_needs(self, start_date, end_date) -> list:
+        """Return the ledger data the income statement needs.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        list
+            Needs from pacioli.planner.
+        """
+        return [PeriodBalances(("Income", "Expenses"), start_date, end_date)]
+
+    def build_report(self, start_date, end_date, results=None) -> Statement:
+        """Return the income statement as a statement.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
 
-        income = self.process_accounts("Income", start_date, end_date)
-        result["income_total"] = income.pop("income_total", 0)
-        result["income"] = income
+        Returns
+        -------
+        Statement
+            Sections income and expenses, whose lines are account trees
+            down to the configured depth, and the total net_income.
+        """
+        if results is None:
+            results = self.run_plan(self.get_needs(start_date, end_date))
+        (need,) = self.get_needs(start_date, end_date)
+        balances = results[need]
 
-        expenses = self.process_accounts("Expenses", start_date, end_date)
-        result["expenses_total"] = expenses.pop("expenses_total", 0)
-        result["expenses"] = expenses
+        # Income is credited in ledger, so its sign is reversed for display.
+        sections = []
+        for section, sign in (("Income", -1), ("Expenses", 1)):
+            tree = self.build_account_tree(section, balances, self.get_depth(section), sign)
+            lines = tuple(self.tree_line(child) for child in tree["children"])
+            sections.append(Section(section.lower(), lines, tree["balance"]))
+        income, expenses = sections
 
-        if result["income_total"] == 0 and not income:
+        if income.total == 0 and not income.lines:
             logging.warning("No income accounts found for the specified period")
-        if result["expenses_total"] == 0 and not expenses:
+        if expenses.total == 0 and not expenses.lines:
             logging.warning("No expense accounts found for the specified period")
 
-        result["net_income"] = result["income_total"] - result["expenses_total"]
+        return Statement(
+            "income-statement",
+            self.title,
+            start_date,
+            end_date,
+            (income, expenses),
+            self.statement_totals({"income": income, "expenses": expenses}),
+        )
 
-        logging.debug(result)
-        return self.render_template(self.template, format_balance(result))
+    @staticmethod
+    def statement_totals(sections, totals=()) -> tuple[tuple[str, int], ...]:
+        """Return the income statement's totals of its sections.
+
+        Parameters
+        ----------
+        sections: dict
+            Section name mapped to Section.
+        totals: tuple
+            Unused; net income is summed from sections.
+
+        Returns
+        -------
+        tuple
+            (name, amount) pairs as in Statement.totals.
+        """
+        return (("net_income", sections["income"].total - sections["expenses"].total),)
+
+    def get_report_data(self, start_date, end_date, results=None) -> dict:
+        """Return the income statement values before formatting.
+
+        Parameters
+        ----------
+        start_date: str
+        end_date: str
+        results: dict
+            Answers to get_needs() from an already executed plan.  The
+            needs are queried when not given.
+
+        Returns
+        -------
+        dict
+            Template variables mapped to their integer balances.
+        """
+        return self.template_data(self.build_report(start_date, end_date, results))
+
+    def template_data(self, statement) -> dict:
+        """Return the template variables of an income statement.
+
+        Parameters
+        ----------
+        statement: Statement
+            From build_report().
+
+        Returns
+        -------
+        dict
+            'title', the dates, and for each section '<section>_total',
+            '<section>' mapping the top level accounts to their balances
+            and '<section>_tree', the account tree as nodes with 'name',
+            'account', 'balance' and 'children'; then 'net_income'.
+        """
+        result: dict = {
+            "title": statement.title,
+            "start_date": statement.start_date,
+            "end_date": statement.end_date,
+        }
+        for section in statement.sections:
+            result[f"{section.name}_total"] = section.total
+            result[section.name] = {line.name: line.amount for line in section.lines}
+            result[f"{section.name}_tree"] = [self.tree_node(line) for line in section.lines]
+        result.update(statement.totals)
+        return result
+
+    @classmethod
+    def tree_line(cls, node) -> Line:
+        """Return a node of build_account_tree() as a line."""
+        return Line(
+            node["name"],
+            node["account"],
+            node["balance"],
+            tuple(cls.tree_line(child) for child in node["children"]),
+        )
+
+    @classmethod
+    def tree_node(cls, line) -> dict:
+        """Return a line as a node of build_account_tree()."""
+        return {
+            "name": line.name,
+            "account": line.account,
+            "balance": line.amount,
+            "children": [cls.tree_node(child) for child in line.children],
+        }
+
+    def get_depth(self, section) -> int:
+        """Return the account depth shown for a section.
+
+        Parameters
+        ----------
+        section: str
+            Top level account name, i.e 'Income'.
+
+        Returns
+        -------
+        int
+            Depth of the deepest accounts listed, where 'Income' is 1 and
+            'Income:Salary' is 2.
+        """
+        depth = self.config.income_statement_depth
+        if isinstance(depth, dict):
+            return depth.get(section, 2)
+        return depth
 
     def process_accounts(self, account, start_date, end_date):
         """Proccess acount balances within time period.
@@ -93,43 +240,82 @@ class IncomeStatement(Pacioli):
             Short account names and their balances.
 
         """
-        ledger_command = [
-            "ledger",
-            "-f",
-            self.journal_file,
-            "bal",
-            account,
-            "-b",
-            start_date,
-            "-e",
-            end_date,
-            "--depth",
-            "2",
-        ]
-
-        if self.effective:
-            ledger_command.append("--effective")
-
-        if self.cleared:
-            ledger_command.append("--cleared")
-
-        if self.market:
-            ledger_command.extend(self.market.split())
-
-        output = self.run_system_command(ledger_command).splitlines()
-        account_name = account
-        result = {}
-        for i in output:
-            i = i.replace(",", "")
-            account = re.search(r"([a-zA-Z]+[a-zA-Z ]*[a-zA-Z])+", i)
-            if account is not None:
-                balance_match = re.search(r"\d+(?:.(\d+))?", i)
-                if not balance_match:
-                    raise ValueError(f"Unable to parse balance from ledger output line: {i}")
-                if account.group(0) == account_name:
-                    result[account_name.lower() + "_total"] = round(float(balance_match.group(0)))
-                else:
-                    account = account.group(0)
-                    result[account] = round(float(balance_match.group(0)))
+        balances = self.get_account_balances([account], start_date, end_date)
+        sign = -1 if account == "Income" else 1
+        tree = self.build_account_tree(account, balances, self.get_depth(account), sign)
 
+        result = {child["name"]: child["balance"] for child in tree["children"]}
+        result[account.lower() + "_total"] = tree["balance"]
         return result
+
+    def get_account_balances(self, accounts, start_date, end_date) -> dict[str, float]:
+        """Return the balance of every account's own postings in one query.
+
+        Parameters
+        ----------
+        accounts: list
+            Top level account names, i.e ['Income', 'Expenses'].
+        start_date: str
+        end_date: str
+
+        Returns
+        -------
+        dict
+            Full account name mapped to the balance of its own postings,
+            excluding sub-accounts.
+        """
+        return self.query_period_amounts(accounts, start_date, end_date)
+
+    @staticmethod
+    def build_account_tree(section, balances, depth, sign=1) -> dict:
+        """Roll account balances up into a tree of subtotals.
+
+        Accounts deeper than depth are included in the subtotal of their
+        ancestor at depth.
+
+        Parameters
+        ----------
+        section: str
+            Top level account name, i.e 'Income'.
+        balances: dict
+            Full account name mapped to the balance of its own postings.
+        depth: int
+            Depth of the deepest node, where the section is 1.
+        sign: int
+            -1 to reverse the sign of the balances.
+
+        Returns
+        -------
+        dict
+            The section node.  Each node has 'name', 'account', 'balance'
+            (rounded subtotal including sub-accounts) and 'children' (list of
+            nodes sorted by name).
+        """
+        totals: dict[str, float] = {}
+        for account, balance in balances.items():
+            parts = account.split(":")
+            if parts[0] != section:
+                continue
+            for level in range(1, min(len(parts), depth) + 1):
+                name = ":".join(parts[:level])
+                totals[name] = totals.get(name, 0.0) + balance * sign
+
+        nodes: dict[str, dict] = {
+            account: {
+                "name": account.split(":")[-1],
+                "account": account,
+                "balance": round(total),
+                "children": [],
+            }
+            for account, total in sorted(totals.items())
+        }
+        root: dict = nodes.get(section) or {
+            "name": section,
+            "account": section,
+            "balance": 0,
+            "children": [],
+        }
+        for account, node in nodes.items():
+            if account != section:
+                nodes[account.rsplit(":", 1)[0]]["children"].append(node)
+        return root
@@ -0,0 +1,430 @@
+"""Track the files that make up a Ledger journal.
+
+Journal files can also be scanned in-process.  Each file is summarised on
+its own, in a process pool when there is enough to read, and the summaries
+are merged in include order.
+
+Classes
+-------
+Price
+FileSummary
+JournalSummary
+Journal
+
+Functions
+---------
+scan_file
+"""
+
+import datetime
+import glob
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+INCLUDE_PATTERN = re.compile(r"^!?include\s+(.+?)\s*$")
+DATE = r"(?:(\d{4})[/.-])?(\d{1,2})[/.-](\d{1,2})"
+TRANSACTION_PATTERN = re.compile(rf"^{DATE}(?:={DATE})?(?=[\s*!(;]|$)")
+PRICE_PATTERN = re.compile(
+    rf"^P\s+{DATE}(?:\s+\d{{1,2}}:\d{{2}}(?::\d{{2}})?)?\s+(\S+)\s+(.+?)\s*$"
+)
+YEAR_PATTERN = re.compile(r"^(?:apply\s+year|year|Y)\s*(\d{4})\s*$")
+ACCOUNT_PATTERN = re.compile(r"^account\s+(.+?)\s*$")
+POSTING_PATTERN = re.compile(r"^[ \t]+(?:[*!][ \t]*)?[(\[]?([^;\s(\[][^\t]*?)[)\]]?(?:\t|  |$)")
+AMOUNT_PATTERN = re.compile(r"^(-?)([^\d\s.,-]*)\s*(-?[\d,]*\.?\d+)\s*([^\d\s@;]*)")
+# Lot price, date and note annotations on a posting amount
+ANNOTATION_PATTERN = re.compile(r"\{[^}]*\}|\[[^\]]*\]|\([^)]*\)")
+
+# Files are only scanned in a process pool when there are at least this
+# many bytes to read; starting the pool costs more than reading less.
+PARALLEL_SCAN_BYTES = 1 << 20
+
+
+class Price(NamedTuple):
+    """A price directive: one unit of commodity was worth amount."""
+
+    date: datetime.date
+    commodity: str
+    amount: float
+    currency: str
+
+
+class FileSummary(NamedTuple):
+    """What one journal file contains, excluding the files it includes."""
+
+    first_date: datetime.date | None
+    last_date: datetime.date | None
+    # Transactions whose dates couldn't be read, e.g. without a year
+    undated: bool
+    accounts: frozenset[str]
+    # Prices before the first include, between each include and after the last
+    price_segments: tuple[tuple[Price, ...], ...]
+    includes: tuple[str, ...]
+
+
+class JournalSummary(NamedTuple):
+    """The merged summaries of every file in a journal."""
+
+    files: dict[str, FileSummary]
+    accounts: list[str]
+    # Prices in the order Ledger reads them
+    prices: list[Price]
+
+
+def read_date(groups, default_year) -> datetime.date | None:
+    """Return a date from (year, month, day) regex groups.
+
+    Returns None if the date has no year and no default, or is invalid.
+    """
+    year, month, day = groups
+    year = int(year) if year else default_year
+    if year is None:
+        return None
+    try:
+        return datetime.date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_amount(text) -> tuple[float, str] | None:
+    """Return the quantity and commodity of an amount such as $1,000 or 5 AAPL."""
+    match = AMOUNT_PATTERN.match(text)
+    if not match:
+        return None
+    sign, prefix, number, suffix = match.groups()
+    quantity = float(number.replace(",", ""))
+    return (-quantity if sign else quantity), (prefix or suffix)
+
+
+def parse_cost(text, date) -> Price | None:
+    """Return the price implied by a posting amount with a cost, e.g. 10 AAPL @ $150.
+
+    Parameters
+    ----------
+    text: str
+        The amount part of a posting, after the account.
+    date: datetime.date
+        Date of the transaction.
+
+    Returns
+    -------
+    Price or None
+        Price of one unit, or None if there is no cost.
+    """
+    amount_text, separator, cost_text = text.split(";", 1)[0].partition("@")
+    if not separator or date is None:
+        return None
+    total = cost_text.startswith("@")
+    amount = parse_amount(ANNOTATION_PATTERN.sub("", amount_text).strip())
+    cost = parse_amount(cost_text.lstrip("@").strip().lstrip("="))
+    if not amount or not cost or not amount[0]:
+        return None
+    per_unit = abs(cost[0] / amount[0]) if total else abs(cost[0])
+    return Price(date, amount[1], per_unit, cost[1])
+
+
+def scan_file(path) -> FileSummary:
+    """Summarise one journal file.
+
+    Runs in worker processes, so it only takes and returns picklable values.
+
+    Parameters
+    ----------
+    path: str
+        Absolute path of the journal file.
+
+    Returns
+    -------
+    FileSummary
+        Summary of the transactions, accounts, prices and includes in the
+        file.  A missing file has an empty summary.
+    """
+    first = last = None
+    undated = False
+    default_year = None
+    accounts = set()
+    segments: list[list[Price]] = [[]]
+    includes = []
+    directory = os.path.dirname(path)
+    in_transaction = False
+    transaction_date = None
+
+    try:
+        journal = open(path)
+    except OSError:
+        return FileSummary(None, None, False, frozenset(), ((),), ())
+
+    with journal:
+        for line in journal:
+            first_character = line[:1]
+            if first_character in (" ", "\t"):
+                if in_transaction:
+                    match = POSTING_PATTERN.match(line)
+                    if match:
+                        accounts.add(match.group(1).strip())
+                        rest = line[match.end() :]
+                        if "@" in rest:
+                            price = parse_cost(rest, transaction_date)
+                            if price:
+                                segments[-1].append(price)
+                continue
+
+            in_transaction = False
+            if first_character.isdigit():
+                match = TRANSACTION_PATTERN.match(line)
+                if not match:
+                    continue
+                in_transaction = True
+                groups = match.groups()
+                dates = [read_date(groups[:3], default_year)]
+                if groups[4]:
+                    # Effective date
+                    dates.append(read_date(groups[3:], default_year))
+                transaction_date = dates[0]
+                for date in dates:
+                    if date is None:
+                        undated = True
+                        continue
+                    first = date if first is None else min(first, date)
+                    last = date if last is None else max(last, date)
+            elif first_character in ("=", "~"):
+                # Automated and periodic transactions post into any period
+                in_transaction = True
+                transaction_date = None
+                undated = True
+            elif first_character == "P":
+                match = PRICE_PATTERN.match(line)
+                if not match:
+                    continue
+                date = read_date(match.groups()[:3], default_year)
+                amount = parse_amount(match.group(5))
+                if date and amount:
+                    segments[-1].append(Price(date, match.group(4), *amount))
+            elif "include" in line:
+                match = INCLUDE_PATTERN.match(line)
+                if match:
+                    includes.append(os.path.join(directory, os.path.expanduser(match.group(1))))
+                    segments.append([])
+            else:
+                match = YEAR_PATTERN.match(line) or ACCOUNT_PATTERN.match(line)
+                if match and match.re is YEAR_PATTERN:
+                    default_year = int(match.group(1))
+                elif match:
+                    accounts.add(match.group(1))
+
+    return FileSummary(
+        first,
+        last,
+        undated,
+        frozenset(accounts),
+        tuple(tuple(segment) for segment in segments),
+        tuple(includes),
+    )
+
+
+class Journal:
+    """The root journal file and every file it includes.
+
+    Methods
+    -------
+    include_files:
+        Returns the journal files in include order.
+    fingerprint:
+        Returns a digest that changes whenever any journal file changes.
+    scan:
+        Returns the merged summaries of every journal file.
+    period_fingerprint:
+        Returns a digest of the files with transactions in a period.
+    """
+
+    def __init__(self, journal_file) -> None:
+        """Set the root journal file.
+
+        Parameters
+        ----------
+        journal_file: str
+            Path to the root Ledger journal file.
+        """
+        self.journal_file = os.path.expanduser(journal_file)
+        # Include directives of each file, keyed on path, with the
+        # (mtime, size) they were read at, so unchanged files are not re-read.
+        self.includes: dict[str, tuple[tuple[int, int], list[str]]] = {}
+        # Summaries of each file, keyed on path, with the (mtime, size) they
+        # were scanned at.
+        self.summaries: dict[str, tuple[tuple[int, int], FileSummary]] = {}
+
+    def include_files(self) -> list[str]:
+        """Return the root journal and all included files.
+
+        Follows `include` directives recursively.  Relative include paths are
+        resolved against the directory of the including file and glob patterns
+        are expanded, matching Ledger's behaviour.
+
+        Returns
+        -------
+        list[str]
+            Absolute file paths in the order Ledger reads them.
+        """
+        files: dict[str, None] = {}
+        self._walk(os.path.abspath(self.journal_file), files)
+        return list(files)
+
+    def _walk(self, path, files) -> None:
+        """Add path and the files it includes to files."""
+        if path in files:
+            return
+        files[path] = None
+        for target in self._read_includes(path):
+            # Globs are expanded on every walk so new matching files are seen.
+            for included in sorted(glob.glob(target)) or [target]:
+                self._walk(os.path.abspath(included), files)
+
+    def _read_includes(self, path) -> list[str]:
+        """Return the include targets of path, which may be glob patterns."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Ledger reports missing files itself; the fingerprint still
+            # tracks the path so the file appearing counts as a change.
+            return []
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self.includes.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        targets = []
+        directory = os.path.dirname(path)
+        with open(path) as journal:
+            for line in journal:
+                if "include" not in line:
+                    continue
+                match = INCLUDE_PATTERN.match(line)
+                if not match:
+                    continue
+                targets.append(os.path.join(directory, os.path.expanduser(match.group(1))))
+
+        self.includes[path] = (version, targets)
+        return targets
+
+    def stat(self) -> dict[str, tuple[int, int]]:
+        """Return the modification time and size of each journal file.
+
+        Returns
+        -------
+        dict
+            File path mapped to (mtime in nanoseconds, size).  Missing files
+            map to (0, -1).
+        """
+        result = {}
+        for path in self.include_files():
+            try:
+                stat = os.stat(path)
+                result[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                result[path] = (0, -1)
+        return result
+
+    def fingerprint(self) -> str:
+        """Return a digest of the journal's files.
+
+        The digest changes whenever a journal file is modified, added to or
+        removed from the include graph.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the current state of the journal.
+        """
+        digest = hashlib.sha1()
+        for path, (mtime, size) in self.stat().items():
+            digest.update(f"{path}\0{mtime}\0{size}\n".encode())
+        return digest.hexdigest()
+
+    def scan(self, workers=None) -> JournalSummary:
+        """Return the merged summaries of every journal file.
+
+        Only files that changed since the last scan are read again.  When
+        enough of them changed, they are read in a process pool, one file
+        per task.
+
+        Parameters
+        ----------
+        workers: int
+            Maximum worker processes.  Defaults to the number of CPUs.
+
+        Returns
+        -------
+        JournalSummary
+            Per-file summaries with the accounts of every file and the
+            prices in the order Ledger reads them.
+        """
+        stats = self.stat()
+        changed = [
+            path
+            for path, version in stats.items()
+            if path not in self.summaries or self.summaries[path][0] != version
+        ]
+        size = sum(max(stats[path][1], 0) for path in changed)
+
+        if len(changed) > 1 and size >= PARALLEL_SCAN_BYTES:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                scanned = list(pool.map(scan_file, changed))
+        else:
+            scanned = [scan_file(path) for path in changed]
+        for path, summary in zip(changed, scanned):
+            self.summaries[path] = (stats[path], summary)
+
+        files = {path: self.summaries[path][1] for path in stats}
+        accounts = sorted(set().union(*(summary.accounts for summary in files.values())))
+        prices: list[Price] = []
+        self._merge_prices(os.path.abspath(self.journal_file), files, prices, set())
+        return JournalSummary(files, accounts, prices)
+
+    def _merge_prices(self, path, files, prices, seen) -> None:
+        """Add the prices of path and its includes to prices in read order."""
+        if path in seen or path not in files:
+            return
+        seen.add(path)
+        summary = files[path]
+        for index, segment in enumerate(summary.price_segments):
+            prices.extend(segment)
+            if index < len(summary.includes):
+                target = summary.includes[index]
+                for included in sorted(glob.glob(target)) or [target]:
+                    self._merge_prices(os.path.abspath(included), files, prices, seen)
+
+    def period_fingerprint(self, start_date, end_date, summary=None) -> str:
+        """Return a digest of the files that may post into a period.
+
+        The digest only changes when a file with transactions in the period
+        changes, so stored results for old periods survive new transactions.
+        Files without dated transactions, such as a root file of include and
+        alias directives, could affect any period and are always included.
+
+        Parameters
+        ----------
+        start_date: datetime.date
+            First day of the period.
+        end_date: datetime.date
+            Day after the period.
+        summary: JournalSummary
+            Defaults to a new scan.
+
+        Returns
+        -------
+        str
+            Hex digest of the paths, versions and date ranges of the files.
+        """
+        summary = summary or self.scan()
+        digest = hashlib.sha1()
+        for path, file_summary in summary.files.items():
+            first, last = file_summary.first_date, file_summary.last_date
+            if first is not None and not file_summary.undated:
+                if last < start_date or first >= end_date:
+                    continue
+            mtime, size = self.summaries[path][0]
+            digest.update(f"{path}\0{mtime}\0{size}\n".encode())
+        return digest.hexdigest()
@@ -0,0 +1,179 @@
+"""Reuse rendered reports whose inputs haven't changed.
+
+A rendered report depends on its dates, the config, the templates and the
+journal.  Reports are stored under a key of the first three, with a digest
+of the journal as their version, so a report of an unchanged period is
+returned without running ledger or rendering, and a stale report is
+replaced by the next rendering of the same key.
+
+Classes
+-------
+OutputCache
+TeeWriter
+
+Functions
+---------
+config_digest
+templates_digest
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+
+from pacioli.utils import atomic_open
+
+
+def config_digest(config, formatter) -> str:
+    """Return a digest of the resolved settings a report is rendered with.
+
+    Parameters
+    ----------
+    config: Config
+        The parsed config file.
+    formatter: Formatter
+        The report's formatter, whose conventions may come from the
+        environment's locale.
+
+    Returns
+    -------
+    str
+        Hex digest of the settings.
+    """
+    settings = {"config": vars(config), "formatter": vars(formatter)}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def templates_digest(sources) -> str:
+    """Return a digest of template sources.
+
+    Parameters
+    ----------
+    sources: dict
+        Template name mapped to its source, see
+        Pacioli.get_template_sources().
+
+    Returns
+    -------
+    str
+        Hex digest of the templates.
+    """
+    digest = hashlib.sha256()
+    for name, source in sorted(sources.items()):
+        digest.update(f"{name}\0{len(source)}\0{source}".encode())
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """Rendered reports stored on disk, one file per key.
+
+    Methods
+    -------
+    key(report, start_date, end_date, config_hash, template_hash)
+        Returns the key of a report's inputs other than the journal.
+    get(key, version)
+        Returns the stored report if it is current.
+    put(key, version, text)
+        Stores a rendered report.
+    writer(key, version)
+        Opens a file a report is stored in as it is rendered.
+    """
+
+    def __init__(self, directory) -> None:
+        """Set the directory reports are stored in.
+
+        Parameters
+        ----------
+        directory: str
+            Created on the first put().
+        """
+        self.directory = directory
+
+    @staticmethod
+    def key(report, start_date, end_date, config_hash, template_hash) -> str:
+        """Return the key of a report's inputs other than the journal."""
+        parts = "\0".join([report, start_date, end_date, config_hash, template_hash])
+        return hashlib.sha256(parts.encode()).hexdigest()
+
+    def path(self, key) -> str:
+        """Return the file a key is stored in."""
+        return os.path.join(self.directory, f"{key}.tex")
+
+    def get(self, key, version) -> str | None:
+        """Return the stored report if it is current.
+
+        Parameters
+        ----------
+        key: str
+            Key from OutputCache.key().
+        version: str
+            Digest of the journal the report must have been rendered from.
+
+        Returns
+        -------
+        str or None
+            The report in tex format, or None if it isn't stored or the
+            journal changed since.
+        """
+        try:
+            with open(self.path(key)) as stored:
+                stored_version = stored.readline().rstrip("\n")
+                if stored_version != version:
+                    return None
+                return stored.read()
+        except OSError:
+            return None
+
+    def put(self, key, version, text) -> None:
+        """Store a rendered report, replacing any older version.
+
+        Parameters
+        ----------
+        key: str
+            Key from OutputCache.key().
+        version: str
+            Digest of the journal the report was rendered from.
+        text: str
+            The report in tex format.
+        """
+        with self.writer(key, version) as stored:
+            stored.write(text)
+
+    @contextlib.contextmanager
+    def writer(self, key, version):
+        """Open the file a report is stored in as it is rendered.
+
+        The report replaces any older version only once the block exits
+        without an error, so a failed rendering stores nothing.
+
+        Parameters
+        ----------
+        key: str
+            Key from OutputCache.key().
+        version: str
+            Digest of the journal the report is rendered from.
+
+        Yields
+        ------
+        file
+            Text file the report is written to in tex format.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_open(self.path(key)) as stored:
+            stored.write(f"{version}\n")
+            yield stored
+
+
+class TeeWriter:
+    """A text file wrapper that copies everything written to a second file."""
+
+    def __init__(self, out, copy) -> None:
+        """Wrap a text file and the file its copy is written to."""
+        self.out = out
+        self.copy = copy
+
+    def write(self, text) -> int:
+        """Write text to both files."""
+        self.copy.write(text)
+        return self.out.write(text)
@@ -1,12 +1,77 @@
-import locale
+import contextlib
+import datetime
 import logging
 import os
 import re
+import shlex
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 import jinja2
+from jinja2 import meta
 
+from pacioli.accounts import AccountIndex, is_pattern, ledger_selects
+from pacioli.checkpoints import CheckpointStore, latest_closed_month
+from pacioli.completion import write_cache as write_completion_cache
 from pacioli.config import Config
+from pacioli.formatting import Formatter
+from pacioli.journal import Journal, parse_amount
+from pacioli.planner import QueryPlan
+from pacioli.prices import PriceIndex
+from pacioli.shards import Shard, ShardStore, is_before, parse_date, split_period
+
+
+class LedgerError(RuntimeError):
+    """A ledger command failed.
+
+    Attributes
+    ----------
+    command: list
+        The ledger command.
+    returncode: int or None
+        Exit status, or None if ledger was killed at its deadline.
+    stderr: str
+        Ledger's error output.
+    account: str or None
+        The account being queried, when the query was for one account.
+    """
+
+    def __init__(self, command, returncode=None, stderr="", account=None) -> None:
+        """Record the failed command."""
+        super().__init__()
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+        self.account = account
+
+    def reason(self) -> str:
+        """Return why the command failed."""
+        detail = self.stderr.strip().splitlines()
+        detail_text = f": {detail[-1]}" if detail else ""
+        return f"ledger exited with status {self.returncode}{detail_text}"
+
+    def __str__(self) -> str:
+        """Describe the failure along with the query and account."""
+        target = f" for account '{self.account}'" if self.account else ""
+        return f"Ledger query{target} failed, {self.reason()} (command: {shlex.join(self.command)})"
+
+
+class LedgerTimeout(LedgerError):
+    """A ledger command ran past its deadline and was killed."""
+
+    def __init__(self, command, timeout, account=None) -> None:
+        """Record the command and the time it was allowed."""
+        super().__init__(command, account=account)
+        self.timeout = timeout
+
+    def reason(self) -> str:
+        """Return why the command failed."""
+        return f"ledger was killed after {self.timeout:g} seconds"
 
 
 class Pacioli:
@@ -17,27 +82,113 @@ class Pacioli:
     pdf convertor inorder to generate beautiful, accurate reports.
     """
 
-    def __init__(self, config_file=None) -> None:
+    def __init__(self, config_file=None, journal_file=None) -> None:
         """Set configuration from Config.
 
         Paramaters
         ----------
         config_file: str
             Path to the config file.
+        journal_file: str
+            Journal to read instead of the config's journal_file.
         """
-        self.config = Config(config_file)
+        self.config = Config(config_file, journal_file)
 
         self.title = self.config.title
         self.effective = self.config.effective
         self.cleared = self.config.cleared
         self.market = self.config.market
         self.journal_file = self.config.journal_file
-        self.latex_jinja_env = self.setup_jinja_env()
+        self.journal = Journal(self.journal_file)
+        self.account_index: AccountIndex | None = None
+        # Report deadlines are per thread since servers share report objects.
+        self.deadlines = threading.local()
+        # Created when a report is first rendered, so data-only output never
+        # builds a template environment or reads locale conventions.
+        self._latex_jinja_env: jinja2.Environment | None = None
+        self._templates_from: Pacioli | None = None
+        self._formatter: Formatter | None = None
+
+        # Checkpoints can't be used with market values, which depend on the
+        # prices at the report date rather than at the checkpoint.
+        self.checkpoints = None
+        if self.config.close_after_days is not None and not self.market:
+            self.checkpoints = CheckpointStore(
+                CheckpointStore.store_path(
+                    Config.get_cache_path(), self.journal_file, self.ledger_flags()
+                ),
+                self.config.close_after_days,
+            )
+
+        # Results of queries over closed shards of long periods.  Market
+        # values aren't additive over time, so those periods aren't sharded.
+        self.shards = None
+        if self.config.shard_unit and self.config.close_after_days is not None and not self.market:
+            self.shards = ShardStore(
+                ShardStore.store_path(
+                    Config.get_cache_path(), self.journal_file, self.ledger_flags()
+                )
+            )
 
         # Always create logger, set level based on DEBUG flag
         log_level = "DEBUG" if self.config.DEBUG else "WARNING"
         self.setup_log(log_level)
 
+    @property
+    def latex_jinja_env(self) -> jinja2.Environment:
+        """Return the template environment, creating it when first used."""
+        if self._templates_from is not None:
+            return self._templates_from.latex_jinja_env
+        if self._latex_jinja_env is None:
+            self._latex_jinja_env = self.setup_jinja_env()
+        return self._latex_jinja_env
+
+    @latex_jinja_env.setter
+    def latex_jinja_env(self, environment) -> None:
+        """Use a template environment."""
+        self._latex_jinja_env = environment
+        self._templates_from = None
+
+    def share_templates(self, other) -> None:
+        """Use another report's template environment and its compiled templates.
+
+        The environment is still only created when first used.
+
+        Parameters
+        ----------
+        other: Pacioli
+            Report with the same template directory.
+        """
+        self._templates_from = other
+
+    def share_stores(self, other) -> None:
+        """Use another report's checkpoint and shard stores.
+
+        Reports of the same journal and flags then see each other's
+        checkpoints and shards instead of overwriting them.
+
+        Parameters
+        ----------
+        other: Pacioli
+            Report of the same config and journal.
+        """
+        self.checkpoints = other.checkpoints
+        self.shards = other.shards
+
+    @property
+    def formatter(self) -> Formatter:
+        """Return the formatter of balances, reading the locale when first used."""
+        if self._formatter is None:
+            self._formatter = Formatter.from_locale(
+                self.config.locale, self.config.decimals, self.config.currency
+            )
+        return self._formatter
+
+    @formatter.setter
+    def formatter(self, formatter) -> None:
+        """Use a formatter."""
+        self._formatter = formatter
+
     def setup_jinja_env(self):
         """Create jinja2 environment."""
         return jinja2.Environment(
@@ -68,27 +219,188 @@ class Pacioli:
     def run_system_command(self, command) -> str:
         """Run a system command.
 
+        The command runs in its own process group, which is killed if the
+        command passes the config's query timeout or the deadline of the
+        report being generated.  CPU and memory limits from the config are
+        applied to the process.
+
         Parameters
         ----------
-        command: str
+        command: list
             System command to be run.
 
 
         Returns
         -------
         str: The output of the command.
+
+        Raises
+        ------
+        LedgerTimeout
+            The command ran past its deadline.
+        LedgerError
+            The command exited with a non-zero status.
         """
+        self.logger.debug(f"System Command:  {command}")
+        timeout = self.get_timeout()
+        if timeout is not None and timeout <= 0:
+            raise LedgerTimeout(command, self.config.report_timeout)
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+            preexec_fn=self.get_resource_limiter(),
+        )
         try:
-            output = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-            )
-        except subprocess.CalledProcessError as error:
-            self.logger.error("error code", error.returncode, error.output)
-            raise
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Ledger may have started a pager or price fetcher; kill them all.
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            self.logger.error(f"Killed after {timeout:g} seconds: {shlex.join(command)}")
+            raise LedgerTimeout(command, timeout)
+
+        error_output = stderr.decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            raise LedgerError(command, process.returncode, error_output)
+        if error_output:
+            self.logger.debug(f"Ledger warnings: {error_output}")
+        return stdout.decode("utf-8")
+
+    def stream_system_command(self, command) -> Iterator[str]:
+        """Run a system command and return its output lines as they are written.
+
+        The command starts immediately, with the same deadline and resource
+        limits as run_system_command(); its output is only read as the
+        lines are consumed.  Stopping early kills the command.
 
+        Parameters
+        ----------
+        command: list
+            System command to be run.
+
+        Returns
+        -------
+        iterator
+            Lines of output without line endings.  Iterating raises
+            LedgerTimeout or LedgerError once the output ends if the command
+            was killed or failed.
+        """
         self.logger.debug(f"System Command:  {command}")
-        return output.stdout.decode("utf-8")
+        timeout = self.get_timeout()
+        if timeout is not None and timeout <= 0:
+            raise LedgerTimeout(command, self.config.report_timeout)
+
+        # Ledger's warnings go to a file so a full stderr pipe can't stall it.
+        stderr = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            start_new_session=True,
+            preexec_fn=self.get_resource_limiter(),
+            encoding="utf-8",
+        )
+        killed = threading.Event()
+
+        def kill():
+            killed.set()
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(process.pid, signal.SIGKILL)
+
+        timer = threading.Timer(timeout, kill) if timeout is not None else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        return self.read_command_output(command, process, stderr, timer, killed, timeout)
+
+    def read_command_output(self, command, process, stderr, timer, killed, timeout):
+        """Yield the output lines of a command started by stream_system_command()."""
+        try:
+            for line in process.stdout or ():
+                yield line.rstrip("\n")
+            process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            if process.poll() is None:
+                # The consumer stopped early
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+            if process.stdout:
+                process.stdout.close()
+            stderr.seek(0)
+            error_output = stderr.read().decode("utf-8", errors="replace")
+            stderr.close()
+
+        if killed.is_set():
+            self.logger.error(f"Killed after {timeout:g} seconds: {shlex.join(command)}")
+            raise LedgerTimeout(command, timeout)
+        if process.returncode != 0:
+            raise LedgerError(command, process.returncode, error_output)
+        if error_output:
+            self.logger.debug(f"Ledger warnings: {error_output}")
+
+    def get_timeout(self) -> float | None:
+        """Return the seconds the next ledger command may run for.
+
+        Returns
+        -------
+        float or None
+            The smaller of the query timeout and the time left before the
+            report deadline, or None without either.
+        """
+        timeouts = []
+        if self.config.query_timeout is not None:
+            timeouts.append(float(self.config.query_timeout))
+        deadline = getattr(self.deadlines, "deadline", None)
+        if deadline is not None:
+            timeouts.append(deadline - time.monotonic())
+        return min(timeouts) if timeouts else None
+
+    @contextlib.contextmanager
+    def report_deadline(self):
+        """Limit the ledger commands run inside the block to the report timeout.
+
+        Nested blocks keep the outer deadline.
+        """
+        if self.config.report_timeout is None or getattr(self.deadlines, "deadline", None):
+            yield
+            return
+        self.deadlines.deadline = time.monotonic() + self.config.report_timeout
+        try:
+            yield
+        finally:
+            self.deadlines.deadline = None
+
+    def get_resource_limiter(self):
+        """Return a function applying the config's resource limits to ledger.
+
+        Returns
+        -------
+        callable or None
+            Run in the child process before ledger starts, or None when no
+            limits are configured.
+        """
+        cpu_seconds = self.config.cpu_limit
+        memory_mb = self.config.memory_limit
+        if cpu_seconds is None and memory_mb is None:
+            return None
+
+        def limit_resources():
+            import resource
+
+            if cpu_seconds is not None:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+            if memory_mb is not None:
+                memory = memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+        return limit_resources
 
     def render_template(self, template, account_mappings) -> str:
         """Execute the jinja template.
@@ -107,16 +419,158 @@ class Pacioli:
             Processed LaTeX document with account totals.
 
         """
+        return self.get_template(template).render(account_mappings)
+
+    def stream_template(self, template, account_mappings, out, buffer_size=None) -> None:
+        """Execute the jinja template, writing the document as it is rendered.
+
+        The document is never held in memory as a whole; rendered chunks are
+        collected until buffer_size characters are ready and then written.
+
+        Parameters
+        ----------
+        template: str
+            Path to template file.
+        account_mappings: dict
+            The variable name in the template matched to the corresponding
+            account balance.
+        out: file
+            Text file the document is written to.
+        buffer_size: int
+            Characters collected before each write.  Defaults to the
+            config's output buffer size.
+        """
+        buffer_size = buffer_size or self.config.buffer_size
+        chunks = []
+        pending = 0
+        for chunk in self.get_template(template).generate(account_mappings):
+            chunks.append(chunk)
+            pending += len(chunk)
+            if pending >= buffer_size:
+                out.write("".join(chunks))
+                chunks = []
+                pending = 0
+        out.write("".join(chunks))
+
+    def get_template(self, template) -> jinja2.Template:
+        """Return a template from the template directory.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the template doesn't exist.
+        """
         try:
-            template = self.latex_jinja_env.get_template(template)
+            return self.latex_jinja_env.get_template(template)
         except jinja2.exceptions.TemplateNotFound as error:
             raise FileNotFoundError("Template not Found: ", error)
 
-        return template.render(account_mappings)
+    def get_template_sources(self, template) -> dict[str, str] | None:
+        """Return the source of a template and every template it uses.
+
+        Templates it includes, imports or extends are found by parsing it,
+        without rendering.
+
+        Parameters
+        ----------
+        template: str
+            Path to template file.
+
+        Returns
+        -------
+        dict or None
+            Template name mapped to its source, or None if the templates
+            used can't be known, e.g. a template is included by a variable
+            name.
+
+        Raises
+        ------
+        FileNotFoundError
+            If a template doesn't exist.
+        """
+        environment = self.latex_jinja_env
+        if environment.loader is None:
+            return None
+        sources: dict[str, str] = {}
+        pending = [template]
+        while pending:
+            name = pending.pop()
+            if name in sources:
+                continue
+            try:
+                sources[name], _, _ = environment.loader.get_source(environment, name)
+            except jinja2.exceptions.TemplateNotFound as error:
+                raise FileNotFoundError("Template not Found: ", error)
+            for referenced in meta.find_referenced_templates(environment.parse(sources[name])):
+                if referenced is None:
+                    return None
+                pending.append(referenced)
+        return sources
+
+    def get_template_variables(self, template) -> set[str] | None:
+        """Return the variables a template uses.
+
+        Parameters
+        ----------
+        template: str
+            Path to template file.
+
+        Returns
+        -------
+        set[str] or None
+            Names of the variables the template and the templates it uses
+            read from the report data, or None if they can't be known.
+
+        Raises
+        ------
+        FileNotFoundError
+            If a template doesn't exist.
+        """
+        sources = self.get_template_sources(template)
+        if sources is None:
+            return None
+        variables: set[str] = set()
+        for source in sources.values():
+            variables |= meta.find_undeclared_variables(self.latex_jinja_env.parse(source))
+        return variables
+
+    def ledger_flags(self, market=True) -> list[str]:
+        """Return the ledger flags set in the config file.
+
+        Parameters
+        ----------
+        market: bool
+            Include the market value flags.
+
+        Returns
+        -------
+        list[str]
+            Flags for effective dates, cleared transactions, the price
+            database and market values.
+        """
+        flags = []
+        if self.effective:
+            flags.append("--effective")
+
+        if self.cleared:
+            flags.append("--cleared")
+
+        if self.config.price_db:
+            flags.extend(["--price-db", self.config.price_db])
+
+        if self.market and market:
+            # Add market conversion flag(s)
+            flags.extend(self.market.split())
+        return flags
 
     def get_balance(self, account, date) -> int:
         """Return account balance as rounded, signed int.
 
+        When closed periods are configured the balance is the nearest
+        checkpoint plus the transactions after it.  The checkpoint's
+        accounts are selected the way ledger selects them, so e.g.
+        'Checking' also includes 'Assets:Checking Joint'.
+
         Parameters
         ----------
         account: str
@@ -130,6 +584,38 @@ class Pacioli:
         int
             Rounded account balance
         """
+        if self.get_price_index() is not None:
+            values = self.get_market_values([account], date)
+            if values is not None:
+                return round(values[account])
+
+        checkpoint = self.get_checkpoint(date) if self.checkpoints else None
+        if checkpoint is None:
+            return round(self.query_balance(account, end_date=date))
+
+        boundary, balances = checkpoint
+        opening = sum(
+            balance for name, balance in balances.items() if ledger_selects(account, name)
+        )
+        return round(opening + self.query_balance(account, end_date=date, start_date=boundary))
+
+    def query_balance(self, account, end_date, start_date=None) -> float:
+        """Return the balance of an account from ledger.
+
+        Parameters
+        ----------
+        account: str
+            The full account path of the ledger account.
+        end_date: str
+            Transactions on or after this date are excluded.
+        start_date: str
+            Transactions before this date are excluded.
+
+        Returns
+        -------
+        float
+            Signed account balance
+        """
         ledger_command = [
             "ledger",
             "-f",
@@ -137,33 +623,435 @@ class Pacioli:
             "bal",
             account,
             "--end",
-            date,
+            end_date,
         ]
 
-        if self.effective:
-            ledger_command.append("--effective")
+        if start_date:
+            ledger_command.extend(["--begin", start_date])
 
-        if self.cleared:
-            ledger_command.append("--cleared")
+        ledger_command.extend(self.ledger_flags())
 
-        if self.market:
-            # Add market conversion flag(s)
-            ledger_command.extend(self.market.split())
-
-        output = self.run_system_command(ledger_command)
+        try:
+            output = self.run_system_command(ledger_command)
+        except LedgerError as error:
+            error.account = account
+            raise
         output = output.replace(",", "")
         if output == "":
-            bal = 0
+            return 0.0
+
+        match = re.search(r"\d+(?:.(\d+))?", output)
+        if not match:
+            raise ValueError(
+                f"Unable to parse balance from ledger output for account '{account}': {output}"
+            )
+        bal = float(match.group(0))
+        if "$-" in output:
+            bal = -bal
+        return bal
+
+    def query_amounts(
+        self, accounts, start_date=None, end_date=None, related=False
+    ) -> dict[str, float]:
+        """Return the balance of every matching account's own postings in one query.
+
+        Parameters
+        ----------
+        accounts: list
+            Account names, matched by ledger as patterns.
+        start_date: str
+            Transactions before this date are excluded.
+        end_date: str
+            Transactions on or after this date are excluded.
+        related: bool
+            Report the accounts on the other side of the postings to accounts
+            (ledger's --related) instead of the accounts themselves.
+
+        Returns
+        -------
+        dict
+            Full account name mapped to the balance of its own postings,
+            excluding sub-accounts.
+        """
+        ledger_command = ["ledger", "-f", self.journal_file, "bal", *accounts]
+        if related:
+            ledger_command.append("--related")
         else:
-            match = re.search(r"\d+(?:.(\d+))?", output)
-            if not match:
-                raise ValueError(
-                    f"Unable to parse balance from ledger output for account '{account}': {output}"
+            ledger_command.append("--flat")
+        if start_date:
+            ledger_command.extend(["-b", start_date])
+        if end_date:
+            ledger_command.extend(["-e", end_date])
+        ledger_command.extend(["--format", "%(account)|%(quantity(amount))\n"])
+        ledger_command.extend(self.ledger_flags())
+
+        amounts = {}
+        for line in self.run_system_command(ledger_command).splitlines():
+            if "|" not in line:
+                continue
+            account, amount = line.rsplit("|", 1)
+            try:
+                amounts[account.strip()] = float(amount.strip() or 0)
+            except ValueError:
+                raise ValueError(f"Unable to parse balance from ledger output line: {line}")
+        return amounts
+
+    def query_commodity_amounts(self, accounts, end_date) -> dict[str, dict[str, float]]:
+        """Return the commodity quantities of every matching account in one query.
+
+        Parameters
+        ----------
+        accounts: list
+            Account names, matched by ledger as patterns.
+        end_date: str
+            Transactions on or after this date are excluded.
+
+        Returns
+        -------
+        dict
+            Full account name mapped to the quantity of each commodity in
+            its own postings, excluding sub-accounts.
+        """
+        ledger_command = ["ledger", "-f", self.journal_file, "bal", *accounts, "--flat"]
+        if end_date:
+            ledger_command.extend(["-e", end_date])
+        ledger_command.extend(["--format", "%(account)|%(scrub(amount))\n"])
+        ledger_command.extend(self.ledger_flags(market=False))
+
+        quantities: dict[str, dict[str, float]] = {}
+        account = None
+        for line in self.run_system_command(ledger_command).splitlines():
+            if "|" in line:
+                account, line = line.rsplit("|", 1)
+                account = account.strip()
+                quantities[account] = {}
+            if not line.strip():
+                continue
+            if account is None:
+                raise ValueError(f"Unable to parse balance from ledger output line: {line}")
+            # Amounts of further commodities follow on their own lines
+            amount = parse_amount(line.strip())
+            if amount is None:
+                raise ValueError(f"Unable to parse balance from ledger output line: {line}")
+            quantity, commodity = amount
+            totals = quantities[account]
+            totals[commodity] = totals.get(commodity, 0.0) + quantity
+        return quantities
+
+    def get_price_index(self) -> PriceIndex | None:
+        """Return the price index market values are computed with.
+
+        Returns
+        -------
+        PriceIndex or None
+            None when market values are off or the index is disabled.
+        """
+        if not self.market or not self.config.price_index:
+            return None
+        return PriceIndex.load(self.journal, self.config.price_db)
+
+    def get_market_values(self, accounts, date) -> dict[str, float] | None:
+        """Return the market values of accounts from one quantity query.
+
+        Commodities are valued with the price index at the report date, so
+        ledger does not search the price history for every account.
+
+        Parameters
+        ----------
+        accounts: list
+            Account arguments; each value includes every account ledger
+            selects with it, see ledger_selects().
+        date: str
+            The end date of the balances, YYYY/MM/DD or '' for today.
+
+        Returns
+        -------
+        dict or None
+            Account mapped to its unrounded value, or None if a commodity
+            can't be valued from the index and ledger has to value it.
+        """
+        prices = self.get_price_index()
+        as_of = parse_date(date) if date else datetime.date.today()
+        if prices is None or as_of is None:
+            return None
+
+        try:
+            quantities = self.query_commodity_amounts(sorted(set(accounts)), date)
+        except LedgerError as error:
+            if len(accounts) == 1:
+                error.account = accounts[0]
+            raise
+        values = {}
+        for account in accounts:
+            totals: dict[str, float] = {}
+            for name, amounts in quantities.items():
+                if ledger_selects(account, name):
+                    for commodity, quantity in amounts.items():
+                        totals[commodity] = totals.get(commodity, 0.0) + quantity
+            value = prices.value(totals, as_of, self.config.exchange)
+            if value is None:
+                self.logger.debug(f"Valuing {account} with ledger; the price index can't")
+                return None
+            values[account] = value
+        return values
+
+    def get_shards(self, accounts, start_date, end_date, related=False) -> list[Shard]:
+        """Return the shards a period query is split into.
+
+        Periods are split when the config sets a shard unit, except with
+        market values, which are not additive over time.
+
+        Parameters
+        ----------
+        accounts: list
+            Accounts queried.
+        start_date: str
+        end_date: str
+        related: bool
+            Whether the query is for related flows.
+
+        Returns
+        -------
+        list[Shard]
+            Each shard with its stored amounts, if any.
+        """
+        shards = None
+        if self.config.shard_unit and not self.market:
+            shards = split_period(start_date, end_date, self.config.shard_unit)
+        if not shards:
+            return [Shard(start_date, end_date, None, None)]
+
+        summary = self.journal.scan() if self.shards is not None else None
+        result = []
+        for shard_start, shard_end in shards:
+            stored = version = None
+            if self.shards is not None:
+                version = self.journal.period_fingerprint(
+                    parse_date(shard_start), parse_date(shard_end), summary
                 )
-            bal = round(float(match.group(0)))
-            if "$-" in output:
-                bal = int(f"-{bal}")
-        return bal
+                key = ShardStore.key(accounts, shard_start, shard_end, related)
+                stored = self.shards.get(key, version)
+            result.append(Shard(shard_start, shard_end, stored, version))
+        return result
+
+    def query_period_amounts(
+        self, accounts, start_date, end_date, related=False
+    ) -> dict[str, float]:
+        """Return query_amounts() for a period, querying its shards in parallel.
+
+        Shards in closed periods are stored and reused, so only open shards
+        of a long period are queried again.
+
+        Parameters
+        ----------
+        accounts: list
+            Account names, matched by ledger as patterns.
+        start_date: str
+        end_date: str
+        related: bool
+            Report the accounts on the other side of the postings.
+
+        Returns
+        -------
+        dict
+            Full account name mapped to the balance of its own postings.
+        """
+        shards = self.get_shards(accounts, start_date, end_date, related)
+        if len(shards) == 1 and shards[0].amounts is None:
+            return self.query_amounts(
+                accounts, start_date=start_date, end_date=end_date, related=related
+            )
+
+        # Ledger does the work in subprocesses, so threads are enough to
+        # keep every shard's query running at once.
+        deadline = getattr(self.deadlines, "deadline", None)
+
+        def query_shard(shard_start, shard_end):
+            self.deadlines.deadline = deadline
+            try:
+                return self.query_amounts(
+                    accounts, start_date=shard_start, end_date=shard_end, related=related
+                )
+            finally:
+                self.deadlines.deadline = None
+
+        pending = [shard[:2] for shard in shards if shard.amounts is None]
+        with ThreadPoolExecutor(max_workers=self.config.shard_workers) as pool:
+            futures = {shard: pool.submit(query_shard, *shard) for shard in pending}
+
+            closed_before = None
+            if self.config.close_after_days is not None:
+                closed_before = latest_closed_month(self.config.close_after_days)
+
+            totals: dict[str, float] = {}
+            for shard_start, shard_end, amounts, version in shards:
+                if amounts is None:
+                    amounts = futures[(shard_start, shard_end)].result()
+                    if (
+                        self.shards is not None
+                        and closed_before
+                        and is_before(shard_end, closed_before)
+                    ):
+                        key = ShardStore.key(accounts, shard_start, shard_end, related)
+                        self.shards.put(key, version, amounts)
+                for account, amount in amounts.items():
+                    totals[account] = totals.get(account, 0.0) + amount
+        return {account: round(total, 6) for account, total in totals.items()}
+
+    def run_plan(self, needs) -> dict:
+        """Answer the data needs of a report with as few ledger queries as possible.
+
+        Parameters
+        ----------
+        needs: list
+            Needs from pacioli.planner.
+
+        Returns
+        -------
+        dict
+            Each need mapped to its value.
+        """
+        return QueryPlan(self, needs).execute()
+
+    def get_checkpoint(self, date) -> tuple[str, dict] | None:
+        """Return the closing balances of the nearest closed period.
+
+        A checkpoint is only rebuilt when a journal file with transactions
+        before its boundary changed since it was stored, see
+        Journal.period_fingerprint(), so new transactions in open periods
+        keep it.  If the rebuilt balances differ, something was posted into
+        a closed period and a warning is logged.
+
+        Parameters
+        ----------
+        date: str
+            The end date of the balance being calculated.
+
+        Returns
+        -------
+        tuple or None
+            (boundary date, {account: balance}) or None if no checkpoint
+            applies to the date.
+        """
+        if self.checkpoints is None:
+            return None
+        boundary = self.checkpoints.boundary(date)
+        if boundary is None:
+            return None
+
+        fingerprint = self.journal.period_fingerprint(datetime.date.min, parse_date(boundary))
+        stored = self.checkpoints.get(boundary)
+        if stored and stored["fingerprint"] == fingerprint:
+            return boundary, stored["balances"]
+
+        try:
+            balances = self.get_closing_balances(boundary)
+        except ValueError as error:
+            self.logger.warning(f"Not using checkpoint at {boundary}: {error}")
+            return None
+
+        if stored and stored["balances"] != balances:
+            self.logger.warning(
+                f"Transactions were posted before the closed date {boundary}; "
+                "rebuilding the checkpoint"
+            )
+        self.checkpoints.put(boundary, fingerprint, balances)
+        return boundary, balances
+
+    def get_closing_balances(self, date) -> dict[str, float]:
+        """Return every account's own balance before date in one query.
+
+        Parameters
+        ----------
+        date: str
+            Transactions on or after this date are excluded.
+
+        Returns
+        -------
+        dict
+            Full account name mapped to the balance of its own postings,
+            excluding sub-accounts.
+        """
+        ledger_command = [
+            "ledger",
+            "-f",
+            self.journal_file,
+            "bal",
+            "--empty",
+            "--end",
+            date,
+            "--format",
+            "%(account)|%(quantity(amount))\n",
+        ]
+        ledger_command.extend(self.ledger_flags())
+
+        balances = {}
+        for line in self.run_system_command(ledger_command).splitlines():
+            if "|" not in line:
+                continue
+            account, amount = line.rsplit("|", 1)
+            balance = round(float(amount.strip() or 0), 6)
+            if balance:
+                balances[account.strip()] = balance
+        return balances
+
+    def get_account_index(self) -> AccountIndex:
+        """Return the index of the journal's accounts.
+
+        The index is loaded once per journal version.  Each time a new index is
+        loaded the config's account mappings are checked against it, unknown
+        accounts are logged and the shell completion cache is refreshed.
+
+        Returns
+        -------
+        AccountIndex
+            Every account in the journal.
+        """
+        index = AccountIndex.load(self.journal, self.run_system_command)
+        if index is not self.account_index:
+            self.account_index = index
+            try:
+                write_completion_cache(index.sorted_accounts)
+            except OSError as error:
+                self.logger.debug(f"Unable to write the completion cache: {error}")
+            for category, unknown in self.check_accounts().items():
+                for account, matches in unknown.items():
+                    if is_pattern(account):
+                        self.logger.warning(
+                            f"Pattern '{account}' in {category} matches no accounts"
+                        )
+                        continue
+                    hint = f"; did you mean {', '.join(matches)}?" if matches else ""
+                    self.logger.warning(
+                        f"Account '{account}' in {category} is not in the journal{hint}"
+                    )
+        return index
+
+    def get_accounts(self, category) -> list[str]:
+        """Return the accounts of a config category with patterns expanded.
+
+        Parameters
+        ----------
+        category: list
+            Account names and patterns from the config file.
+
+        Returns
+        -------
+        list[str]
+            Full account names.
+        """
+        return self.get_account_index().expand(category)
+
+    def check_accounts(self) -> dict[str, dict[str, list[str]]]:
+        """Return the accounts in the config file that are not in the journal.
+
+        Returns
+        -------
+        dict
+            Config category mapped to {unknown account: close matches}.
+        """
+        index = AccountIndex.load(self.journal, self.run_system_command)
+        return index.validate(self.config.account_mappings())
 
     def get_account_short_name(self, account) -> str:
         """Get the short account name.
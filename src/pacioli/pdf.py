@@ -0,0 +1,324 @@
+"""Build PDF files from rendered reports.
+
+LaTeX runs don't depend on each other, so reports are built in parallel,
+each in its own temporary directory.  A report whose tex file hasn't
+changed since its last successful build is not built again.
+
+Classes
+-------
+LatexError
+PdfBuild
+BuildManifest
+PdfBuilder
+
+Functions
+---------
+build_pdf
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from pacioli.config import Config
+from pacioli.utils import atomic_write, file_mode
+
+# Command and number of passes of each engine.  The example templates use
+# fontspec, so latexmk runs xelatex; it reruns it as often as references
+# need.  Plain engines run twice so page counts are resolved.
+ENGINES = {
+    "latexmk": (["latexmk", "-xelatex", "-interaction=nonstopmode", "-halt-on-error"], 1),
+    "xelatex": (["xelatex", "-interaction=nonstopmode", "-halt-on-error"], 2),
+    "pdflatex": (["pdflatex", "-interaction=nonstopmode", "-halt-on-error"], 2),
+}
+
+
+class LatexError(RuntimeError):
+    """A LaTeX run failed.
+
+    Attributes
+    ----------
+    command: list
+        The LaTeX command.
+    returncode: int or None
+        Exit status, or None if LaTeX was killed at its timeout.
+    output: str
+        LaTeX's output.
+    timeout: float or None
+        Seconds the build was allowed, when it was killed.
+    """
+
+    def __init__(self, command, returncode=None, output="", timeout=None) -> None:
+        """Record the failed command."""
+        super().__init__()
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        """Describe the failure with LaTeX's first error."""
+        if self.timeout is not None:
+            return f"LaTeX was killed after {self.timeout:g} seconds"
+        errors = [line for line in self.output.splitlines() if line.startswith("!")]
+        detail = f": {errors[0][1:].strip()}" if errors else ""
+        return (
+            f"LaTeX exited with status {self.returncode}{detail} "
+            f"(command: {shlex.join(self.command)})"
+        )
+
+
+class PdfBuild(NamedTuple):
+    """The outcome of building one tex file."""
+
+    tex_file: str
+    pdf_file: str
+    built: bool
+    error: str | None = None
+
+
+def run_latex(command, directory, timeout, env) -> None:
+    """Run a LaTeX command, killing it and its children at the timeout.
+
+    Raises
+    ------
+    LatexError
+        If the command fails or runs past the timeout.
+    """
+    if timeout <= 0:
+        raise LatexError(command, timeout=0)
+    process = subprocess.Popen(
+        command,
+        cwd=directory,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # latexmk starts the engine in the same session
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        process.communicate()
+        raise LatexError(command, timeout=timeout)
+    if process.returncode != 0:
+        raise LatexError(command, process.returncode, output.decode("utf-8", errors="replace"))
+
+
+def build_pdf(tex_file, pdf_file, engine="latexmk", timeout=300) -> None:
+    """Build one tex file into a PDF.
+
+    LaTeX runs in a temporary directory so parallel builds don't share
+    auxiliary files, with the tex file's directory on TEXINPUTS for any
+    files it inputs.  The PDF replaces pdf_file once it is complete.
+
+    Parameters
+    ----------
+    tex_file: str
+        Path to the tex file.
+    pdf_file: str
+        Path to write the PDF to.
+    engine: str
+        Key of ENGINES.
+    timeout: float
+        Seconds all LaTeX passes may take together.
+
+    Raises
+    ------
+    LatexError
+        If LaTeX fails or runs past the timeout.
+    """
+    command, passes = ENGINES[engine]
+    deadline = time.monotonic() + timeout
+    name = os.path.basename(tex_file)
+    env = dict(os.environ, TEXINPUTS=os.path.dirname(os.path.abspath(tex_file)) + os.pathsep)
+    with tempfile.TemporaryDirectory(prefix="pacioli-latex-") as directory:
+        shutil.copyfile(tex_file, os.path.join(directory, name))
+        try:
+            for _ in range(passes):
+                run_latex([*command, name], directory, deadline - time.monotonic(), env)
+        except LatexError as error:
+            if error.timeout is not None:
+                # Report the time the whole build was allowed
+                error.timeout = timeout
+            raise
+
+        built = os.path.join(directory, os.path.splitext(name)[0] + ".pdf")
+        destination = os.path.dirname(os.path.abspath(pdf_file))
+        os.makedirs(destination, exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=destination, prefix=".pacioli-", suffix=".pdf")
+        os.close(fd)
+        try:
+            shutil.copyfile(built, partial)
+            os.chmod(partial, file_mode(pdf_file))
+            os.replace(partial, pdf_file)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(partial)
+            raise
+
+
+class BuildManifest:
+    """Digests of the tex files behind the last successful builds.
+
+    Methods
+    -------
+    get(pdf_file)
+        Returns the digest the PDF was built from.
+    put(pdf_file, digest)
+        Records the digest a PDF was built from.
+    save()
+        Writes the manifest.
+    """
+
+    def __init__(self, path) -> None:
+        """Load the manifest.
+
+        Parameters
+        ----------
+        path: str
+            JSON file the manifest is stored in.
+        """
+        self.path = path
+        try:
+            with open(path) as manifest:
+                self.builds = json.load(manifest)
+        except (OSError, ValueError):
+            self.builds = {}
+
+    def get(self, pdf_file) -> str | None:
+        """Return the digest of the tex file a PDF was last built from."""
+        return self.builds.get(os.path.abspath(pdf_file))
+
+    def put(self, pdf_file, digest) -> None:
+        """Record the digest of the tex file a PDF was built from."""
+        self.builds[os.path.abspath(pdf_file)] = digest
+
+    def save(self) -> None:
+        """Write the manifest."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, json.dumps(self.builds))
+
+
+class PdfBuilder:
+    """Builds tex files into PDFs in parallel.
+
+    Methods
+    -------
+    from_config(config)
+        Returns a builder with a config's PDF settings.
+    build(tex_files, force=False)
+        Builds the PDFs of tex files that changed since their last build.
+    """
+
+    def __init__(self, engine="latexmk", workers=None, timeout=300, manifest=None) -> None:
+        """Set the build settings.
+
+        Parameters
+        ----------
+        engine: str
+            'latexmk', 'xelatex' or 'pdflatex'.
+        workers: int
+            LaTeX runs at a time.  Defaults to the number of CPUs.
+        timeout: float
+            Seconds each build may take.
+        manifest: BuildManifest
+            Digests of earlier builds.  None builds every file.
+
+        Raises
+        ------
+        ValueError
+            If the engine is unknown.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown LaTeX engine: {engine}")
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.manifest = manifest
+
+    @classmethod
+    def from_config(cls, config) -> "PdfBuilder":
+        """Return a builder with a config's PDF settings.
+
+        The manifest is kept in the pacioli cache directory.
+        """
+        manifest = BuildManifest(os.path.join(Config.get_cache_path(), "pdf", "builds.json"))
+        return cls(config.pdf_engine, config.pdf_workers, config.pdf_timeout, manifest)
+
+    def digest(self, tex_file) -> str:
+        """Return the digest of a tex file's content and the engine."""
+        digest = hashlib.sha256(self.engine.encode() + b"\0")
+        with open(tex_file, "rb") as tex:
+            for block in iter(lambda: tex.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def build(self, tex_files, force=False) -> list[PdfBuild]:
+        """Build the PDF of each tex file next to it.
+
+        A PDF is only built if its tex file changed since its last
+        successful build or the PDF is missing.  A failed build doesn't stop
+        the others.
+
+        Parameters
+        ----------
+        tex_files: list
+            Paths to tex files.
+        force: bool
+            Build every file.
+
+        Returns
+        -------
+        list[PdfBuild]
+            The outcome for each tex file, in order.
+        """
+        builds: list[PdfBuild | None] = []
+        pending = {}
+        for position, tex_file in enumerate(tex_files):
+            pdf_file = os.path.splitext(tex_file)[0] + ".pdf"
+            digest = self.digest(tex_file)
+            if (
+                not force
+                and self.manifest is not None
+                and self.manifest.get(pdf_file) == digest
+                and os.path.exists(pdf_file)
+            ):
+                builds.append(PdfBuild(tex_file, pdf_file, built=False))
+                continue
+            builds.append(None)
+            pending[position] = (tex_file, pdf_file, digest)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+                futures = {
+                    position: executor.submit(
+                        build_pdf, tex_file, pdf_file, self.engine, self.timeout
+                    )
+                    for position, (tex_file, pdf_file, _) in pending.items()
+                }
+                for position, future in futures.items():
+                    tex_file, pdf_file, digest = pending[position]
+                    try:
+                        future.result()
+                    except (LatexError, OSError) as error:
+                        builds[position] = PdfBuild(tex_file, pdf_file, False, str(error))
+                        continue
+                    builds[position] = PdfBuild(tex_file, pdf_file, built=True)
+                    if self.manifest is not None:
+                        self.manifest.put(pdf_file, digest)
+            if self.manifest is not None:
+                self.manifest.save()
+        return [build for build in builds if build is not None]
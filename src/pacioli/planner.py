@@ -0,0 +1,235 @@
+"""Plan the ledger queries behind one or more reports.
+
+Reports declare the data they need instead of querying ledger directly.
+The planner removes duplicate needs and merges the rest into as few ledger
+invocations as possible:
+
+- Balances of any number of accounts at the same date are read from one
+  flat balance query and summed per account in Python.
+- Identical period and related-flow needs run once.
+- With market values, commodity quantities at each date are read in one
+  query and valued with the price index.
+- Long periods are split into shards queried in parallel when sharding is
+  configured, and stored shards of closed periods are not queried again.
+
+Classes
+-------
+Balance
+PeriodBalances
+RelatedFlows
+Query
+QueryPlan
+"""
+
+from typing import NamedTuple
+
+from pacioli.accounts import ledger_selects
+
+
+class Balance(NamedTuple):
+    """Balance of an account, including sub-accounts, before a date."""
+
+    account: str
+    date: str
+
+
+class PeriodBalances(NamedTuple):
+    """Own balances of every account under accounts within a period."""
+
+    accounts: tuple[str, ...]
+    start_date: str
+    end_date: str
+
+
+class RelatedFlows(NamedTuple):
+    """Own balances of the accounts on the other side of postings to accounts."""
+
+    accounts: tuple[str, ...]
+    start_date: str
+    end_date: str
+
+
+class Query(NamedTuple):
+    """One step of a plan and the needs it answers."""
+
+    description: str
+    needs: tuple
+    invocations: int
+
+
+class QueryPlan:
+    """The ledger queries that answer a set of needs.
+
+    Methods
+    -------
+    explain()
+        Returns a description of the plan.
+    execute()
+        Runs the queries and returns the value of every need.
+    """
+
+    def __init__(self, pacioli, needs) -> None:
+        """Plan the queries.
+
+        Parameters
+        ----------
+        pacioli: Pacioli
+            Report object the queries are run with.
+        needs: iterable
+            Balance, PeriodBalances and RelatedFlows needs, in any order and
+            possibly repeated.
+        """
+        self.pacioli = pacioli
+        self.needs = list(dict.fromkeys(needs))
+        self.queries = self.build()
+
+    def build(self) -> list[Query]:
+        """Group the needs into queries."""
+        balances: dict[str, list[Balance]] = {}
+        queries = []
+        for need in self.needs:
+            if isinstance(need, Balance):
+                balances.setdefault(need.date, []).append(need)
+            elif isinstance(need, PeriodBalances):
+                accounts = ", ".join(need.accounts)
+                queries.append(
+                    self.period_query(
+                        f"balances under {accounts} from {need.start_date} to {need.end_date}",
+                        need,
+                    )
+                )
+            elif isinstance(need, RelatedFlows):
+                queries.append(
+                    self.period_query(
+                        f"flows related to {len(need.accounts)} accounts "
+                        f"from {need.start_date} to {need.end_date}",
+                        need,
+                        related=True,
+                    )
+                )
+            else:
+                raise TypeError(f"Unknown query need: {need!r}")
+
+        for date, needs in balances.items():
+            label = date or "today"
+            if self.pacioli.market and self.pacioli.get_price_index() is not None:
+                queries.append(
+                    Query(
+                        f"commodities of {len(needs)} accounts at {label}, "
+                        "valued from the price index",
+                        tuple(needs),
+                        1,
+                    )
+                )
+            elif self.pacioli.market:
+                # Market values can't be summed from per-account quantities, so
+                # each balance is queried on its own.
+                queries.extend(
+                    Query(f"market value of {need.account} at {label}", (need,), 1)
+                    for need in needs
+                )
+            else:
+                queries.append(
+                    Query(f"balances of {len(needs)} accounts at {label}", tuple(needs), 1)
+                )
+        return queries
+
+    def period_query(self, description, need, related=False) -> Query:
+        """Return the query for a period need, noting how it is sharded."""
+        shards = self.pacioli.get_shards(need.accounts, need.start_date, need.end_date, related)
+        pending = sum(1 for shard in shards if shard.amounts is None)
+        if len(shards) > 1:
+            description += f" in {len(shards)} shards ({len(shards) - pending} stored)"
+        return Query(description, (need,), pending)
+
+    @property
+    def invocations(self) -> int:
+        """Return the estimated number of ledger invocations."""
+        return sum(query.invocations for query in self.queries)
+
+    def explain(self) -> str:
+        """Return a description of the plan.
+
+        Returns
+        -------
+        str
+            One line per query, preceded by a summary of the number of needs
+            and estimated ledger invocations.
+        """
+        lines = [
+            f"Query plan: {len(self.needs)} needs answered by "
+            f"{self.invocations} ledger invocations"
+        ]
+        for number, query in enumerate(self.queries, start=1):
+            lines.append(f"  {number}. {query.description}")
+        return "\n".join(lines)
+
+    def execute(self) -> dict:
+        """Run the queries.
+
+        Returns
+        -------
+        dict
+            Each need mapped to its value: an int for Balance and a dict of
+            full account name to float for PeriodBalances and RelatedFlows.
+        """
+        results: dict = {}
+        for query in self.queries:
+            need = query.needs[0]
+            if isinstance(need, PeriodBalances):
+                results[need] = self.pacioli.query_period_amounts(
+                    need.accounts, need.start_date, need.end_date
+                )
+            elif isinstance(need, RelatedFlows):
+                results[need] = self.pacioli.query_period_amounts(
+                    need.accounts, need.start_date, need.end_date, related=True
+                )
+            elif self.pacioli.market:
+                results.update(self.get_market_values(need.date, query.needs))
+            else:
+                results.update(self.get_balances(need.date, query.needs))
+        return results
+
+    def get_market_values(self, date, needs) -> dict[Balance, int]:
+        """Return the market values of several accounts at one date.
+
+        The values come from one quantity query and the price index when
+        it can value every commodity, otherwise from one ledger query per
+        account.
+        """
+        values = None
+        if self.pacioli.get_price_index() is not None:
+            values = self.pacioli.get_market_values([need.account for need in needs], date)
+        if values is None:
+            return {
+                need: round(self.pacioli.query_balance(need.account, end_date=date))
+                for need in needs
+            }
+        return {need: round(values[need.account]) for need in needs}
+
+    def get_balances(self, date, needs) -> dict[Balance, int]:
+        """Return the balances of several accounts at one date from one query.
+
+        Closed-period checkpoints are used when configured, as in
+        Pacioli.get_balance.
+        """
+        start_date = None
+        opening: dict[str, float] = {}
+        checkpoint = self.pacioli.get_checkpoint(date) if self.pacioli.checkpoints else None
+        if checkpoint is not None:
+            start_date, opening = checkpoint
+
+        accounts = sorted({need.account for need in needs})
+        amounts = self.pacioli.query_amounts(accounts, start_date=start_date, end_date=date)
+
+        results = {}
+        for need in needs:
+            # Each account gets what a query for it alone would return
+            total = sum(
+                balance
+                for balances in (opening, amounts)
+                for name, balance in balances.items()
+                if ledger_selects(need.account, name)
+            )
+            results[need] = round(total)
+        return results
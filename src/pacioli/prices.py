@@ -0,0 +1,205 @@
+"""Value commodity balances from the journal's price history.
+
+Ledger re-reads and searches the whole price history for every market
+value query.  The price index reads it once, from price directives, the
+costs of postings and an optional price database, and keeps the prices
+of each commodity in date-sorted arrays for binary search.
+
+Classes
+-------
+PriceIndex
+"""
+
+import bisect
+import os
+import threading
+from array import array
+
+from pacioli.journal import Price, scan_file
+
+# Commodities converted through at most this many prices, e.g. a fund
+# priced in EUR valued in USD.
+MAX_CONVERSIONS = 3
+
+
+class PriceIndex:
+    """As-of lookups of commodity prices.
+
+    Methods
+    -------
+    load(journal, price_db=None)
+        Returns the shared index of a journal's prices.
+    price(commodity, date, currency=None)
+        Returns the latest price of a commodity on or before a date.
+    convert(commodity, quantity, date, currency)
+        Returns a quantity of a commodity in another currency.
+    value(quantities, date, currency=None)
+        Returns the value of commodity quantities in one currency.
+    """
+
+    # Indexes shared by report objects, keyed on journal path
+    loaded: dict[str, "PriceIndex"] = {}
+    lock = threading.Lock()
+
+    def __init__(self, prices, fingerprint=None) -> None:
+        """Index prices.
+
+        Parameters
+        ----------
+        prices: iterable
+            Price tuples in the order Ledger reads them.  For prices on the
+            same date the last one read wins.
+        fingerprint: str
+            Fingerprint of the files the prices were read from.
+        """
+        self.fingerprint = fingerprint
+        by_series: dict[tuple[str, str], list[tuple[int, int, float]]] = {}
+        for order, price in enumerate(prices):
+            by_series.setdefault((price.commodity, price.currency), []).append(
+                (price.date.toordinal(), order, price.amount)
+            )
+
+        # commodity -> currency -> (dates as ordinals, amounts), sorted by date
+        self.series: dict[str, dict[str, tuple[array, array]]] = {}
+        for (commodity, currency), points in by_series.items():
+            points.sort()
+            self.series.setdefault(commodity, {})[currency] = (
+                array("l", (point[0] for point in points)),
+                array("d", (point[2] for point in points)),
+            )
+
+    @classmethod
+    def load(cls, journal, price_db=None) -> "PriceIndex":
+        """Return the index of a journal's prices.
+
+        The index is built from a scan of the journal and shared until any
+        of its files or the price database change.
+
+        Parameters
+        ----------
+        journal: Journal
+            The journal to index.
+        price_db: str
+            Price database read before the journal, as with Ledger's
+            --price-db.
+
+        Returns
+        -------
+        PriceIndex
+            Index of the journal's prices.
+        """
+        path = os.path.abspath(journal.journal_file)
+        fingerprint = journal.fingerprint()
+        if price_db:
+            try:
+                stat = os.stat(price_db)
+                fingerprint += f"\0{stat.st_mtime_ns}\0{stat.st_size}"
+            except OSError:
+                pass
+
+        with cls.lock:
+            index = cls.loaded.get(path)
+            if index is None or index.fingerprint != fingerprint:
+                prices: list[Price] = []
+                if price_db:
+                    for segment in scan_file(price_db).price_segments:
+                        prices.extend(segment)
+                prices.extend(journal.scan().prices)
+                index = cls(prices, fingerprint)
+                cls.loaded[path] = index
+            return index
+
+    def __len__(self) -> int:
+        """Return the number of prices indexed."""
+        return sum(
+            len(dates) for currencies in self.series.values() for dates, _ in currencies.values()
+        )
+
+    def price(self, commodity, date, currency=None) -> tuple[float, str] | None:
+        """Return the latest price of a commodity on or before a date.
+
+        Parameters
+        ----------
+        commodity: str
+            Commodity symbol, e.g. 'AAPL'.
+        date: datetime.date
+            Prices after this date are ignored.
+        currency: str
+            Only consider prices in this currency.  Defaults to any.
+
+        Returns
+        -------
+        tuple or None
+            (price of one unit, currency), or None if there is no price.
+        """
+        latest = None
+        day = date.toordinal()
+        for price_currency, (dates, amounts) in self.series.get(commodity, {}).items():
+            if currency is not None and price_currency != currency:
+                continue
+            position = bisect.bisect_right(dates, day) - 1
+            if position >= 0 and (latest is None or dates[position] > latest[0]):
+                latest = (dates[position], amounts[position], price_currency)
+        if latest is None:
+            return None
+        return latest[1], latest[2]
+
+    def convert(self, commodity, quantity, date, currency) -> tuple[float, str] | None:
+        """Return a quantity of a commodity in another currency.
+
+        With currency None the commodity is converted with its latest price
+        in any currency, like Ledger's --market.  Otherwise a direct price
+        in the currency is preferred over a conversion through the latest
+        price's currency.
+        """
+        for _ in range(MAX_CONVERSIONS):
+            if commodity == currency:
+                break
+            price = None
+            if currency is not None:
+                price = self.price(commodity, date, currency)
+            price = price or self.price(commodity, date)
+            if price is None:
+                return (quantity, commodity) if currency is None else None
+            quantity, commodity = quantity * price[0], price[1]
+            if currency is None:
+                break
+        if currency is not None and commodity != currency:
+            return None
+        return quantity, commodity
+
+    def value(self, quantities, date, currency=None) -> float | None:
+        """Return the value of commodity quantities in one currency.
+
+        Parameters
+        ----------
+        quantities: dict
+            Commodity mapped to quantity, e.g. {'AAPL': 10, '$': -1500}.
+        date: datetime.date
+            Prices after this date are ignored.
+        currency: str
+            Currency to value in, as with Ledger's --exchange.  Defaults to
+            converting each commodity with its latest price, as with
+            --market.
+
+        Returns
+        -------
+        float or None
+            The total value, or None if the quantities can't be valued in a
+            single currency, e.g. a commodity has no price.
+        """
+        total = 0.0
+        total_currency = currency
+        for commodity, quantity in quantities.items():
+            if not quantity:
+                continue
+            converted = self.convert(commodity, quantity, date, currency)
+            if converted is None:
+                return None
+            amount, amount_currency = converted
+            if total_currency is None:
+                total_currency = amount_currency
+            elif amount_currency != total_currency:
+                return None
+            total += amount
+        return total
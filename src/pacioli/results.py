@@ -0,0 +1,304 @@
+"""Report results as typed values, separate from rendering.
+
+A statement is built from ledger data as a Statement of sections of
+account lines with integer amounts, and only then turned into template
+variables.  Statements are immutable, compact and cheap to serialize, so
+they can be cached, sent between processes and added together.
+
+Classes
+-------
+Line
+Section
+Statement
+"""
+
+import csv
+import io
+import json
+import marshal
+from dataclasses import dataclass
+
+# Version of the tuple layout written by Statement.to_bytes()
+FORMAT_VERSION = 1
+
+# Columns of Statement.to_csv()
+CSV_COLUMNS = ("report", "start_date", "end_date", "section", "account", "name", "amount")
+
+
+@dataclass(frozen=True, slots=True)
+class Line:
+    """One account line of a statement.
+
+    Attributes
+    ----------
+    name: str
+        Display name, e.g. 'Checking'.
+    account: str
+        Full account name or pattern, e.g. 'Assets:Current:Checking'.
+    amount: int
+        Rounded amount, with the sign the statement presents it with.
+    children: tuple
+        Lines of sub-accounts whose amounts are included in this one.
+    """
+
+    name: str
+    account: str
+    amount: int
+    children: tuple["Line", ...] = ()
+
+    def to_tuple(self) -> tuple:
+        """Return the line as nested tuples of builtin values."""
+        return (
+            self.name,
+            self.account,
+            self.amount,
+            tuple(child.to_tuple() for child in self.children),
+        )
+
+    @classmethod
+    def from_tuple(cls, values) -> "Line":
+        """Return the line written by to_tuple()."""
+        name, account, amount, children = values
+        return cls(name, account, amount, tuple(cls.from_tuple(child) for child in children))
+
+    def to_dict(self) -> dict:
+        """Return the line as a JSON compatible dict."""
+        return {
+            "name": self.name,
+            "account": self.account,
+            "amount": self.amount,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    @classmethod
+    def from_dict(cls, values) -> "Line":
+        """Return the line written by to_dict()."""
+        return cls(
+            values["name"],
+            values["account"],
+            values["amount"],
+            tuple(cls.from_dict(child) for child in values.get("children", ())),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    """A group of lines and their total.
+
+    Attributes
+    ----------
+    name: str
+        Section name, e.g. 'current_assets'.
+    lines: tuple
+        Top level lines of the section.
+    total: int
+        Total of the section.
+    """
+
+    name: str
+    lines: tuple[Line, ...]
+    total: int
+
+    def to_tuple(self) -> tuple:
+        """Return the section as nested tuples of builtin values."""
+        return (self.name, tuple(line.to_tuple() for line in self.lines), self.total)
+
+    @classmethod
+    def from_tuple(cls, values) -> "Section":
+        """Return the section written by to_tuple()."""
+        name, lines, total = values
+        return cls(name, tuple(Line.from_tuple(line) for line in lines), total)
+
+    def to_dict(self) -> dict:
+        """Return the section as a JSON compatible dict."""
+        return {
+            "name": self.name,
+            "lines": [line.to_dict() for line in self.lines],
+            "total": self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, values) -> "Section":
+        """Return the section written by to_dict()."""
+        return cls(
+            values["name"],
+            tuple(Line.from_dict(line) for line in values["lines"]),
+            values["total"],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Statement:
+    """The result of a report.
+
+    Attributes
+    ----------
+    report: str
+        Report name, e.g. 'balance-sheet'.
+    title: str
+        Report title from the config file.
+    start_date: str
+        Start of the period, '' for the balance sheet.
+    end_date: str
+        End of the period, or the date of the balance sheet.
+    sections: tuple
+        Sections in the order the statement presents them.
+    totals: tuple
+        (name, amount) pairs of the statement's totals, e.g.
+        ('net_income', 1200).
+
+    Methods
+    -------
+    section(name)
+        Returns a section by name.
+    total(name)
+        Returns a total by name.
+    to_json() / from_json(text)
+        JSON serialization.
+    to_csv()
+        One row per line and total.
+    to_bytes() / from_bytes(data)
+        Compact binary serialization.
+    """
+
+    report: str
+    title: str
+    start_date: str
+    end_date: str
+    sections: tuple[Section, ...]
+    totals: tuple[tuple[str, int], ...]
+
+    def section(self, name) -> Section:
+        """Return the section with a name.
+
+        Raises
+        ------
+        KeyError
+            If the statement has no such section.
+        """
+        for section in self.sections:
+            if section.name == name:
+                return section
+        raise KeyError(name)
+
+    def total(self, name) -> int:
+        """Return the total with a name, or a section's total.
+
+        Raises
+        ------
+        KeyError
+            If the statement has no such total or section.
+        """
+        for total_name, amount in self.totals:
+            if total_name == name:
+                return amount
+        return self.section(name).total
+
+    def to_tuple(self) -> tuple:
+        """Return the statement as nested tuples of builtin values."""
+        return (
+            self.report,
+            self.title,
+            self.start_date,
+            self.end_date,
+            tuple(section.to_tuple() for section in self.sections),
+            self.totals,
+        )
+
+    @classmethod
+    def from_tuple(cls, values) -> "Statement":
+        """Return the statement written by to_tuple()."""
+        report, title, start_date, end_date, sections, totals = values
+        return cls(
+            report,
+            title,
+            start_date,
+            end_date,
+            tuple(Section.from_tuple(section) for section in sections),
+            tuple((name, amount) for name, amount in totals),
+        )
+
+    def to_dict(self) -> dict:
+        """Return the statement as a JSON compatible dict."""
+        return {
+            "report": self.report,
+            "title": self.title,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "sections": [section.to_dict() for section in self.sections],
+            "totals": dict(self.totals),
+        }
+
+    @classmethod
+    def from_dict(cls, values) -> "Statement":
+        """Return the statement written by to_dict()."""
+        return cls(
+            values["report"],
+            values["title"],
+            values["start_date"],
+            values["end_date"],
+            tuple(Section.from_dict(section) for section in values["sections"]),
+            tuple(values["totals"].items()),
+        )
+
+    def rows(self):
+        """Yield the statement as CSV rows, see to_csv()."""
+        dates = (self.report, self.start_date, self.end_date)
+        for section in self.sections:
+            pending = list(reversed(section.lines))
+            while pending:
+                line = pending.pop()
+                yield (*dates, section.name, line.account, line.name, line.amount)
+                pending.extend(reversed(line.children))
+            yield (*dates, section.name, "", "total", section.total)
+        for name, amount in self.totals:
+            yield (*dates, "", "", name, amount)
+
+    def to_csv(self) -> str:
+        """Return the statement as CSV.
+
+        Every line is a row, with sub-account lines after their parent line
+        and included in its amount, followed by a 'total' row for each
+        section.  The statement's totals come last with an empty section.
+
+        Returns
+        -------
+        str
+            CSV with a header of CSV_COLUMNS.
+        """
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(self.rows())
+        return out.getvalue()
+
+    def to_json(self) -> str:
+        """Return the statement as JSON."""
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text) -> "Statement":
+        """Return the statement written by to_json()."""
+        return cls.from_dict(json.loads(text))
+
+    def to_bytes(self) -> bytes:
+        """Return the statement in a compact binary form.
+
+        The form is marshal's, which is only read back by the same Python
+        version; use to_json() for anything stored long term.
+        """
+        return marshal.dumps((FORMAT_VERSION, self.to_tuple()))
+
+    @classmethod
+    def from_bytes(cls, data) -> "Statement":
+        """Return the statement written by to_bytes().
+
+        Raises
+        ------
+        ValueError
+            If data was written in another format.
+        """
+        version, values = marshal.loads(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown statement format: {version}")
+        return cls.from_tuple(values)
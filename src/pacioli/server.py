@@ -0,0 +1,144 @@
+"""Serve reports over HTTP on localhost.
+
+Classes
+-------
+ReportServer
+ReportRequestHandler
+"""
+
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import click
+
+from pacioli.pacioli import LedgerTimeout
+from pacioli.utils import period_to_dates
+
+logger = logging.getLogger(__name__)
+
+# URL path mapped to the report it serves
+ROUTES = {
+    "/balance-sheet": "balance-sheet",
+    "/income-statement": "income-statement",
+    "/cash-flow": "cash-flow-statement",
+}
+
+CONTENT_TYPES = {
+    "tex": "application/x-tex; charset=utf-8",
+    "json": "application/json",
+}
+
+
+class ReportServer(ThreadingHTTPServer):
+    """Threaded HTTP server bound to localhost that shares one backend."""
+
+    daemon_threads = True
+
+    def __init__(self, backend, port=8000) -> None:
+        """Bind the server.
+
+        Parameters
+        ----------
+        backend: ReportBackend
+            Warm backend shared by every request.
+        port: int
+            Port to listen on. 0 picks a free port.
+        """
+        self.backend = backend
+        super().__init__(("127.0.0.1", port), ReportRequestHandler)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """Answers report requests from the server's shared backend.
+
+    Supported requests:
+
+    - GET /balance-sheet?date=YYYY/MM/DD
+    - GET /income-statement?period=PERIOD
+    - GET /cash-flow?period=PERIOD
+
+    Each accepts `format=tex` (default) or `format=json` and honours
+    If-None-Match with the ETag of the previous response.
+    """
+
+    server: ReportServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handle a GET request."""
+        url = urlparse(self.path)
+        report = ROUTES.get(url.path)
+        if report is None:
+            self.send_error(404, f"Unknown report: {url.path}")
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        output_format = query.get("format", "tex")
+        if output_format not in CONTENT_TYPES:
+            self.send_error(400, f"Unknown format: {output_format}")
+            return
+
+        try:
+            start_date, end_date = self.get_dates(report, query)
+            etag, body = self.server.backend.get_response(
+                report, start_date, end_date, output_format
+            )
+        except click.UsageError as error:
+            self.send_error(400, error.message)
+            return
+        except LedgerTimeout as error:
+            logger.error(str(error))
+            self.send_error(504, str(error))
+            return
+        except Exception as error:
+            logger.exception("Unable to render report")
+            self.send_error(500, str(error))
+            return
+
+        quoted_etag = f'"{etag}"'
+        if quoted_etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", quoted_etag)
+            self.end_headers()
+            return
+
+        content = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[output_format])
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", quoted_etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    @staticmethod
+    def get_dates(report, query) -> list[str]:
+        """Return the [start_date, end_date] requested in a query string.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        query: dict
+            Query parameters.
+
+        Returns
+        -------
+        list[str]
+            Start and end dates.
+        """
+        if report == "balance-sheet":
+            if "date" in query:
+                return ["", query["date"]]
+            if "period" in query:
+                return ["", period_to_dates(query["period"])[1]]
+            raise click.UsageError("Please enter a date or period.")
+
+        if "period" in query:
+            return period_to_dates(query["period"])
+        if "begin" in query and "end" in query:
+            return [query["begin"], query["end"]]
+        raise click.UsageError("Please enter a period or begin and end dates.")
+
+    def log_message(self, format, *args) -> None:
+        """Send access logs to the logging module instead of stderr."""
+        logger.info(format % args)
@@ -0,0 +1,156 @@
+"""Split long reporting periods into shards that are queried separately.
+
+Period flows are additive, so the balances of a multi-year period are the
+sums of the balances of its years or quarters.  Shards can be queried in
+parallel, and shards in closed periods never change, so their results are
+stored and reused.
+
+Stored shards are kept while the journal files with transactions in them
+are unchanged, so new transactions in the open period don't invalidate
+closed years.
+
+Classes
+-------
+Shard
+ShardStore
+
+Functions
+---------
+split_period
+parse_date
+is_before
+"""
+
+import datetime
+from typing import NamedTuple
+
+from pacioli.checkpoints import DATE_PATTERN
+from pacioli.stores import JsonStore
+
+# Months in each shard unit
+UNITS = {"month": 1, "quarter": 3, "year": 12}
+
+
+class Shard(NamedTuple):
+    """One piece of a period query."""
+
+    start_date: str
+    end_date: str
+    # Stored amounts, or None if the shard has to be queried
+    amounts: dict[str, float] | None
+    # Fingerprint of the journal files with transactions in the shard
+    version: str | None
+
+
+def split_period(start_date, end_date, unit) -> list[tuple[str, str]] | None:
+    """Split a period at month, quarter or year boundaries.
+
+    Parameters
+    ----------
+    start_date: str
+        First date of the period in YYYY/MM/DD form.
+    end_date: str
+        Date after the period in YYYY/MM/DD form.
+    unit: str
+        'month', 'quarter' or 'year'.
+
+    Returns
+    -------
+    list or None
+        (start, end) of each shard in order, where the first and last
+        shards may be partial.  None if the dates can't be parsed.
+    """
+    start = parse_date(start_date)
+    end = parse_date(end_date)
+    if start is None or end is None or unit not in UNITS:
+        return None
+
+    months = UNITS[unit]
+    shards = []
+    current = start
+    while current < end:
+        # First month of the next unit, e.g. the next quarter
+        month_index = current.year * 12 + current.month - 1
+        next_index = (month_index // months + 1) * months
+        boundary = datetime.date(next_index // 12, next_index % 12 + 1, 1)
+        shard_end = min(boundary, end)
+        shards.append((format_date(current), format_date(shard_end)))
+        current = shard_end
+    return shards
+
+
+def parse_date(date) -> datetime.date | None:
+    """Return a YYYY/MM/DD date, or None if it can't be parsed."""
+    match = DATE_PATTERN.match(date or "")
+    if not match:
+        return None
+    try:
+        return datetime.date(*(int(part) for part in match.groups()))
+    except ValueError:
+        return None
+
+
+def is_before(date, other) -> bool:
+    """Return True if a YYYY/MM/DD date is on or before a datetime.date."""
+    parsed = parse_date(date)
+    return parsed is not None and parsed <= other
+
+
+def format_date(date) -> str:
+    """Return a date in ledger's YYYY/M/D form."""
+    return f"{date.year}/{date.month}/{date.day}"
+
+
+class ShardStore(JsonStore):
+    """Results of queries over closed shards.
+
+    Methods
+    -------
+    get(key, version)
+        Returns the stored amounts for a shard query.
+    put(key, version, amounts)
+        Stores the amounts of a shard query.
+    """
+
+    kind = "shards"
+
+    @staticmethod
+    def key(accounts, start_date, end_date, related) -> str:
+        """Return the key of a shard query."""
+        kind = "related" if related else "balances"
+        return "|".join([kind, ",".join(accounts), start_date, end_date])
+
+    def get(self, key, version) -> dict[str, float] | None:
+        """Return the stored amounts of a shard query if they are current.
+
+        Parameters
+        ----------
+        key: str
+            Key from ShardStore.key().
+        version: str
+            Fingerprint of the journal files with transactions in the shard.
+
+        Returns
+        -------
+        dict or None
+            The stored amounts, or None if the shard isn't stored or the
+            journal changed since.
+        """
+        stored = self.read(key)
+        if stored and stored["version"] == version:
+            return stored["amounts"]
+        return None
+
+    def put(self, key, version, amounts) -> None:
+        """Store the amounts of a shard query.
+
+        Parameters
+        ----------
+        key: str
+            Key from ShardStore.key().
+        version: str
+            Fingerprint of the journal files with transactions in the shard.
+        amounts: dict
+            Full account name mapped to its own balance in the shard.
+        """
+        self.write(key, {"version": version, "amounts": amounts})
@@ -0,0 +1,100 @@
+"""Keep results of closed periods in JSON files between runs.
+
+Checkpoints and shard results both map keys to values computed from one
+journal read with one set of ledger flags.  Each kind lives in a JSON file
+of its own under the cache directory, which is rewritten atomically.
+
+Classes
+-------
+JsonStore
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from pacioli.utils import atomic_write
+
+
+class JsonStore:
+    """Entries persisted in a JSON file.
+
+    The reports of a backend share one store, so entries one report stores
+    are seen by the others.  Storing an entry first merges in the entries
+    other processes stored, so concurrent runs don't drop each other's.
+
+    Methods
+    -------
+    store_path(cache_dir, journal_file, flags)
+        Returns the file the entries of a journal are stored in.
+    read(key)
+        Returns a stored entry.
+    write(key, value)
+        Stores an entry.
+    """
+
+    # Directory under the cache directory the stores of this kind live in
+    kind = "stores"
+
+    def __init__(self, path) -> None:
+        """Load the stored entries.
+
+        Parameters
+        ----------
+        path: str
+            JSON file the entries are stored in.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    @classmethod
+    def store_path(cls, cache_dir, journal_file, flags) -> str:
+        """Return the file the entries for a journal and set of flags live in.
+
+        Parameters
+        ----------
+        cache_dir: str
+            Pacioli cache directory.
+        journal_file: str
+            Path to the journal file.
+        flags: list
+            Ledger flags that change balances, e.g. '--cleared'.
+
+        Returns
+        -------
+        str
+            Path of the JSON store.
+        """
+        key = "\0".join([os.path.abspath(os.path.expanduser(journal_file)), *flags])
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(cache_dir, cls.kind, f"{name}.json")
+
+    def load(self) -> dict:
+        """Return the entries in the file, or none if it can't be read."""
+        try:
+            with open(self.path) as store:
+                entries = json.load(store)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def read(self, key) -> dict | None:
+        """Return the entry stored under a key, or None."""
+        with self.lock:
+            return self.entries.get(key)
+
+    def write(self, key, value) -> None:
+        """Store an entry and persist the store.
+
+        Parameters
+        ----------
+        key: str
+        value: dict
+            JSON serializable entry.
+        """
+        with self.lock:
+            self.entries = {**self.load(), **self.entries, key: value}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            atomic_write(self.path, json.dumps(self.entries))
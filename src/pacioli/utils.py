@@ -1,10 +1,20 @@
 import calendar
+import contextlib
 import datetime
-import locale
+import os
 import re
+import stat
+import tempfile
+import threading
 
 import click
 
+from pacioli.formatting import Formatter
+
+# The process umask, read when a file is first written
+_umask: int | None = None
+_umask_lock = threading.Lock()
+
 
 def _parse_month_name(month_name: str) -> int:
     """Parse a month name (full or abbreviated) to month number.
@@ -163,6 +173,35 @@ def period_to_dates(period_str: str) -> list[str]:
     )
 
 
+def common_periods() -> list[str]:
+    """Return the periods most often requested, as period descriptions.
+
+    The periods are this month, last month, year to date and the last
+    closed quarter, all in formats understood by period_to_dates.
+
+    Returns
+    -------
+    list[str]
+        Period descriptions.
+    """
+    now = datetime.datetime.now()
+    year = now.year
+
+    # Last month of the most recently completed quarter
+    quarter_end = (now.month - 1) // 3 * 3
+    if quarter_end == 0:
+        quarter_end = 12
+        year -= 1
+    quarter_start = quarter_end - 2
+
+    return [
+        "this month",
+        "last month",
+        f"Jan to {calendar.month_abbr[now.month]}",
+        f"{calendar.month_abbr[quarter_start]} {year} to {calendar.month_abbr[quarter_end]} {year}",
+    ]
+
+
 def month_to_dates(month_str: str) -> list[str]:
     """Convert month to a start and end dates in YYYY/MM/DD format.
 
@@ -225,7 +264,7 @@ def format_negative_numbers(number) -> str:
         Number as a string, if negative enclosed in parentheses.
     """
     if number < 0:
-        return "(" + format_balance(abs(number)) + ")"
+        return Formatter.from_locale().format_number(number)
 
     return number
 
@@ -233,34 +272,145 @@ def format_negative_numbers(number) -> str:
 def format_balance(int_balance):
     """Format balance.
 
-    Formats balance using the locale seperators for numbers.  Removes
-    negative signs and instead encloses negative balances in parentheses.
+    Formats balance using the environment locale's separators for numbers.
+    Removes negative signs and instead encloses negative balances in
+    parentheses.  Reports use their own Formatter, see pacioli.formatting.
 
     Parameters
     ----------
-    int_balance: (dict, int)
+    int_balance: (dict, list, int)
+        Dicts and lists of dicts, such as account trees, are formatted
+        recursively.
 
+    Returns
+    -------
+    (dict, list, str)
+       A copy of the balance formatted with locale separators.
+    """
+    return Formatter.from_locale().format(int_balance)
+
+
+LATEX_SPECIAL = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+LATEX_SPECIAL_PATTERN = re.compile("|".join(re.escape(character) for character in LATEX_SPECIAL))
+
+
+def escape_latex(text) -> str:
+    r"""Return text with LaTeX special characters escaped.
+
+    Parameters
+    ----------
+    text: str
+        e.g. a payee like 'Smith & Sons'.
 
     Returns
     -------
-    (dict, int)
-       Balance formatted with locale seperator.
+    str
+        e.g. 'Smith \& Sons'.
+    """
+    return LATEX_SPECIAL_PATTERN.sub(lambda match: LATEX_SPECIAL[match.group(0)], text)
+
+
+def slugify(text) -> str:
+    """Return text in lower case with runs of other characters replaced by '_'.
+
+    Parameters
+    ----------
+    text: str
+        e.g. a period description like 'Jan to Mar'.
+
+    Returns
+    -------
+    str
+        e.g. 'jan_to_mar', usable in file names.
+    """
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def file_mode(path) -> int:
+    """Return the permissions of a file that replaces path.
+
+    Parameters
+    ----------
+    path: str
+        File path, which may not exist yet.
+
+    Returns
+    -------
+    int
+        The permission bits of the existing file, or those open() gives a
+        new file.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        pass
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            # The umask can only be read by setting it; a restrictive one
+            # meanwhile never makes another thread's new files more open.
+            _umask = os.umask(0o077)
+            os.umask(_umask)
+    return 0o666 & ~_umask
+
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """Open a file for writing so readers never see a partial file.
+
+    The text is written to a temporary file in the same directory which
+    replaces path when the block exits without an error.
+
+    Parameters
+    ----------
+    path: str
+        Destination file path.
+
+    Yields
+    ------
+    file
+        Text file to write to.  Paths that aren't regular files, such as
+        pipes, are written to directly.
+    """
+    if os.path.exists(path) and not os.path.isfile(path):
+        with open(path, "w") as target:
+            yield target
+        return
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pacioli-", suffix=".tmp")
+    try:
+        os.chmod(tmp_path, file_mode(path))
+        with os.fdopen(fd, "w") as tmp:
+            yield tmp
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def atomic_write(path, text) -> None:
+    """Write text to a file so readers never see a partial file.
+
+    Parameters
+    ----------
+    path: str
+        Destination file path.
+    text: str
+        File contents.
     """
-    locale.setlocale(locale.LC_ALL, "")
-
-    if isinstance(int_balance, int):
-        balance = format_negative_numbers(int_balance)
-        return f"{balance:n}"
-
-    if isinstance(int_balance, dict):
-        for account, balance in int_balance.items():
-            if isinstance(balance, dict):
-                format_balance(balance)
-            elif isinstance(balance, int):
-                balance = format_negative_numbers(balance)
-                if isinstance(balance, str):
-                    int_balance[account] = balance
-                else:
-                    int_balance[account] = f"{balance:n}"
-
-    return int_balance
+    with atomic_open(path) as tmp:
+        tmp.write(text)
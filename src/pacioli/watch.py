@@ -0,0 +1,181 @@
+"""Regenerate reports whenever their inputs change.
+
+Classes
+-------
+Watcher
+"""
+
+import hashlib
+import logging
+import os
+import time
+
+import jinja2
+
+from pacioli.outputs import templates_digest
+from pacioli.pacioli import LedgerError
+from pacioli.utils import atomic_write, slugify
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Polls the journal and templates and rewrites stale reports.
+
+    Every report is generated for every period.  A report is only re-run when
+    something it depends on changes: the journal files, its template and the
+    templates it includes or extends, or the dates its period resolves to (e.g. 'this month' rolling over).  A report
+    that fails is logged and retried once its inputs change, without
+    stopping the others.
+
+    Methods
+    -------
+    template_fingerprint(report)
+        Returns a fingerprint of the templates a report is rendered from.
+    poll()
+        Regenerate stale reports once.
+    run()
+        Poll until interrupted.
+    """
+
+    def __init__(self, backend, output_dir, reports, periods, interval=2) -> None:
+        """Set the reports to keep current.
+
+        Parameters
+        ----------
+        backend: ReportBackend
+            Warm backend used to render reports.
+        output_dir: str
+            Directory the tex files are written to.
+        reports: list
+            Report names, e.g. 'balance-sheet'.
+        periods: list
+            Period descriptions understood by period_to_dates.
+        interval: float
+            Seconds between polls.
+        """
+        self.backend = backend
+        self.output_dir = output_dir
+        for report in reports:
+            backend.get_report(report)
+        self.reports = reports
+        self.periods = periods
+        self.interval = interval
+        self.state: dict[str, tuple] = {}
+
+    def output_path(self, report, period) -> str:
+        """Return the file a report for a period is written to.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+        period: str
+            Period description.
+
+        Returns
+        -------
+        str
+            e.g. OUTPUT_DIR/income-statement_last_month.tex
+        """
+        return os.path.join(self.output_dir, f"{report}_{slugify(period)}.tex")
+
+    def template_fingerprint(self, report) -> str:
+        """Return a fingerprint of the templates a report is rendered from.
+
+        The sources of the report's template and the templates it includes,
+        imports or extends are digested.  When those can't be known, e.g. a
+        template is missing or included by a variable name, the modification
+        times of every file in the template directory are used instead.
+
+        Parameters
+        ----------
+        report: str
+            Report name.
+
+        Returns
+        -------
+        str
+            Hex digest that changes when the templates change.
+        """
+        report_object = self.backend.get_report(report)
+        try:
+            sources = report_object.get_template_sources(report_object.template)
+        except (jinja2.TemplateError, FileNotFoundError):
+            sources = None
+        if sources is not None:
+            return templates_digest(sources)
+
+        digest = hashlib.sha1()
+        template_dir = os.path.abspath(self.backend.config.template_dir)
+        for directory, _, files in sorted(os.walk(template_dir)):
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                digest.update(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode())
+        return digest.hexdigest()
+
+    def poll(self) -> list[str]:
+        """Regenerate every report whose inputs changed since the last poll.
+
+        Returns
+        -------
+        list[str]
+            Paths of the files that were written.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        fingerprint = self.backend.journal.fingerprint()
+        written = []
+
+        for report in self.reports:
+            templates = self.template_fingerprint(report)
+
+            for period in self.periods:
+                start_date, end_date = self.backend.period_dates(period)
+                if report == "balance-sheet":
+                    start_date = ""
+                path = self.output_path(report, period)
+                inputs = (start_date, end_date, fingerprint, templates)
+                previous = self.state.get(path)
+                if (
+                    previous
+                    and previous[0] == inputs
+                    and (previous[1] is None or os.path.exists(path))
+                ):
+                    continue
+
+                logger.debug(f"Regenerating {path}")
+                try:
+                    text = self.backend.render(report, start_date, end_date)
+                except (LedgerError, jinja2.TemplateError, FileNotFoundError) as error:
+                    logger.error(f"Could not regenerate {path}: {error}")
+                    # The failed output is kept; a digest of None marks it so
+                    # it's tried again when its inputs change.
+                    self.state[path] = (inputs, None)
+                    continue
+                digest = hashlib.sha1(text.encode()).hexdigest()
+                # Unchanged output is not rewritten so downstream PDF builds
+                # keyed on mtime are not triggered.
+                if not (previous and previous[1] == digest and os.path.exists(path)):
+                    atomic_write(path, text)
+                    written.append(path)
+                self.state[path] = (inputs, digest)
+
+        return written
+
+    def run(self, callback=None) -> None:
+        """Poll for changes until interrupted.
+
+        Parameters
+        ----------
+        callback: callable
+            Called with the list of written paths after each poll.
+        """
+        while True:
+            written = self.poll()
+            if callback and written:
+                callback(written)
+            time.sleep(self.interval)
@@ -0,0 +1,140 @@
+"""Tests for the account index."""
+
+import pytest
+from click.testing import CliRunner
+
+from pacioli.accounts import AccountIndex, compile_pattern, is_pattern
+from pacioli.balance_sheet import BalanceSheet
+from pacioli.cli import cli
+from pacioli.completion import read_cache
+from pacioli.journal import Journal
+from pacioli.pacioli import Pacioli
+
+ACCOUNTS = """Assets:Current:Checking
+Assets:Current:Savings
+Expenses:Food:Dining
+Expenses:Travel:Air
+Expenses:Travel:Hotel:Deposits
+Liabilities:Visa
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_index_cache(monkeypatch, tmp_path):
+    """Start every test without loaded indexes or a completion cache."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+
+def test_index_includes_parent_accounts_and_names():
+    """It indexes parents, short names, display names and children."""
+    index = AccountIndex(ACCOUNTS.splitlines())
+
+    assert "Assets:Current" in index
+    assert "Assets" in index
+    assert index.short_name("Expenses:Food:Dining") == "dining"
+    assert index.display_name("Assets:Current:Checking") == "Checking"
+    assert index.parent("Assets:Current:Savings") == "Assets:Current"
+    assert index.parent("Assets") is None
+    assert index.children("Assets:Current") == ["Assets:Current:Checking", "Assets:Current:Savings"]
+
+
+def test_validate_reports_unknown_accounts_with_matches():
+    """It returns unknown accounts per category with close matches."""
+    index = AccountIndex(ACCOUNTS.splitlines())
+    unknown = index.validate(
+        {"Current Assets": ["Assets:Current:Checkng", "Assets:Current:Savings"], "Other": []}
+    )
+    assert list(unknown) == ["Current Assets"]
+    assert list(unknown["Current Assets"]) == ["Assets:Current:Checkng"]
+    assert unknown["Current Assets"]["Assets:Current:Checkng"][0] == "Assets:Current:Checking"
+
+
+def test_load_reuses_index_until_journal_changes(tmp_path):
+    """It runs ledger accounts once per journal version."""
+    journal_file = tmp_path / "main.ldg"
+    journal_file.write_text("2020/01/01 * Opening\n")
+    journal = Journal(str(journal_file))
+    commands = []
+
+    def mock_run_system_command(command):
+        commands.append(command)
+        return ACCOUNTS
+
+    first = AccountIndex.load(journal, mock_run_system_command)
+    assert AccountIndex.load(journal, mock_run_system_command) is first
+
+    journal_file.write_text("2020/01/01 * Opening\n2020/01/02 * Coffee\n")
+    assert AccountIndex.load(journal, mock_run_system_command) is not first
+    assert len(commands) == 2
+    assert commands[0][-1] == "accounts"
+
+
+def test_unknown_accounts_are_not_queried(monkeypatch, caplog):
+    """It skips the ledger query for accounts missing from the journal."""
+    report = BalanceSheet(config_file="tests/resources/sample_config.yml")
+    report.config.price_index = False
+    commands = []
+
+    def mock_run_system_command(command):
+        commands.append(command)
+        if command[-1] == "accounts":
+            return "Assets:Current:Checking\n"
+        return "$100.00  Assets:Current:Checking\n"
+
+    monkeypatch.setattr(report, "run_system_command", mock_run_system_command)
+    result = report.process_accounts(
+        ["Assets:Current:Checking", "Assets:Current:Chequing"], "current_assets", date="2020/3/31"
+    )
+
+    assert result == {
+        "checking": 100,
+        "chequing": 0,
+        "current_assets_accounts": {"Checking": 100, "Chequing": 0},
+        "current_assets_total": 100,
+    }
+    assert len(commands) == 2
+    # The config's mappings are checked when the index is loaded.
+    assert "Account 'Assets:Current:Savings' in Current Assets" in caplog.text
+    assert read_cache("accounts") == ["Assets", "Assets:Current", "Assets:Current:Checking"]
+
+
+def test_check_command_lists_unknown_accounts(monkeypatch):
+    """It lists unknown config accounts and exits with status 1."""
+    monkeypatch.setattr(Pacioli, "run_system_command", lambda self, command: ACCOUNTS)
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--config", "tests/resources/sample_config.yml", "check"])
+
+    assert result.exit_code == 1
+    assert "Longterm Assets: unknown account 'Assets:Noncurrent:Escrow'" in result.output
+    assert "unknown account 'Assets:Current:Checking'" not in result.output
+
+
+def test_glob_star_matches_one_account_segment():
+    """It matches '*' within a segment and '**' across segments."""
+    assert is_pattern("Expenses:Travel:*")
+    assert not is_pattern("Expenses:Travel")
+    assert compile_pattern("Expenses:Travel:*").fullmatch("Expenses:Travel:Air")
+    assert not compile_pattern("Expenses:Travel:*").fullmatch("Expenses:Travel:Hotel:Deposits")
+    assert compile_pattern("Expenses:**").fullmatch("Expenses:Travel:Hotel:Deposits")
+    assert compile_pattern("re:Expenses:(Food|Travel)").fullmatch("Expenses:Travel")
+
+
+def test_expand_replaces_patterns_without_double_counting():
+    """It expands patterns in order and skips accounts below selected ones."""
+    index = AccountIndex(ACCOUNTS.splitlines())
+
+    assert index.expand(["Assets:Current:Savings", "Assets:Current:*"]) == [
+        "Assets:Current:Savings",
+        "Assets:Current:Checking",
+    ]
+    assert index.expand(["Expenses:**"]) == ["Expenses:Food", "Expenses:Travel"]
+    assert index.expand(["re:.*:(Air|Dining)"]) == ["Expenses:Food:Dining", "Expenses:Travel:Air"]
+
+
+def test_validate_reports_patterns_without_matches():
+    """It reports patterns that match no accounts."""
+    index = AccountIndex(ACCOUNTS.splitlines())
+    assert index.validate({"Cash Accounts": ["Assets:Cash:*", "Assets:Current:*"]}) == {
+        "Cash Accounts": {"Assets:Cash:*": []}
+    }
@@ -0,0 +1,258 @@
+"""Tests for the report backend."""
+
+import json
+import os
+
+import jinja2
+import pytest
+from click.testing import CliRunner
+
+from pacioli import cli as cli_module
+from pacioli.accounts import AccountIndex
+from pacioli.backend import REPORTS, ReportBackend
+from pacioli.cli import cli
+from pacioli.outputs import OutputCache
+from pacioli.pacioli import Pacioli
+from pacioli.planner import Balance
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Return a backend that renders without ledger and counts renders."""
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    backend.renders = []
+
+    def mock_render(report, start_date, end_date):
+        backend.renders.append((report, start_date, end_date))
+        return f"{report} {start_date} {end_date}"
+
+    monkeypatch.setattr(backend, "render", mock_render)
+    monkeypatch.setattr(
+        backend, "report_data", lambda report, start, end: {"title": "Acme LLC", "total": 5}
+    )
+    return backend
+
+
+def test_get_report_rejects_unknown_report(backend):
+    """It raises ValueError for unknown report names."""
+    with pytest.raises(ValueError):
+        backend.get_report("trial-balance")
+
+
+def test_get_response_caches_until_journal_changes(backend, monkeypatch):
+    """It renders once per journal fingerprint."""
+    first = backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    second = backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    assert first == second
+    assert len(backend.renders) == 1
+
+    monkeypatch.setattr(backend.journal, "fingerprint", lambda: "changed")
+    backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    assert len(backend.renders) == 2
+    assert len(backend.cache) == 1
+
+
+def test_get_response_caches_until_prices_or_templates_change(backend, monkeypatch):
+    """It renders again when the data version or the report's templates change."""
+    backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    backend.get_response("income-statement", "2020/1/1", "2020/2/1", "json")
+
+    monkeypatch.setattr(backend, "data_version", lambda: "new prices")
+    backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    assert len(backend.renders) == 2
+
+    report_object = backend.get_report("income-statement")
+    monkeypatch.setattr(
+        report_object, "get_template_sources", lambda template: {template: "edited"}
+    )
+    backend.get_response("income-statement", "2020/1/1", "2020/2/1")
+    assert len(backend.renders) == 3
+    assert len(backend.cache) == 1
+
+
+def test_get_response_ignores_start_date_for_balance_sheet(backend):
+    """Balance sheets for the same date share a cache entry."""
+    backend.get_response("balance-sheet", "2020/1/1", "2020/2/1")
+    backend.get_response("balance-sheet", "2019/1/1", "2020/2/1")
+    assert backend.renders == [("balance-sheet", "", "2020/2/1")]
+
+
+def test_get_response_returns_json(backend):
+    """It returns the unformatted values as JSON."""
+    etag, body = backend.get_response("cash-flow-statement", "2020/1/1", "2020/2/1", "json")
+    assert json.loads(body) == {"title": "Acme LLC", "total": 5}
+    assert etag
+
+
+def test_warm_renders_common_periods_once_per_journal_version(backend, monkeypatch):
+    """It precomputes reports only when the journal changed."""
+    count = backend.warm()
+    assert count == len(backend.warm_targets())
+    assert ("balance-sheet", "", "") in backend.renders
+    assert backend.warm() == 0
+
+    monkeypatch.setattr(backend.journal, "fingerprint", lambda: "changed")
+    assert backend.warm() == count
+
+
+def test_warm_makes_next_request_a_cache_hit(backend):
+    """A request for a warmed period does not render again."""
+    backend.warm()
+    renders = len(backend.renders)
+    start_date, end_date = backend.period_dates("last month")
+    backend.get_response("income-statement", start_date, end_date)
+    assert len(backend.renders) == renders
+
+
+def test_warm_command_needs_a_daemon_or_the_output_cache(backend, tmp_path):
+    """It refuses to warm a throwaway backend and warms the output cache instead."""
+    runner = CliRunner()
+    result = runner.invoke(cli, ["warm"], obj={"backend": backend})
+    assert result.exit_code == 1
+    assert "No daemon is running" in result.output
+    assert backend.renders == []
+
+    backend.outputs = OutputCache(str(tmp_path))
+    result = runner.invoke(cli, ["warm"], obj={"backend": backend})
+    assert result.exit_code == 0
+    assert f"Warmed {len(backend.warm_targets())} reports" in result.output
+
+
+ACCOUNTS = """Assets:Current:Checking
+Assets:Current:Savings
+Assets:Noncurrent:Escrow
+Expenses:Food:Grocery
+Income:Salary
+Liabilities:Visa
+"""
+
+BALANCES = {
+    "2020/1/1": "Assets:Current:Checking|1000\nAssets:Current:Savings|5000\n",
+    "2020/4/1": (
+        "Assets:Current:Checking|1700\nAssets:Current:Savings|5000\n"
+        "Assets:Noncurrent:Escrow|300\nLiabilities:Visa|-200\n"
+    ),
+}
+
+
+@pytest.fixture
+def ledger_backend(monkeypatch, tmp_path):
+    """Return a backend without market values whose ledger calls are recorded."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    commands = []
+
+    def mock_run_system_command(self, command):
+        commands.append(command)
+        if command[-1] == "accounts":
+            return ACCOUNTS
+        if "--related" in command:
+            return "Income:Salary|-900\nExpenses:Food:Grocery|200\n"
+        if "-b" in command:
+            return "Income:Salary|-900\nExpenses:Food:Grocery|200\n"
+        return BALANCES[command[command.index("-e") + 1]]
+
+    monkeypatch.setattr(Pacioli, "run_system_command", mock_run_system_command)
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    for report in REPORTS:
+        backend.get_report(report).market = None
+    backend.commands = commands
+    return backend
+
+
+def test_all_report_data_shares_one_query_plan(ledger_backend):
+    """It answers every statement with one query per date, period and flow."""
+    data, problems = ledger_backend.all_report_data("2020/1/1", "2020/4/1")
+
+    queries = [command for command in ledger_backend.commands if command[-1] != "accounts"]
+    assert len(queries) == 4
+    assert data["balance-sheet"]["current_assets_total"] == 6700
+    assert data["income-statement"]["net_income"] == 700
+    assert data["cash-flow-statement"]["ending_cash"] == 6700
+    assert problems == []
+
+
+def test_render_all_renders_variants_from_one_query_plan(ledger_backend, tmp_path):
+    """It renders each variant template from the data of the same queries."""
+    (tmp_path / "summary.md").write_text("Net income: \\VAR{net_income}\n")
+    ledger_backend.config.variants = {"income-statement": {"summary": "summary.md"}}
+    environment = ledger_backend.balance_sheet.latex_jinja_env
+    environment.loader = jinja2.FileSystemLoader([*environment.loader.searchpath, str(tmp_path)])
+
+    rendered, problems = ledger_backend.render_all("2020/1/1", "2020/4/1")
+
+    queries = [command for command in ledger_backend.commands if command[-1] != "accounts"]
+    assert len(queries) == 4
+    assert sorted(rendered) == sorted([(report, "") for report in REPORTS]) + [
+        ("income-statement", "summary")
+    ]
+    assert rendered[("income-statement", "summary")] == "Net income: 700"
+    assert problems == []
+
+    result = CliRunner().invoke(
+        cli,
+        ["all", str(tmp_path / "out"), "-b", "2020/1/1", "-e", "2020/4/1"],
+        obj={"backend": ledger_backend},
+    )
+    assert result.exit_code == 0
+    summary = tmp_path / "out" / "income-statement-summary_2020_1_1_to_2020_4_1.md"
+    assert summary.read_text() == "Net income: 700"
+
+    ledger_backend.config.variants = {"trial-balance": {"summary": "summary.md"}}
+    with pytest.raises(ValueError):
+        ledger_backend.render_all("2020/1/1", "2020/4/1")
+
+
+def test_check_consistency_reports_cash_mismatch(ledger_backend):
+    """It reports ending cash that does not reconcile with the net change."""
+    data = {"cash-flow-statement": {"beginning_cash": 0, "net_change_in_cash": 5, "ending_cash": 0}}
+    results = {
+        Balance("Assets:Current:Checking", "2020/4/1"): 1,
+        Balance("Assets:Current:Savings", "2020/4/1"): 0,
+    }
+    problems = ledger_backend.check_consistency(data, results, "2020/4/1")
+
+    assert len(problems) == 2
+    assert "does not match the cash accounts on the balance sheet (1)" in problems[0]
+    assert "net change in cash (5)" in problems[1]
+
+
+def test_all_command_writes_every_statement(ledger_backend, monkeypatch, tmp_path):
+    """It writes the three statements for the period."""
+    monkeypatch.setattr(
+        ReportBackend,
+        "render_all",
+        lambda self, start, end: (
+            {(report, ""): f"{report} {start} {end}" for report in REPORTS},
+            ["Cash account Assets:Cash is not on the balance sheet"],
+        ),
+    )
+    written = []
+    atomic_open = cli_module.atomic_open
+
+    def recording_atomic_open(path):
+        written.append(path)
+        return atomic_open(path)
+
+    monkeypatch.setattr(cli_module, "atomic_open", recording_atomic_open)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "--config",
+            "tests/resources/sample_config.yml",
+            "all",
+            str(tmp_path),
+            "--period",
+            "Jan 2020 to Mar 2020",
+            "--strict",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "Warning: Cash account Assets:Cash" in result.output
+    assert (tmp_path / "balance-sheet_jan_2020_to_mar_2020.tex").read_text() == (
+        "balance-sheet 2020/1/1 2020/4/1"
+    )
+    # Files are only replaced once complete
+    assert sorted(os.path.basename(path) for path in written) == sorted(os.listdir(tmp_path))
@@ -2,6 +2,9 @@
 
 import locale
 
+import jinja2
+
+from pacioli.accounts import AccountIndex
 from pacioli.balance_sheet import BalanceSheet
 
 
@@ -132,3 +135,29 @@ def test_balance_sheet_without_market_conversion_shows_incorrect_totals():
     # The total should NOT be the correct market value
     correct_total = f"{int(11225):n}"
     assert correct_total not in result
+
+
+def test_only_balances_the_template_shows_are_queried(monkeypatch, tmp_path):
+    """It queries only the accounts and categories a template uses."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    report = BalanceSheet(config_file="tests/resources/sample_config.yml")
+    report.market = None
+    commands = []
+
+    def mock_run_system_command(command):
+        commands.append(command)
+        if command[-1] == "accounts":
+            return "Assets:Current:Checking\nAssets:Current:Savings\nLiabilities:Visa\n"
+        return "Assets:Current:Checking|100\nLiabilities:Visa|-40\n"
+
+    monkeypatch.setattr(report, "run_system_command", mock_run_system_command)
+    (tmp_path / "board.tex").write_text("\\VAR{checking} \\VAR{unsecured_liabilities_total}")
+    report.latex_jinja_env.loader = jinja2.FileSystemLoader(str(tmp_path))
+    report.template = "board.tex"
+
+    assert report.print_report(date="2020/3/31") == "100 40"
+    (query,) = [command for command in commands if command[-1] != "accounts"]
+    assert "Assets:Current:Checking" in query
+    assert "Assets:Current:Savings" not in query
+    assert "Liabilities:Visa" in query
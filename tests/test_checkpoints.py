@@ -0,0 +1,109 @@
+"""Tests for closed-period balance checkpoints."""
+
+import datetime
+
+import pytest
+
+from pacioli.checkpoints import CheckpointStore
+from pacioli.pacioli import Pacioli
+
+
+@pytest.fixture
+def pacioli(tmp_path, monkeypatch):
+    """Return a Pacioli with closed periods whose ledger calls are recorded."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    pacioli = Pacioli(config_file="tests/resources/sample_config_closed.yml")
+    pacioli.commands = []
+    pacioli.closing = (
+        "Assets:Current:Checking|4000\nAssets:Current|0\nAssets:Current:Savings|10000\n"
+    )
+
+    def mock_run_system_command(command):
+        pacioli.commands.append(command)
+        if "--format" in command:
+            return pacioli.closing
+        return "$138.00  Assets:Current:Checking\n"
+
+    monkeypatch.setattr(pacioli, "run_system_command", mock_run_system_command)
+    return pacioli
+
+
+def test_boundary_is_start_of_month_capped_at_latest_closed_month(tmp_path):
+    """It returns the first of the month, but never an open month."""
+    store = CheckpointStore(str(tmp_path / "store.json"), close_after_days=60)
+    today = datetime.date(2024, 6, 15)
+    assert store.boundary("2020/3/31", today=today) == "2020/3/1"
+    assert store.boundary("2024-06-10", today=today) == "2024/4/1"
+    assert store.boundary("", today=today) == "2024/4/1"
+    assert store.boundary("last month", today=today) is None
+
+
+def test_checkpoints_are_disabled_with_market_values():
+    """Market values depend on report date prices, so no checkpoints are used."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    assert pacioli.checkpoints is None
+
+
+def test_get_balance_adds_postings_after_checkpoint(pacioli):
+    """The balance is the checkpoint plus the transactions after it."""
+    assert pacioli.get_balance("Assets:Current:Checking", date="2020/3/31") == 4138
+
+    closing_query, balance_query = pacioli.commands
+    assert closing_query[closing_query.index("--end") + 1] == "2020/3/1"
+    assert balance_query[balance_query.index("--begin") + 1] == "2020/3/1"
+
+
+def test_checkpoint_selects_accounts_like_ledger(pacioli):
+    """It adds every account ledger's regex matches, not only sub-accounts."""
+    pacioli.closing = (
+        "Assets:Current:Checking|4000\nAssets:Current:Checking Joint|500\n"
+        "Liabilities:Credit Card:Checking Overdraft|-100\nAssets:Current:Savings|10000\n"
+    )
+    assert pacioli.get_balance("Assets:Current:Checking", date="2020/3/31") == 4638
+    assert pacioli.get_balance("checking", date="2020/3/31") == 4538
+    assert pacioli.get_balance("^Assets:Current:Checking$", date="2020/3/31") == 4138
+
+
+def test_checkpoint_is_reused_until_closed_period_changes(pacioli, monkeypatch):
+    """The closing balances are queried once per version of the closed period."""
+    pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+    pacioli.get_balance("Assets:Current", date="2020/3/31")
+    assert sum("--format" in command for command in pacioli.commands) == 1
+    assert pacioli.get_balance("Assets:Current", date="2020/3/31") == 14138
+
+    # New transactions in open periods don't touch the closed period
+    monkeypatch.setattr(pacioli.journal, "fingerprint", lambda: "changed")
+    pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+    assert sum("--format" in command for command in pacioli.commands) == 1
+
+    periods = []
+
+    def period_fingerprint(start_date, end_date, summary=None):
+        periods.append((start_date, end_date))
+        return "changed"
+
+    monkeypatch.setattr(pacioli.journal, "period_fingerprint", period_fingerprint)
+    pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+    assert sum("--format" in command for command in pacioli.commands) == 2
+    assert periods[0] == (datetime.date.min, datetime.date(2020, 3, 1))
+
+
+def test_posting_into_closed_period_rebuilds_checkpoint(pacioli, monkeypatch, caplog):
+    """Changed closing balances replace the checkpoint and log a warning."""
+    pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+
+    monkeypatch.setattr(pacioli.journal, "period_fingerprint", lambda *args: "changed")
+    pacioli.closing = "Assets:Current:Checking|3900\n"
+    assert pacioli.get_balance("Assets:Current:Checking", date="2020/3/31") == 4038
+    assert "posted before the closed date 2020/3/1" in caplog.text
+
+
+def test_checkpoints_persist_between_runs(pacioli, monkeypatch):
+    """A new process reuses the stored checkpoint."""
+    pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+    fingerprint = pacioli.journal.period_fingerprint(datetime.date.min, datetime.date(2020, 3, 1))
+
+    again = Pacioli(config_file="tests/resources/sample_config_closed.yml")
+    stored = again.checkpoints.get("2020/3/1")
+    assert stored["fingerprint"] == fingerprint
+    assert stored["balances"]["Assets:Current:Checking"] == 4000
@@ -6,7 +6,10 @@ import os
 from click.testing import CliRunner
 
 from pacioli import __version__
+from pacioli.backend import ReportBackend
 from pacioli.cli import cli
+from pacioli.pacioli import LedgerError
+from pacioli.results import Line, Section, Statement
 
 
 def test_entrypoint():
@@ -248,3 +251,64 @@ def test_income_statement_period_invalid_format():
 
     assert result.exit_code != 0
     assert "Invalid period format" in result.output
+
+
+def test_report_is_streamed_to_out_file(monkeypatch, tmp_path):
+    """It writes the report to OUT_FILE and keeps the old file if ledger fails."""
+    monkeypatch.setattr(
+        ReportBackend,
+        "report_data",
+        lambda self, report, start, end, variables=None: {"title": "Streamed LLC"},
+    )
+    out_file = tmp_path / "balance.tex"
+    runner = CliRunner()
+    args = ["-c", "tests/resources/sample_config.yml", "balance-sheet", str(out_file)]
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    assert "Streamed LLC" in out_file.read_text()
+
+    def failing_report_data(self, report, start, end):
+        raise LedgerError(["ledger"], 1, "Error: parse error")
+
+    monkeypatch.setattr(ReportBackend, "report_data", failing_report_data)
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 1
+    assert "Streamed LLC" in out_file.read_text()
+    assert os.listdir(tmp_path) == ["balance.tex"]
+
+
+def test_statement_formats_skip_rendering(monkeypatch, tmp_path):
+    """It writes json and csv from the statement without a template environment."""
+    statement = Statement(
+        "cash-flow-statement",
+        "Acme LLC",
+        "2020/1/1",
+        "2020/2/1",
+        (Section("operating", (Line("Salary", "Income:Salary", 1234567),), 1234567),),
+        (("net_change", 1234567),),
+    )
+    built = []
+
+    def build_report(self, report, start, end):
+        built.append(self)
+        return statement
+
+    monkeypatch.setattr(ReportBackend, "build_report", build_report)
+    runner = CliRunner()
+    args = ["-c", "tests/resources/sample_config.yml", "cash-flow-statement", "-p", "January 2020"]
+
+    result = runner.invoke(cli, [*args, "--format", "json"])
+    assert result.exit_code == 0
+    assert Statement.from_json(result.output) == statement
+    assert built[0].balance_sheet._latex_jinja_env is None
+    assert built[0].cash_flow_statement._formatter is None
+
+    out_file = tmp_path / "cash.csv"
+    result = runner.invoke(cli, [*args, "--format", "csv", str(out_file)])
+    assert result.exit_code == 0
+    assert out_file.read_text() == statement.to_csv()
+    assert "1234567" in out_file.read_text()
+
+    result = runner.invoke(cli, [*args, "--format", "csv", "--pdf", str(out_file)])
+    assert result.exit_code == 2
@@ -1,8 +1,26 @@
 """Tests for shell completions."""
 
+import datetime
 import os
+import shutil
+import subprocess
 from pathlib import Path
 
+import click
+from click.testing import CliRunner
+
+from pacioli.completion import (
+    bash_script,
+    cache_dir,
+    complete_account,
+    complete_period,
+    period_suggestions,
+    periods_cache_name,
+    read_cache,
+    write_cache,
+    zsh_script,
+)
+
 
 def test_bash_completion_file_exists():
     """Bash completion file exists."""
@@ -49,3 +67,116 @@ def test_zsh_completion_syntax():
     if os.system("which zsh > /dev/null 2>&1") == 0:
         exit_code = os.system(f"zsh -n {completion_file}")
         assert exit_code == 0, "Zsh completion file should have valid zsh syntax"
+
+
+def test_completion_scripts_list_every_command_and_option():
+    """Completion scripts offer every command and option of the CLI."""
+    from pacioli.cli import cli
+
+    for completion_file in (
+        "completions/pacioli-complete.bash",
+        "completions/pacioli-complete.zsh",
+    ):
+        content = Path(completion_file).read_text()
+        for param in cli.params:
+            for option in param.opts:
+                assert option in content, f"{completion_file} is missing {option}"
+        for name, command in cli.commands.items():
+            assert name in content
+            for param in command.params:
+                for option in param.opts:
+                    if option.startswith("-"):
+                        assert option in content, f"{completion_file} is missing {name} {option}"
+
+
+def test_bash_completion_reads_periods_from_cache(tmp_path):
+    """Bash completes periods from the cache without running pacioli."""
+    completion = tmp_path / "pacioli" / "completion"
+    completion.mkdir(parents=True)
+    (completion / periods_cache_name()).write_text("this month\nlast month\n")
+    script = (
+        "source completions/pacioli-complete.bash; "
+        "COMP_WORDS=(pacioli income-statement --period la); COMP_CWORD=3; "
+        '_pacioli_completion; printf "%s\\n" "${COMPREPLY[@]}"'
+    )
+    result = subprocess.run(
+        [shutil.which("bash"), "-c", script],
+        capture_output=True,
+        text=True,
+        # Without PATH neither pacioli nor ledger can be started.
+        env={**os.environ, "XDG_CACHE_HOME": str(tmp_path), "PATH": ""},
+    )
+    assert result.stdout == "last\\ month\n"
+
+
+def test_write_cache_stores_accounts_and_periods(tmp_path):
+    """It writes one value per line and skips unchanged files."""
+    write_cache(["Expenses:Food", "Assets:Checking"], directory=str(tmp_path))
+    assert read_cache("accounts", directory=str(tmp_path)) == ["Assets:Checking", "Expenses:Food"]
+    periods = read_cache(periods_cache_name(), directory=str(tmp_path))
+    assert periods[:2] == ["this month", "last month"]
+
+    mtime = (tmp_path / "accounts").stat().st_mtime_ns
+    write_cache(["Assets:Checking", "Expenses:Food"], directory=str(tmp_path))
+    assert (tmp_path / "accounts").stat().st_mtime_ns == mtime
+
+
+def test_period_suggestions_include_last_twelve_months():
+    """It suggests common periods and the last twelve months."""
+    periods = period_suggestions(today=datetime.date(2024, 2, 10))
+    assert "February 2024" in periods
+    assert "March 2023" in periods
+    assert "February 2023" not in periods
+
+
+def test_complete_period_uses_cache(tmp_path, monkeypatch):
+    """It completes --period values from the cache."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    write_cache([], directory=cache_dir())
+    items = complete_period(None, None, "LAST")
+    assert [item.value for item in items] == ["last month"]
+
+
+def test_periods_are_cached_per_month(tmp_path, monkeypatch):
+    """It never completes periods cached in an earlier month."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    os.makedirs(cache_dir())
+    stale = os.path.join(cache_dir(), "periods-2000-01")
+    with open(stale, "w") as cached:
+        cached.write("January 2000\n")
+    assert [item.value for item in complete_period(None, None, "Jan")] != ["January 2000"]
+
+    write_cache([], directory=cache_dir())
+    assert sorted(os.listdir(cache_dir())) == ["accounts", periods_cache_name()]
+    assert periods_cache_name(datetime.date(2024, 2, 10)) == "periods-2024-02"
+
+
+def test_completion_scripts_are_generated_from_the_cli():
+    """The shipped scripts are what `pacioli completion` prints for the current CLI."""
+    from pacioli.cli import cli
+
+    for shell in ("bash", "zsh"):
+        result = CliRunner().invoke(cli, ["--config", "missing.yml", "completion", shell])
+        assert result.exit_code == 0
+        shipped = Path(f"completions/pacioli-complete.{shell}").read_text()
+        assert shipped == result.output, f"Regenerate completions/pacioli-complete.{shell}"
+        assert "--account" not in shipped
+
+
+def test_scripts_read_account_options_from_the_cache():
+    """Options completed by complete_account read the accounts cache."""
+
+    @click.group()
+    def group():
+        """Group."""
+
+    @group.command()
+    @click.option("--account", "-a", shell_complete=complete_account)
+    def report(account):
+        """Report."""
+
+    assert '"report --account"|"report -a")\n            _pacioli_accounts "$cur"' in bash_script(
+        group
+    )
+    assert "_pacioli_accounts()" in zsh_script(group)
+    assert "_pacioli_periods" not in bash_script(group)
@@ -0,0 +1,154 @@
+"""Tests for consolidated statements."""
+
+import json
+import threading
+
+from click.testing import CliRunner
+
+from pacioli import cli as cli_module
+from pacioli.backend import ReportBackend
+from pacioli.balance_sheet import LIABILITIES
+from pacioli.cli import cli
+from pacioli.consolidation import Consolidated, eliminate, merge_statements
+from pacioli.results import Line, Section, Statement
+
+
+def income_statement(title, income, expenses):
+    """Return an income statement of (account, amount) lines."""
+    sections = (
+        Section("income", tuple(Line(a.split(":")[-1], a, n) for a, n in income), 0),
+        Section("expenses", tuple(Line(a.split(":")[-1], a, n) for a, n in expenses), 0),
+    )
+    sections = tuple(
+        Section(s.name, s.lines, sum(line.amount for line in s.lines)) for s in sections
+    )
+    net_income = sections[0].total - sections[1].total
+    return Statement(
+        "income-statement", title, "2020/1/1", "2020/4/1", sections, (("net_income", net_income),)
+    )
+
+
+PARENT = income_statement(
+    "Parent LLC",
+    [("Income:Sales", 1000), ("Income:Management Fees", 100)],
+    [("Expenses:Rent", 300)],
+)
+SUBSIDIARY = income_statement(
+    "Subsidiary LLC",
+    [("Income:Sales", 500)],
+    [("Expenses:Rent", 200), ("Expenses:Management Fees", 100)],
+)
+
+
+def test_statements_are_added_by_account():
+    """It adds lines of the same account and sums sections and totals."""
+    combined = merge_statements([PARENT, SUBSIDIARY], "Group")
+
+    assert combined.title == "Group"
+    assert [(line.account, line.amount) for line in combined.section("income").lines] == [
+        ("Income:Sales", 1500),
+        ("Income:Management Fees", 100),
+    ]
+    assert combined.section("expenses").total == 600
+    assert combined.total("net_income") == 1000
+
+
+def test_eliminations_remove_intercompany_lines():
+    """It takes eliminated accounts out of sections and recomputes the totals."""
+    combined = merge_statements([PARENT, SUBSIDIARY], "Group")
+    statement = eliminate(combined, ["Income:Management Fees", "Expenses:Management *"])
+
+    assert statement.section("income").total == 1500
+    assert statement.section("expenses").total == 500
+    assert [line.account for line in statement.section("expenses").lines] == ["Expenses:Rent"]
+    # Both sides were eliminated, so net income is unchanged
+    assert statement.total("net_income") == 1000
+
+
+def test_csv_by_entity_has_a_column_per_entity():
+    """It adds each entity's amount and the eliminated difference to every row."""
+    entities = {"Parent": PARENT, "Subsidiary": SUBSIDIARY}
+    statement = eliminate(
+        merge_statements(list(entities.values()), "Group"), ["Income:Management Fees"]
+    )
+    rows = Consolidated(statement, entities).to_csv(by_entity=True).splitlines()
+
+    assert rows[0].endswith(",amount,Parent,Subsidiary,eliminations")
+    assert rows[1].endswith("income,Income:Sales,Sales,1500,1000,500,0")
+    assert rows[2].endswith("income,,total,1500,1100,500,-100")
+    assert rows[-1].endswith(",,net_income,900,800,200,-100")
+
+
+def test_consolidate_queries_entities_in_parallel(monkeypatch, tmp_path):
+    """It builds each entity's statements at the same time and warns on unmatched eliminations."""
+    journals = {"parent.ldg": PARENT, "subsidiary.ldg": SUBSIDIARY}
+    barrier = threading.Barrier(2, timeout=5)
+
+    def build_all(self, start_date, end_date):
+        # Both entities must be querying at once to get past the barrier
+        barrier.wait()
+        statement = journals[self.config.journal_file.split("/")[-1]]
+        return {
+            "balance-sheet": Statement(
+                "balance-sheet",
+                "",
+                "",
+                end_date,
+                tuple(
+                    Section(name, (), 0)
+                    for name in ("current_assets", "longterm_assets", *LIABILITIES)
+                ),
+                (("total_equity", 0),),
+            ),
+            "income-statement": statement,
+            "cash-flow-statement": Statement(
+                "cash-flow-statement",
+                "",
+                start_date,
+                end_date,
+                (),
+                (("beginning_cash", 0), ("ending_cash", 0), ("net_change_in_cash", 0)),
+            ),
+        }
+
+    monkeypatch.setattr(ReportBackend, "build_all", build_all)
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    backend.config.eliminations = ["Income:Management Fees"]
+    written_paths = []
+    atomic_open = cli_module.atomic_open
+
+    def recording_atomic_open(path):
+        written_paths.append(path)
+        return atomic_open(path)
+
+    monkeypatch.setattr(cli_module, "atomic_open", recording_atomic_open)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "consolidate",
+            str(tmp_path),
+            "-p",
+            "Jan 2020 to Mar 2020",
+            "--entity",
+            str(tmp_path / "parent.ldg"),
+            "--entity",
+            f"Sub={tmp_path / 'subsidiary.ldg'}",
+            "--format",
+            "json",
+            "--by-entity",
+            "--strict",
+        ],
+        obj={"backend": backend},
+    )
+
+    assert result.exit_code == 1
+    assert "Eliminations change net_income on the income-statement by 100" in result.output
+    written = json.loads(
+        (tmp_path / "consolidated-income-statement_jan_2020_to_mar_2020.json").read_text()
+    )
+    assert list(written["entities"]) == ["parent", "Sub"]
+    assert written["consolidated"]["title"] == "Acme LLC"
+    assert written["consolidated"]["totals"] == {"net_income": 900}
+    # Statements are only replaced once complete
+    assert len(written_paths) == 3
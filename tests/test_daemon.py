@@ -0,0 +1,90 @@
+"""Tests for the client/daemon split."""
+
+import io
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from pacioli.backend import ReportBackend
+from pacioli.cli import cli
+from pacioli.daemon import Daemon, forward
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    """Run a daemon whose backend renders without ledger."""
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    monkeypatch.setattr(backend, "render", lambda report, start, end: f"{report} {start} {end}")
+
+    path = str(tmp_path / "pacioli.sock")
+    monkeypatch.setenv("PACIOLI_SOCKET", path)
+    server = Daemon(path=path, backends={"tests/resources/sample_config.yml": backend})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_forward_returns_none_without_daemon(tmp_path):
+    """It falls back to running in-process when nothing is listening."""
+    path = str(tmp_path / "missing.sock")
+    assert forward("config.yml", [], io.StringIO(), io.StringIO(), path=path) is None
+
+
+def test_cli_forwards_report_commands_to_daemon(daemon):
+    """The CLI prints the report rendered by the daemon."""
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        "-c tests/resources/sample_config.yml income-statement --period 'January 2020' -",
+    )
+    assert result.exit_code == 0
+    assert "income-statement 2020/1/1 2020/2/1" in result.output
+
+
+def test_daemon_returns_usage_errors(daemon):
+    """Errors from the forwarded command are returned with its exit code."""
+    runner = CliRunner()
+    result = runner.invoke(cli, "-c tests/resources/sample_config.yml income-statement")
+    assert result.exit_code == 2
+    assert "Please enter a valid begin-date and end-date" in result.output
+
+
+def test_daemon_writes_out_file_relative_to_client(daemon, tmp_path):
+    """OUT_FILE is written by the daemon to the client's path."""
+    out_file = tmp_path / "balance.tex"
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        f"-c tests/resources/sample_config.yml balance-sheet -e 2020/3/31 {out_file}",
+    )
+    assert result.exit_code == 0
+    assert out_file.read_text() == "balance-sheet  2020/3/31"
+
+
+def test_daemon_refuses_second_instance(daemon):
+    """It does not replace a socket another daemon is listening on."""
+    with pytest.raises(OSError):
+        Daemon(path=daemon)
+
+
+def test_warming_survives_failures(tmp_path, monkeypatch):
+    """It keeps warming after an iteration raises."""
+    server = Daemon(path=str(tmp_path / "pacioli.sock"), backends={})
+    warmed = threading.Event()
+    calls = []
+
+    def warm():
+        calls.append(None)
+        if len(calls) == 1:
+            raise OSError("config directory removed")
+        warmed.set()
+
+    monkeypatch.setattr(server, "warm", warm)
+    try:
+        server.start_warming(interval=0.01)
+        assert warmed.wait(timeout=5)
+    finally:
+        server.server_close()
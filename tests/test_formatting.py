@@ -0,0 +1,65 @@
+"""Tests for locale aware balance formatting."""
+
+import locale
+from concurrent.futures import ThreadPoolExecutor
+
+from pacioli.formatting import Formatter, group_digits, locale_conventions
+
+US = {"decimal_point": ".", "thousands_sep": ",", "grouping": [3, 0], "currency_symbol": "$"}
+GERMAN = {
+    "decimal_point": ",",
+    "thousands_sep": ".",
+    "grouping": [3, 3, 0],
+    "currency_symbol": "€",
+    "p_cs_precedes": 0,
+    "p_sep_by_space": 1,
+}
+
+
+def test_group_digits():
+    """It groups digits from the right, repeating or stopping as localeconv says."""
+    assert group_digits("1234567", [3, 0], ",") == "1,234,567"
+    assert group_digits("12345678", [3, 2, 0], ",") == "1,23,45,678"
+    assert group_digits("1234567", [3, locale.CHAR_MAX], ",") == "1234,567"
+    assert group_digits("1234567", [], ",") == "1234567"
+
+
+def test_format_number_with_conventions():
+    """It formats balances with the separators of the conventions."""
+    assert Formatter(US).format_number(-1234567) == "(1,234,567)"
+    assert Formatter(GERMAN, decimals=2).format_number(1234.5) == "1.234,50"
+    assert Formatter().format_number(1234) == "1234"
+
+
+def test_format_number_with_currency_symbol():
+    """It places the currency symbol as the conventions do."""
+    assert Formatter(US, currency_symbol="$").format_number(-1500) == "($1,500)"
+    assert Formatter(GERMAN, currency_symbol="€").format_number(1500) == "1.500 €"
+
+
+def test_format_returns_a_copy():
+    """It formats nested balances without modifying the data."""
+    data = {"title": "Acme", "total": 11000, "tree": [{"balance": -5, "children": []}]}
+    result = Formatter(US).format(data)
+
+    assert result == {
+        "title": "Acme",
+        "total": "11,000",
+        "tree": [{"balance": "(5)", "children": []}],
+    }
+    assert data["total"] == 11000
+
+
+def test_formatters_work_concurrently():
+    """Formatters with different conventions can format at the same time."""
+    formatters = [Formatter(US), Formatter(GERMAN)] * 50
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda formatter: formatter.format_number(1234567), formatters))
+    assert results == ["1,234,567", "1.234.567"] * 50
+
+
+def test_locale_conventions_restores_the_process_locale():
+    """It reads a locale's conventions without changing the process locale."""
+    before = locale.setlocale(locale.LC_NUMERIC)
+    assert "decimal_point" in locale_conventions("C")
+    assert locale.setlocale(locale.LC_NUMERIC) == before
@@ -0,0 +1,162 @@
+"""Tests for the general ledger."""
+
+import pytest
+from click.testing import CliRunner
+
+from pacioli.accounts import AccountIndex
+from pacioli.backend import ReportBackend
+from pacioli.cli import cli
+from pacioli.formatting import Formatter
+from pacioli.general_ledger import FIELD_SEPARATOR, GeneralLedger
+from pacioli.pacioli import LedgerError, LedgerTimeout, Pacioli
+
+ACCOUNTS = ["Assets:Current:Checking", "Expenses:Food:Dining", "Income:Salary"]
+REGISTER = [
+    ["Assets:Current:Checking", "2020/01/01", "Paycheck", "1000"],
+    ["Assets:Current:Checking", "2020/01/05", "Tom's & Jerry's", "-25.5"],
+    ["Expenses:Food:Dining", "2020/01/05", "Tom's & Jerry's", "25.5"],
+    ["Income:Salary", "2020/01/01", "Paycheck", "-1000"],
+]
+
+
+@pytest.fixture
+def general_ledger(monkeypatch, tmp_path):
+    """Return a general ledger whose ledger calls are recorded."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    general_ledger = GeneralLedger(config_file="tests/resources/sample_config.yml")
+    general_ledger.market = None
+    general_ledger.formatter = Formatter({"thousands_sep": ",", "grouping": [3, 0]})
+    general_ledger.commands = []
+    general_ledger.read = 0
+
+    def mock_run_system_command(command):
+        general_ledger.commands.append(command)
+        if command[-1] == "accounts":
+            return "\n".join(ACCOUNTS) + "\n"
+        return "Assets:Current:Checking|500\n"
+
+    def mock_stream_system_command(command):
+        general_ledger.commands.append(command)
+        for fields in REGISTER:
+            general_ledger.read += 1
+            yield FIELD_SEPARATOR.join(fields)
+
+    monkeypatch.setattr(general_ledger, "run_system_command", mock_run_system_command)
+    monkeypatch.setattr(general_ledger, "stream_system_command", mock_stream_system_command)
+    return general_ledger
+
+
+def test_postings_are_grouped_by_account(general_ledger):
+    """It groups postings by account with running and closing balances."""
+    data = general_ledger.get_report_data("2020/1/1", "2020/2/1")
+    accounts = []
+    for account in data["accounts"]:
+        postings = list(account.postings)
+        accounts.append((account.account, account.opening, postings, account.closing))
+
+    checking, dining, salary = accounts
+    assert checking[0] == "Assets:Current:Checking"
+    assert checking[1] == "500"
+    assert [posting.balance for posting in checking[2]] == ["1,500", "1,474"]
+    assert checking[3] == "1,474"
+    assert dining[2][0].payee == r"Tom's \& Jerry's"
+    assert salary[2][0].amount == "(1,000)"
+
+
+def test_income_and_expenses_open_at_zero(general_ledger, monkeypatch):
+    """It only queries the opening balances of balance sheet accounts."""
+    monkeypatch.setattr(
+        general_ledger,
+        "get_accounts_listed",
+        lambda: ["Assets:Current:Checking", "Income", "Expenses:Food"],
+    )
+    data = general_ledger.get_report_data("2020/1/1", "2020/2/1")
+
+    openings = {account.account: account.opening for account in data["accounts"]}
+    assert openings == {
+        "Assets:Current:Checking": "500",
+        "Expenses:Food:Dining": "0",
+        "Income:Salary": "0",
+    }
+    (balance_query,) = [command for command in general_ledger.commands if "bal" in command]
+    accounts = balance_query[balance_query.index("bal") + 1 : balance_query.index("--flat")]
+    assert accounts == ["Assets:Current:Checking"]
+
+
+def test_postings_are_read_as_rendered(general_ledger):
+    """It reads register lines only as the template iterates them."""
+    data = general_ledger.get_report_data("2020/1/1", "2020/2/1")
+    assert general_ledger.read == 0
+
+    checking = next(data["accounts"])
+    next(checking.postings)
+    assert general_ledger.read == 1
+
+
+def test_one_register_query(general_ledger):
+    """It lists every posting from one register query sorted by account."""
+    report = general_ledger.print_report("2020/1/1", "2020/2/1")
+
+    registers = [command for command in general_ledger.commands if "reg" in command]
+    assert len(registers) == 1
+    assert registers[0][registers[0].index("--sort") + 1] == "account,date"
+    assert r"\section*{Expenses:Food:Dining}" in report
+    assert "2020/2/1 & Closing balance & & (1,000)" in report
+    assert "2020/1/1 & Opening balance & & 0" in report
+
+
+def test_stream_system_command_yields_lines():
+    """It yields each line of a command's output."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    assert list(pacioli.stream_system_command(["printf", "a\\nb\\n"])) == ["a", "b"]
+
+
+def test_stream_system_command_raises_on_failure():
+    """It raises LedgerError after the output when the command fails."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    lines = pacioli.stream_system_command(["sh", "-c", "echo a; echo oops >&2; exit 2"])
+
+    assert next(lines) == "a"
+    with pytest.raises(LedgerError, match="oops"):
+        next(lines)
+
+
+def test_stream_system_command_times_out():
+    """It kills a command that runs past the timeout."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.config.query_timeout = 0.1
+
+    with pytest.raises(LedgerTimeout):
+        list(pacioli.stream_system_command(["sleep", "5"]))
+
+
+def test_general_ledger_command_writes_file(monkeypatch, tmp_path):
+    """It writes the general ledger for a period to the out file."""
+    monkeypatch.setattr(
+        ReportBackend,
+        "report_data",
+        lambda self, report, start, end, variables=None: {
+            "title": "Acme LLC",
+            "start_date": start,
+            "end_date": end,
+            "accounts": iter([]),
+        },
+    )
+    out_file = tmp_path / "general_ledger.tex"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "-c",
+            "tests/resources/sample_config.yml",
+            "general-ledger",
+            "-b",
+            "2020/1/1",
+            "-e",
+            "2020/2/1",
+            str(out_file),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert out_file.read_text().startswith(r"\begin{document}")
@@ -50,3 +50,56 @@ def test_render_template_returns():
     assert income in result
     assert "{Total Expenses} & " in result
     assert expenses in result
+
+
+FLAT_OUTPUT = """Expenses:Food:Dining|28.06
+Expenses:Food:Grocery|738.18
+Expenses:Household:Home Improvements|84.42
+Income:Interest|-40.00
+Income:Salary|-4913.00
+"""
+
+
+def test_build_account_tree_rolls_up_subtotals():
+    """Each node's balance includes its sub-accounts."""
+    balances = {"Expenses:Food:Dining": 28.06, "Expenses:Food:Grocery": 738.18, "Income:X": 1}
+    tree = IncomeStatement.build_account_tree("Expenses", balances, depth=3)
+
+    assert tree["balance"] == 766
+    (food,) = tree["children"]
+    assert food["account"] == "Expenses:Food"
+    assert food["balance"] == 766
+    assert [(child["name"], child["balance"]) for child in food["children"]] == [
+        ("Dining", 28),
+        ("Grocery", 738),
+    ]
+
+
+def test_build_account_tree_limits_depth():
+    """Accounts below the depth are included in their ancestor's balance."""
+    balances = {"Expenses:Food:Dining": 28.06, "Expenses:Food:Grocery": 738.18}
+    tree = IncomeStatement.build_account_tree("Expenses", balances, depth=2)
+    assert tree["children"][0]["children"] == []
+    assert tree["children"][0]["balance"] == 766
+
+
+def test_get_report_data_uses_one_query_and_section_depths(monkeypatch):
+    """Income and expenses come from one flat query with per-section depth."""
+    report = IncomeStatement(config_file="tests/resources/sample_config.yml")
+    report.config.income_statement_depth = {"Income": 2, "Expenses": 3}
+    commands = []
+
+    def mock_run_system_command(command):
+        commands.append(command)
+        return FLAT_OUTPUT
+
+    monkeypatch.setattr(report, "run_system_command", mock_run_system_command)
+    result = report.get_report_data("2020/2/1", "2020/3/31")
+
+    assert len(commands) == 1
+    assert "--flat" in commands[0]
+    assert result["income"] == {"Interest": 40, "Salary": 4913}
+    assert result["income_total"] == 4953
+    assert result["expenses"] == {"Food": 766, "Household": 84}
+    assert result["expenses_tree"][0]["children"][1]["name"] == "Grocery"
+    assert result["net_income"] == 4953 - 851
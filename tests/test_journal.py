@@ -0,0 +1,133 @@
+"""Tests for the journal include graph."""
+
+import datetime
+import os
+
+from pacioli.journal import Journal
+
+
+def write_journal(tmp_path):
+    """Create a root journal that includes a yearly file and a glob."""
+    (tmp_path / "years").mkdir()
+    (tmp_path / "years" / "2019.ldg").write_text("2019/01/01 * Opening\n")
+    (tmp_path / "years" / "2020.ldg").write_text("2020/01/01 * Opening\n")
+    (tmp_path / "prices.db").write_text("P 2020/01/01 AAPL $100\n")
+    root = tmp_path / "main.ldg"
+    root.write_text("include prices.db\n!include years/*.ldg\n")
+    return root
+
+
+def test_include_files_follows_includes_in_order(tmp_path):
+    """It returns the root journal followed by included files."""
+    root = write_journal(tmp_path)
+    files = Journal(str(root)).include_files()
+    assert files == [
+        str(root),
+        str(tmp_path / "prices.db"),
+        str(tmp_path / "years" / "2019.ldg"),
+        str(tmp_path / "years" / "2020.ldg"),
+    ]
+
+
+def test_include_files_tracks_missing_include(tmp_path):
+    """It keeps missing includes so their creation is detected."""
+    root = tmp_path / "main.ldg"
+    root.write_text("include missing.ldg\n")
+    assert str(tmp_path / "missing.ldg") in Journal(str(root)).include_files()
+
+
+def test_fingerprint_changes_when_included_file_changes(tmp_path):
+    """It returns a new fingerprint when an included file is modified."""
+    root = write_journal(tmp_path)
+    journal = Journal(str(root))
+    before = journal.fingerprint()
+    assert journal.fingerprint() == before
+
+    included = tmp_path / "years" / "2020.ldg"
+    included.write_text("2020/01/01 * Opening\n2020/02/01 * Coffee\n")
+    os.utime(included, ns=(1, 1))
+    assert journal.fingerprint() != before
+
+
+def test_include_files_sees_new_files_matching_glob(tmp_path):
+    """A file added to a globbed directory is picked up without re-reading."""
+    root = write_journal(tmp_path)
+    journal = Journal(str(root))
+    journal.include_files()
+
+    (tmp_path / "years" / "2021.ldg").write_text("2021/01/01 * Opening\n")
+    assert str(tmp_path / "years" / "2021.ldg") in journal.include_files()
+
+
+def write_yearly_journal(tmp_path):
+    """Create a root journal with prices around an include of yearly files."""
+    (tmp_path / "years").mkdir()
+    (tmp_path / "years" / "2019.ldg").write_text(
+        "2019/03/01 * Coffee\n    Expenses:Food  $5\n    Assets:Checking\n"
+        "P 2019/12/31 AAPL $2.50\n"
+    )
+    (tmp_path / "years" / "2020.ldg").write_text(
+        "year 2020\n01/15=01/20 * Rent\n    Expenses:Rent  $500\n    [Assets:Checking]\n"
+    )
+    root = tmp_path / "main.ldg"
+    root.write_text(
+        "account Assets:Savings\nP 2019/12/31 AAPL $1\n"
+        "include years/*.ldg\nP 2019/12/31 AAPL 3 USD\n"
+    )
+    return root
+
+
+def test_scan_summarises_each_file(tmp_path):
+    """It records the transaction dates and accounts of each file."""
+    root = write_yearly_journal(tmp_path)
+    summary = Journal(str(root)).scan()
+
+    file_2020 = summary.files[str(tmp_path / "years" / "2020.ldg")]
+    assert file_2020.first_date == datetime.date(2020, 1, 15)
+    assert file_2020.last_date == datetime.date(2020, 1, 20)
+    assert not file_2020.undated
+    assert summary.files[str(root)].first_date is None
+    assert summary.accounts == [
+        "Assets:Checking",
+        "Assets:Savings",
+        "Expenses:Food",
+        "Expenses:Rent",
+    ]
+
+
+def test_scan_keeps_prices_in_read_order(tmp_path):
+    """It merges prices in the order Ledger reads them across includes."""
+    root = write_yearly_journal(tmp_path)
+    prices = Journal(str(root)).scan().prices
+
+    assert [(price.amount, price.currency) for price in prices] == [
+        (1, "$"),
+        (2.5, "$"),
+        (3, "USD"),
+    ]
+
+
+def test_scan_in_process_pool(tmp_path, monkeypatch):
+    """It returns the same summary when files are scanned in a process pool."""
+    root = write_yearly_journal(tmp_path)
+    expected = Journal(str(root)).scan()
+
+    monkeypatch.setattr("pacioli.journal.PARALLEL_SCAN_BYTES", 0)
+    assert Journal(str(root)).scan() == expected
+
+
+def test_period_fingerprint_ignores_other_years(tmp_path):
+    """It only changes when a file with transactions in the period changes."""
+    root = write_yearly_journal(tmp_path)
+    journal = Journal(str(root))
+    year_2019 = (datetime.date(2019, 1, 1), datetime.date(2020, 1, 1))
+    before = journal.period_fingerprint(*year_2019)
+
+    included = tmp_path / "years" / "2020.ldg"
+    included.write_text("2020/06/01 * Coffee\n    Expenses:Food  $5\n    Assets:Checking\n")
+    os.utime(included, ns=(1, 1))
+    assert journal.period_fingerprint(*year_2019) == before
+
+    included.write_text("2019/06/01 * Coffee\n    Expenses:Food  $5\n    Assets:Checking\n")
+    os.utime(included, ns=(2, 2))
+    assert journal.period_fingerprint(*year_2019) != before
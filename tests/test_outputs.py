@@ -0,0 +1,94 @@
+"""Tests for the output cache."""
+
+import io
+import logging
+
+import jinja2
+import pytest
+
+from pacioli.backend import ReportBackend
+from pacioli.outputs import OutputCache
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    """Return a backend with an output cache whose data loads are counted."""
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    backend.outputs = OutputCache(str(tmp_path / "outputs"))
+    backend.loads = 0
+
+    def mock_report_data(report, start_date, end_date, variables=None):
+        backend.loads += 1
+        return {"title": "Acme LLC", "net_income": 5}
+
+    monkeypatch.setattr(backend, "report_data", mock_report_data)
+    (tmp_path / "income.tex").write_text(r"\VAR{title} \VAR{net_income}")
+    backend.balance_sheet.latex_jinja_env.loader = jinja2.FileSystemLoader(str(tmp_path))
+    backend.income_statement.template = "income.tex"
+    return backend
+
+
+def write(backend, report="income-statement", start_date="2020/1/1", end_date="2020/2/1"):
+    """Return the text the backend writes for a report."""
+    out = io.StringIO()
+    backend.write(report, start_date, end_date, out)
+    return out.getvalue()
+
+
+def test_get_returns_only_current_versions(tmp_path):
+    """It returns a stored report only for the version it was stored with."""
+    outputs = OutputCache(str(tmp_path))
+    key = outputs.key("income-statement", "2020/1/1", "2020/2/1", "config", "template")
+    outputs.put(key, "v1", "report\n")
+
+    assert outputs.get(key, "v1") == "report\n"
+    assert outputs.get(key, "v2") is None
+    assert outputs.get(outputs.key("balance-sheet", "", "", "c", "t"), "v1") is None
+
+
+def test_unchanged_reports_are_not_rendered_again(backend, caplog):
+    """It returns the stored report without loading data while inputs are unchanged."""
+    assert write(backend) == "Acme LLC 5"
+    with caplog.at_level(logging.DEBUG, logger="pacioli.pacioli"):
+        assert write(backend) == "Acme LLC 5"
+
+    assert backend.loads == 1
+    assert "Output cache hit: income-statement 2020/1/1 2020/2/1" in caplog.text
+
+
+def test_changed_inputs_are_rendered(backend, monkeypatch, tmp_path):
+    """It renders again when the dates, config, template or journal change."""
+    write(backend)
+    write(backend, end_date="2020/3/1")
+    assert backend.loads == 2
+
+    backend.config.title = "Acme Holdings"
+    write(backend)
+    assert backend.loads == 3
+
+    (tmp_path / "income.tex").write_text(r"\VAR{net_income}")
+    assert write(backend) == "5"
+    assert backend.loads == 4
+
+    monkeypatch.setattr(backend.journal, "fingerprint", lambda: "changed")
+    write(backend)
+    assert backend.loads == 5
+
+
+def test_failed_renderings_are_not_stored(backend, tmp_path):
+    """It streams the report to the cache and keeps it only once rendering completes."""
+    (tmp_path / "income.tex").write_text(r"\VAR{title} \VAR{net_income.missing()}")
+    with pytest.raises(jinja2.UndefinedError):
+        write(backend)
+    assert not (tmp_path / "outputs").exists() or not list((tmp_path / "outputs").iterdir())
+
+    (tmp_path / "income.tex").write_text(r"\VAR{title} \VAR{net_income}")
+    assert write(backend) == "Acme LLC 5"
+    assert len(list((tmp_path / "outputs").iterdir())) == 1
+    assert write(backend) == "Acme LLC 5"
+    assert backend.loads == 2
+
+
+def test_general_ledger_is_not_cached(backend):
+    """It doesn't store reports too large to cache."""
+    assert backend.output_key("general-ledger", "2020/1/1", "2020/2/1") is None
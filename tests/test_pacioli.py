@@ -1,12 +1,15 @@
 """Tests Pacioli."""
 
+import io
 import locale
 import subprocess
+import time
 
+import jinja2
 import pytest
 
 from pacioli import __version__
-from pacioli.pacioli import Pacioli
+from pacioli.pacioli import LedgerError, LedgerTimeout, Pacioli
 from pacioli.utils import format_balance, format_negative_numbers
 
 
@@ -169,3 +172,88 @@ def test_commodity_checking_account_balance():
     checking = pacioli.get_balance("Assets:Current:Checking", date="2024/3/31")
     assert checking == 3525
     assert isinstance(checking, int)
+
+
+def test_run_system_command_raises_ledger_error_with_stderr():
+    """It raises LedgerError with the exit status and error output."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    with pytest.raises(LedgerError) as error:
+        pacioli.run_system_command(["sh", "-c", "echo 'Error: bad journal' >&2; exit 2"])
+
+    assert error.value.returncode == 2
+    assert "bad journal" in error.value.stderr
+    assert "status 2: Error: bad journal" in str(error.value)
+
+
+def test_run_system_command_kills_command_at_query_timeout():
+    """It kills commands that run past the query timeout."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.config.query_timeout = 0.2
+    started = time.monotonic()
+    with pytest.raises(LedgerTimeout):
+        pacioli.run_system_command(["sh", "-c", "sleep 10 & sleep 10"])
+    assert time.monotonic() - started < 5
+
+
+def test_report_deadline_limits_every_query_in_the_report():
+    """It refuses to start queries once the report deadline has passed."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.config.report_timeout = 0.2
+    with pacioli.report_deadline():
+        assert pacioli.run_system_command(["echo", "fast"]) == "fast\n"
+        time.sleep(0.3)
+        with pytest.raises(LedgerTimeout):
+            pacioli.run_system_command(["echo", "too late"])
+    assert pacioli.get_timeout() is None
+
+
+def test_run_system_command_applies_resource_limits():
+    """It applies the configured CPU limit to the command."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.config.cpu_limit = 7
+    assert pacioli.run_system_command(["sh", "-c", "ulimit -t"]) == "7\n"
+
+
+def test_get_balance_errors_name_the_account(monkeypatch):
+    """It adds the queried account to ledger errors."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+
+    def failing_command(command):
+        raise LedgerError(command, 1, "Error: parse error")
+
+    monkeypatch.setattr(pacioli, "run_system_command", failing_command)
+    with pytest.raises(LedgerError, match="for account 'Assets:Current:Checking'"):
+        pacioli.get_balance("Assets:Current:Checking", date="2020/3/31")
+
+
+def test_stream_template_writes_in_buffered_chunks(tmp_path):
+    """It writes the rendered document in chunks of about the buffer size."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    (tmp_path / "rows.tex").write_text("BLOCK{ for row in rows }\\VAR{row}\nBLOCK{ endfor }")
+    pacioli.latex_jinja_env.loader = jinja2.FileSystemLoader(str(tmp_path))
+
+    class RecordingFile(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    out = RecordingFile()
+    rows = [f"row {number:04}" for number in range(1000)]
+    pacioli.stream_template("rows.tex", {"rows": rows}, out, buffer_size=1000)
+
+    assert out.getvalue() == pacioli.render_template("rows.tex", {"rows": rows})
+    assert 9 <= out.writes <= 10
+
+
+def test_get_template_variables_follows_includes(tmp_path):
+    """It returns the variables of a template and the templates it includes."""
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    (tmp_path / "board.tex").write_text("\\VAR{title}\nBLOCK{ include 'totals.tex' }")
+    (tmp_path / "totals.tex").write_text("BLOCK{ set net = total_assets }\\VAR{net}")
+    (tmp_path / "dynamic.tex").write_text("BLOCK{ include part }")
+    pacioli.latex_jinja_env.loader = jinja2.FileSystemLoader(str(tmp_path))
+
+    assert pacioli.get_template_variables("board.tex") == {"title", "total_assets"}
+    assert pacioli.get_template_variables("dynamic.tex") is None
@@ -0,0 +1,138 @@
+"""Tests for PDF builds."""
+
+import os
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from pacioli import pdf
+from pacioli.backend import ReportBackend
+from pacioli.cli import cli
+from pacioli.pdf import BuildManifest, PdfBuilder
+
+# Stands in for LaTeX: copies the tex file to the PDF, failing on 'fail'
+# and hanging on 'sleep', and records the directory it ran in.
+FAKE_ENGINE = (
+    [
+        "sh",
+        "-c",
+        'grep -q fail "$0" && { echo "! Undefined control sequence."; exit 1; }; '
+        'grep -q sleep "$0" && sleep 5; pwd >> "$0"; cp "$0" "${0%.tex}.pdf"',
+    ],
+    1,
+)
+
+
+@pytest.fixture
+def builder(monkeypatch, tmp_path):
+    """Return a builder running the fake engine with a manifest in tmp_path."""
+    monkeypatch.setitem(pdf.ENGINES, "fake", FAKE_ENGINE)
+    return PdfBuilder(
+        "fake", workers=4, timeout=2, manifest=BuildManifest(str(tmp_path / "m.json"))
+    )
+
+
+def write_tex(tmp_path, name, text="report\n"):
+    """Write a tex file and return its path."""
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_builds_in_separate_directories(builder, tmp_path):
+    """It builds every file next to it, each in its own temporary directory."""
+    tex_files = [write_tex(tmp_path, f"report{number}.tex") for number in range(3)]
+
+    builds = builder.build(tex_files)
+
+    assert [build.built for build in builds] == [True, True, True]
+    directories = {open(build.pdf_file).read().splitlines()[1] for build in builds}
+    assert len(directories) == 3
+    assert str(tmp_path) not in directories
+
+
+def test_unchanged_files_are_skipped(builder, tmp_path):
+    """It skips files unchanged since their last build unless forced."""
+    unchanged = write_tex(tmp_path, "unchanged.tex")
+    changed = write_tex(tmp_path, "changed.tex")
+    builder.build([unchanged, changed])
+
+    write_tex(tmp_path, "changed.tex", "new report")
+    builder.manifest = BuildManifest(builder.manifest.path)
+    builds = builder.build([unchanged, changed])
+    assert [build.built for build in builds] == [False, True]
+
+    assert [build.built for build in builder.build([unchanged], force=True)] == [True]
+
+
+def test_missing_pdf_is_rebuilt(builder, tmp_path):
+    """It rebuilds a PDF that was deleted even if its tex file is unchanged."""
+    (build,) = builder.build([write_tex(tmp_path, "report.tex")])
+    os.unlink(build.pdf_file)
+
+    assert builder.build([build.tex_file])[0].built
+
+
+def test_failures_do_not_stop_other_builds(builder, tmp_path):
+    """It reports a failed build with LaTeX's error and builds the rest."""
+    builds = builder.build([write_tex(tmp_path, "bad.tex", "fail"), write_tex(tmp_path, "ok.tex")])
+
+    assert builds[0].error.startswith("LaTeX exited with status 1: Undefined control sequence.")
+    assert not os.path.exists(builds[0].pdf_file)
+    assert builds[1].built
+    assert builder.manifest.get(builds[0].pdf_file) is None
+
+
+def test_builds_are_killed_at_the_timeout(builder, tmp_path):
+    """It kills a build that runs past the timeout."""
+    builder.timeout = 0.2
+    start = time.monotonic()
+
+    (build,) = builder.build([write_tex(tmp_path, "slow.tex", "sleep")])
+
+    assert build.error == "LaTeX was killed after 0.2 seconds"
+    assert time.monotonic() - start < 4
+
+
+def test_pdf_command_builds_files(monkeypatch, tmp_path):
+    """It builds the given tex files and reports unchanged ones."""
+    monkeypatch.setitem(pdf.ENGINES, "latexmk", FAKE_ENGINE)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    tex_file = write_tex(tmp_path, "report.tex")
+    command = ["-c", "tests/resources/sample_config.yml", "pdf", "-j", "2", tex_file]
+
+    result = CliRunner().invoke(cli, command)
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(tmp_path / "report.pdf")
+
+    assert "Unchanged" in CliRunner().invoke(cli, command).output
+
+
+def test_pdf_option_needs_out_file():
+    """It refuses to build a PDF of standard output."""
+    result = CliRunner().invoke(
+        cli, ["-c", "tests/resources/sample_config.yml", "balance-sheet", "--pdf"]
+    )
+
+    assert result.exit_code == 2
+    assert "--pdf needs an OUT_FILE" in result.output
+
+
+def test_pdf_option_builds_reports_answered_by_the_daemon(monkeypatch, tmp_path):
+    """It builds the PDF of a report written from the daemon's cache."""
+    monkeypatch.setitem(pdf.ENGINES, "latexmk", FAKE_ENGINE)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    monkeypatch.setattr(
+        backend, "get_response", lambda report, start, end: ("etag", "daemon report\n")
+    )
+    out_file = tmp_path / "balance.tex"
+
+    result = CliRunner().invoke(
+        cli, ["balance-sheet", "--pdf", str(out_file)], obj={"backend": backend, "daemon": True}
+    )
+
+    assert result.exit_code == 0, result.output
+    assert out_file.read_text() == "daemon report\n"
+    assert (tmp_path / "balance.pdf").exists()
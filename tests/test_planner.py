@@ -0,0 +1,157 @@
+"""Tests for the ledger query planner."""
+
+import pytest
+from click.testing import CliRunner
+
+from pacioli.accounts import AccountIndex
+from pacioli.cash_flow_statement import CashFlowStatement
+from pacioli.cli import cli
+from pacioli.pacioli import Pacioli
+from pacioli.planner import Balance, PeriodBalances, QueryPlan, RelatedFlows
+
+ACCOUNTS = """Assets:Current:Checking
+Assets:Current:CheckingOld
+Assets:Current:Savings
+Expenses:Food
+Income:Salary
+"""
+
+FLAT_BALANCES = """Assets:Current:Checking|100.40
+Assets:Current:CheckingOld|7
+Assets:Current:Savings|1000
+"""
+
+
+@pytest.fixture
+def pacioli(monkeypatch, tmp_path):
+    """Return a Pacioli without market values whose ledger calls are recorded."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.market = None
+    pacioli.commands = []
+
+    def mock_run_system_command(command):
+        pacioli.commands.append(command)
+        if command[-1] == "accounts":
+            return ACCOUNTS
+        if "--related" in command:
+            return "Expenses:Food|50\nIncome:Salary|-900\n"
+        return FLAT_BALANCES
+
+    monkeypatch.setattr(pacioli, "run_system_command", mock_run_system_command)
+    return pacioli
+
+
+def test_plan_merges_balances_at_the_same_date(pacioli):
+    """It answers every balance at one date with one query and drops duplicates."""
+    needs = [
+        Balance("Assets:Current:Checking", "2020/3/31"),
+        Balance("Assets:Current", "2020/3/31"),
+        Balance("Assets:Current:Checking", "2020/3/31"),
+        Balance("Assets:Current:Checking", "2020/1/1"),
+        RelatedFlows(("Assets:Current:Checking",), "2020/1/1", "2020/3/31"),
+        RelatedFlows(("Assets:Current:Checking",), "2020/1/1", "2020/3/31"),
+    ]
+    plan = QueryPlan(pacioli, needs)
+
+    assert plan.invocations == 3
+    assert plan.explain().splitlines()[0] == (
+        "Query plan: 4 needs answered by 3 ledger invocations"
+    )
+
+
+def test_execute_selects_accounts_like_ledger(pacioli):
+    """It sums the accounts ledger's regex selects, including siblings sharing a prefix."""
+    results = QueryPlan(
+        pacioli,
+        [Balance("Assets:Current:Checking", "2020/3/31"), Balance("Assets:Current", "2020/3/31")],
+    ).execute()
+
+    assert results[Balance("Assets:Current:Checking", "2020/3/31")] == 107
+    assert results[Balance("Assets:Current", "2020/3/31")] == 1107
+    assert len(pacioli.commands) == 1
+    assert "--flat" in pacioli.commands[0]
+
+
+def test_planner_and_single_account_queries_agree(pacioli, monkeypatch):
+    """An account prefixing a sibling has the same balance from the plan as from its own query."""
+    need = Balance("assets:current:checking", "2020/3/31")
+    planned = QueryPlan(pacioli, [need]).execute()[need]
+
+    # What ledger prints for the account on its own: the regex selects both
+    # Checking and CheckingOld, whatever the case.
+    monkeypatch.setattr(
+        pacioli, "run_system_command", lambda command: "$107.40  Assets:Current:Checking\n"
+    )
+    assert planned == pacioli.get_balance("assets:current:checking", "2020/3/31") == 107
+
+    pacioli.checkpoints = object()
+    monkeypatch.setattr(
+        pacioli, "get_checkpoint", lambda date: ("2020/3/1", {"Assets:Current:CheckingOld": 7})
+    )
+    monkeypatch.setattr(pacioli, "query_balance", lambda account, end_date, start_date: 100.4)
+    assert pacioli.get_balance("assets:current:checking", "2020/3/31") == planned
+
+
+def test_market_values_are_queried_per_account(pacioli):
+    """It does not merge balances when ledger converts to market values."""
+    pacioli.market = "--market"
+    pacioli.config.price_index = False
+    plan = QueryPlan(
+        pacioli,
+        [Balance("Assets:Current:Checking", "2020/3/31"), Balance("Assets:Current", "2020/3/31")],
+    )
+    assert plan.invocations == 2
+
+
+def test_period_balances_are_returned_by_account(pacioli):
+    """It returns the own balance of each account in the period."""
+    need = PeriodBalances(("Assets",), "2020/1/1", "2020/3/31")
+    results = QueryPlan(pacioli, [need]).execute()
+    assert results[need]["Assets:Current:Savings"] == 1000
+
+
+def test_cash_flow_statement_runs_one_query_per_date_and_one_for_flows(monkeypatch, pacioli):
+    """It reads cash balances at both dates and the related flows in three queries."""
+    report = CashFlowStatement(config_file="tests/resources/sample_config.yml")
+    report.market = None
+    monkeypatch.setattr(report, "run_system_command", pacioli.run_system_command)
+
+    result = report.get_report_data("2020/1/1", "2020/3/31")
+
+    ledger_queries = [command for command in pacioli.commands if command[-1] != "accounts"]
+    assert len(ledger_queries) == 3
+    # ledger's regex for Assets:Current:Checking selects CheckingOld too
+    assert result["beginning_cash"] == 1107
+    assert result["operating_activities"] == {"salary": 900}
+
+
+def test_explain_prints_plan_without_running_queries(monkeypatch, tmp_path):
+    """It prints the query plan instead of the report."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    commands = []
+
+    def mock_run_system_command(self, command):
+        commands.append(command)
+        return ACCOUNTS
+
+    monkeypatch.setattr(Pacioli, "run_system_command", mock_run_system_command)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "--config",
+            "tests/resources/sample_config.yml",
+            "--explain",
+            "cash-flow-statement",
+            "--period",
+            "Jan 2020 to Mar 2020",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert result.output.startswith("Query plan:")
+    assert "flows related to 2 accounts from 2020/1/1 to 2020/4/1" in result.output
+    assert [command[-1] for command in commands] == ["accounts"]
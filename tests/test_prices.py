@@ -0,0 +1,109 @@
+"""Tests for the commodity price index."""
+
+import datetime
+
+import pytest
+
+from pacioli.accounts import AccountIndex
+from pacioli.journal import Journal, Price
+from pacioli.pacioli import Pacioli
+from pacioli.planner import Balance, QueryPlan
+from pacioli.prices import PriceIndex
+
+BROKERAGE_QUANTITIES = """Assets:Current:Checking|$3,525.00
+Assets:Investments:Brokerage|15 AAPL
+20 MSFT
+"""
+
+
+@pytest.fixture
+def pacioli(monkeypatch, tmp_path):
+    """Return a Pacioli with market values whose ledger calls are recorded."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setattr(PriceIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    pacioli = Pacioli(config_file="tests/resources/commodity_config.yml")
+    pacioli.commands = []
+
+    def mock_run_system_command(command):
+        pacioli.commands.append(command)
+        if command[-1] == "accounts":
+            return "Assets:Current:Checking\nAssets:Investments:Brokerage\n"
+        return BROKERAGE_QUANTITIES
+
+    monkeypatch.setattr(pacioli, "run_system_command", mock_run_system_command)
+    return pacioli
+
+
+def test_price_as_of_date():
+    """It returns the latest price on or before a date, the last read on ties."""
+    index = PriceIndex(
+        [
+            Price(datetime.date(2024, 3, 1), "AAPL", 170, "$"),
+            Price(datetime.date(2024, 1, 1), "AAPL", 150, "$"),
+            Price(datetime.date(2024, 3, 1), "AAPL", 175, "$"),
+        ]
+    )
+
+    assert index.price("AAPL", datetime.date(2023, 12, 31)) is None
+    assert index.price("AAPL", datetime.date(2024, 2, 1)) == (150, "$")
+    assert index.price("AAPL", datetime.date(2024, 3, 1)) == (175, "$")
+    assert len(index) == 3
+
+
+def test_value_converts_through_prices():
+    """It values commodities in a currency, converting through another if needed."""
+    index = PriceIndex(
+        [
+            Price(datetime.date(2024, 1, 1), "VWRL", 100, "EUR"),
+            Price(datetime.date(2024, 1, 1), "EUR", 1.1, "USD"),
+        ]
+    )
+    on = datetime.date(2024, 6, 1)
+
+    assert index.value({"VWRL": 2, "USD": 5}, on, "USD") == pytest.approx(225)
+    assert index.value({"VWRL": 2}, on) == 200
+    assert index.value({"GOLD": 1, "USD": 5}, on, "USD") is None
+
+
+def test_load_reads_prices_and_costs_from_the_journal(monkeypatch):
+    """It indexes price directives and the costs of postings."""
+    monkeypatch.setattr(PriceIndex, "loaded", {})
+    index = PriceIndex.load(Journal("tests/resources/commodity_ledger.ldg"))
+
+    assert index.price("AAPL", datetime.date(2024, 2, 10)) == (155, "$")
+    assert index.price("MSFT", datetime.date(2024, 3, 31)) == (250, "$")
+    assert PriceIndex.load(Journal("tests/resources/commodity_ledger.ldg")) is index
+
+
+def test_market_values_from_one_query(pacioli):
+    """It values every account's commodities from one ledger query."""
+    values = pacioli.get_market_values(
+        ["Assets:Current:Checking", "Assets:Investments:Brokerage", "Assets"], "2024/4/1"
+    )
+
+    assert values == {
+        "Assets:Current:Checking": 3525,
+        "Assets:Investments:Brokerage": 15 * 180 + 20 * 250,
+        "Assets": 3525 + 15 * 180 + 20 * 250,
+    }
+    assert len(pacioli.commands) == 1
+    assert "--market" not in pacioli.commands[0]
+
+
+def test_market_values_fall_back_to_ledger(pacioli):
+    """It leaves valuation to ledger when a commodity has no price."""
+    assert pacioli.get_market_values(["Assets"], "2024/1/2") is None
+
+
+def test_plan_values_balances_at_one_date_together(pacioli):
+    """It merges market value balances at one date into one query."""
+    needs = [
+        Balance("Assets:Current:Checking", "2024/4/1"),
+        Balance("Assets:Investments:Brokerage", "2024/4/1"),
+    ]
+    plan = QueryPlan(pacioli, needs)
+    assert plan.invocations == 1
+    assert "valued from the price index" in plan.explain()
+
+    assert plan.execute() == {needs[0]: 3525, needs[1]: 7700}
@@ -0,0 +1,110 @@
+"""Tests for typed report results."""
+
+import dataclasses
+import marshal
+
+import pytest
+
+from pacioli.accounts import AccountIndex
+from pacioli.balance_sheet import BalanceSheet
+from pacioli.income_statement import IncomeStatement
+from pacioli.results import Line, Section, Statement
+
+STATEMENT = Statement(
+    "income-statement",
+    "Acme LLC",
+    "2020/1/1",
+    "2020/2/1",
+    (
+        Section(
+            "income",
+            (Line("Income", "Income", 100, (Line("Salary", "Income:Salary", 100),)),),
+            100,
+        ),
+        Section("expenses", (Line("Food", "Expenses:Food", 40),), 40),
+    ),
+    (("net_income", 60),),
+)
+
+
+def test_statements_are_frozen_and_slotted():
+    """It can't be changed and has no per-instance dict."""
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        STATEMENT.title = "Other"  # type: ignore[misc]
+    assert not hasattr(STATEMENT.sections[0].lines[0], "__dict__")
+
+
+def test_serialization_round_trips():
+    """It reads back what it writes as JSON and bytes."""
+    assert Statement.from_json(STATEMENT.to_json()) == STATEMENT
+    assert Statement.from_bytes(STATEMENT.to_bytes()) == STATEMENT
+    assert STATEMENT.to_dict()["totals"] == {"net_income": 60}
+
+
+def test_from_bytes_rejects_other_formats():
+    """It raises ValueError for data in another format."""
+    with pytest.raises(ValueError):
+        Statement.from_bytes(marshal.dumps((0, ())))
+
+
+def test_lookups():
+    """It finds sections and totals by name."""
+    assert STATEMENT.section("expenses").lines[0].amount == 40
+    assert STATEMENT.total("net_income") == 60
+    assert STATEMENT.total("income") == 100
+    with pytest.raises(KeyError):
+        STATEMENT.total("ending_cash")
+
+
+def test_csv_lists_lines_then_totals():
+    """It writes sub-account lines after their parent and totals last."""
+    rows = STATEMENT.to_csv().splitlines()
+    assert rows[0] == "report,start_date,end_date,section,account,name,amount"
+    assert [row.split(",", 3)[3] for row in rows[1:]] == [
+        "income,Income,Income,100",
+        "income,Income:Salary,Salary,100",
+        "income,,total,100",
+        "expenses,Expenses:Food,Food,40",
+        "expenses,,total,40",
+        ",,net_income,60",
+    ]
+
+
+def test_income_statement_is_built_then_rendered(monkeypatch):
+    """Its template variables are derived from the statement."""
+    report = IncomeStatement(config_file="tests/resources/sample_config.yml")
+    monkeypatch.setattr(
+        report, "run_system_command", lambda command: "Income:Salary|-4913\nExpenses:Food|766\n"
+    )
+
+    statement = report.build_report("2020/2/1", "2020/3/31")
+
+    assert statement.total("net_income") == 4913 - 766
+    assert statement.section("income").lines[0] == Line("Salary", "Income:Salary", 4913)
+    data = report.template_data(statement)
+    assert data["income"] == {"Salary": 4913}
+    assert data["expenses_tree"] == [
+        {"name": "Food", "account": "Expenses:Food", "balance": 766, "children": []}
+    ]
+    assert data == report.get_report_data("2020/2/1", "2020/3/31")
+
+
+def test_balance_sheet_liabilities_are_positive(monkeypatch, tmp_path):
+    """It presents amounts owed as positive amounts."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    report = BalanceSheet(config_file="tests/resources/sample_config.yml")
+    report.market = None
+
+    def mock_run_system_command(command):
+        if command[-1] == "accounts":
+            return "Assets:Current:Checking\nLiabilities:Visa\n"
+        return "Assets:Current:Checking|100\nLiabilities:Visa|-40\n"
+
+    monkeypatch.setattr(report, "run_system_command", mock_run_system_command)
+
+    statement = report.build_report("2020/3/31")
+
+    assert statement.section("unsecured_liabilities").total == 40
+    assert statement.total("total_equity") == 60
+    assert report.template_data(statement)["checking"] == 100
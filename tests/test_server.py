@@ -0,0 +1,81 @@
+"""Tests for the report server."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from pacioli.backend import ReportBackend
+from pacioli.server import ReportServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Run a server on a free port with a backend that does not need ledger."""
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    monkeypatch.setattr(backend, "render", lambda report, start, end: f"{report} {start} {end}")
+    monkeypatch.setattr(backend, "report_data", lambda report, start, end: {"net_income": 791})
+
+    server = ReportServer(backend, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    """Return the status, headers and body of a GET request."""
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read().decode()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read().decode()
+
+
+def test_balance_sheet_returns_tex(server):
+    """It renders the balance sheet as of the requested date."""
+    status, headers, body = get(f"{server}/balance-sheet?date=2020/3/31")
+    assert status == 200
+    assert body == "balance-sheet  2020/3/31"
+    assert headers["ETag"]
+
+
+def test_income_statement_accepts_period(server):
+    """It converts the period to dates."""
+    status, _, body = get(f"{server}/income-statement?period=January%202020")
+    assert status == 200
+    assert body == "income-statement 2020/1/1 2020/2/1"
+
+
+def test_cash_flow_returns_json(server):
+    """It returns the unformatted values as JSON."""
+    status, headers, body = get(f"{server}/cash-flow?period=January%202020&format=json")
+    assert status == 200
+    assert headers["Content-Type"] == "application/json"
+    assert json.loads(body) == {"net_income": 791}
+
+
+def test_matching_etag_returns_not_modified(server):
+    """It returns 304 when If-None-Match matches the current ETag."""
+    _, headers, _ = get(f"{server}/balance-sheet?date=2020/3/31")
+    status, _, body = get(
+        f"{server}/balance-sheet?date=2020/3/31", headers={"If-None-Match": headers["ETag"]}
+    )
+    assert status == 304
+    assert body == ""
+
+
+def test_invalid_period_returns_bad_request(server):
+    """It returns 400 for a period it cannot parse."""
+    status, _, _ = get(f"{server}/income-statement?period=someday")
+    assert status == 400
+
+
+def test_unknown_path_returns_not_found(server):
+    """It returns 404 for unknown reports."""
+    status, _, _ = get(f"{server}/trial-balance")
+    assert status == 404
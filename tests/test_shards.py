@@ -0,0 +1,136 @@
+"""Tests for time-sharded period queries."""
+
+import datetime
+import os
+
+import pytest
+
+from pacioli.accounts import AccountIndex
+from pacioli.journal import Journal
+from pacioli.pacioli import Pacioli
+from pacioli.planner import PeriodBalances, QueryPlan
+from pacioli.shards import ShardStore, is_before, split_period
+
+
+@pytest.fixture
+def pacioli(monkeypatch, tmp_path):
+    """Return a Pacioli that shards by year and records its ledger calls."""
+    monkeypatch.setattr(AccountIndex, "loaded", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    pacioli = Pacioli(config_file="tests/resources/sample_config.yml")
+    pacioli.market = None
+    pacioli.config.shard_unit = "year"
+    pacioli.config.close_after_days = 60
+    pacioli.shards = ShardStore(str(tmp_path / "shards" / "store.json"))
+    pacioli.commands = []
+
+    def mock_run_system_command(command):
+        pacioli.commands.append(command)
+        return "Expenses:Food|10.5\nIncome:Salary|-100\n"
+
+    monkeypatch.setattr(pacioli, "run_system_command", mock_run_system_command)
+    return pacioli
+
+
+def queried_periods(pacioli):
+    """Return the (begin, end) dates of the recorded ledger commands."""
+    periods = []
+    for command in pacioli.commands:
+        periods.append((command[command.index("-b") + 1], command[command.index("-e") + 1]))
+    return sorted(periods)
+
+
+def test_split_period_by_year():
+    """It splits a period at year boundaries with partial first and last shards."""
+    assert split_period("2020/3/15", "2022/7/1", "year") == [
+        ("2020/3/15", "2021/1/1"),
+        ("2021/1/1", "2022/1/1"),
+        ("2022/1/1", "2022/7/1"),
+    ]
+
+
+def test_split_period_by_quarter():
+    """It splits a period at quarter boundaries."""
+    assert split_period("2020/1/1", "2020/7/1", "quarter") == [
+        ("2020/1/1", "2020/4/1"),
+        ("2020/4/1", "2020/7/1"),
+    ]
+
+
+def test_split_period_unparsable():
+    """It returns None for dates it can't parse or unknown units."""
+    assert split_period("last year", "2020/1/1", "year") is None
+    assert split_period("2019/1/1", "2020/1/1", "decade") is None
+
+
+def test_is_before():
+    """It compares ledger dates with dates."""
+    assert is_before("2020/1/1", datetime.date(2020, 1, 1))
+    assert not is_before("2020/1/2", datetime.date(2020, 1, 1))
+
+
+def test_shards_are_summed(pacioli):
+    """It queries each shard and sums the amounts per account."""
+    amounts = pacioli.query_period_amounts(["Income", "Expenses"], "2019/1/1", "2021/6/1")
+
+    assert queried_periods(pacioli) == [
+        ("2019/1/1", "2020/1/1"),
+        ("2020/1/1", "2021/1/1"),
+        ("2021/1/1", "2021/6/1"),
+    ]
+    assert amounts == {"Expenses:Food": 31.5, "Income:Salary": -300}
+
+
+def test_closed_shards_are_stored(pacioli, tmp_path):
+    """It stores closed shards and only queries the open shard again."""
+    today = datetime.date.today()
+    start = f"{today.year - 2}/1/1"
+    end = f"{today.year}/{today.month}/{today.day}"
+
+    first = pacioli.query_period_amounts(["Income", "Expenses"], start, end)
+    assert len(pacioli.commands) == 3
+    assert os.path.exists(tmp_path / "shards" / "store.json")
+
+    pacioli.commands = []
+    assert pacioli.query_period_amounts(["Income", "Expenses"], start, end) == first
+    assert queried_periods(pacioli) == [(f"{today.year}/1/1", end)]
+
+    # Stored shards survive a new store loaded from disk
+    pacioli.shards = ShardStore(str(tmp_path / "shards" / "store.json"))
+    pacioli.commands = []
+    pacioli.query_period_amounts(["Income", "Expenses"], start, end)
+    assert len(pacioli.commands) == 1
+
+
+def test_no_sharding_with_market(pacioli):
+    """It runs one query for the whole period with market values."""
+    pacioli.market = "-X $"
+    pacioli.query_period_amounts(["Income"], "2019/1/1", "2021/6/1")
+
+    assert queried_periods(pacioli) == [("2019/1/1", "2021/6/1")]
+
+
+def test_explain_counts_shards(pacioli):
+    """It explains how a period is sharded and counts only shards to query."""
+    need = PeriodBalances(("Income", "Expenses"), "2019/1/1", "2021/6/1")
+    pacioli.query_period_amounts(need.accounts, need.start_date, need.end_date)
+
+    plan = QueryPlan(pacioli, [need])
+    assert plan.invocations == 0
+    assert "in 3 shards (3 stored)" in plan.explain()
+
+
+def test_stored_shards_follow_journal_changes(pacioli, tmp_path):
+    """It queries a stored shard again when a file with transactions in it changes."""
+    (tmp_path / "2019.ldg").write_text("2019/03/01 * Coffee\n    Expenses:Food  $5\n    Assets\n")
+    (tmp_path / "2020.ldg").write_text("2020/03/01 * Coffee\n    Expenses:Food  $5\n    Assets\n")
+    root = tmp_path / "main.ldg"
+    root.write_text("include 2019.ldg\ninclude 2020.ldg\n")
+    pacioli.journal = Journal(str(root))
+    pacioli.query_period_amounts(["Expenses"], "2019/1/1", "2021/1/1")
+
+    (tmp_path / "2020.ldg").write_text("2020/04/01 * Coffee\n    Expenses:Food  $5\n    Assets\n")
+    os.utime(tmp_path / "2020.ldg", ns=(1, 1))
+    pacioli.commands = []
+    pacioli.query_period_amounts(["Expenses"], "2019/1/1", "2021/1/1")
+    assert queried_periods(pacioli) == [("2020/1/1", "2021/1/1")]
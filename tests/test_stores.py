@@ -0,0 +1,39 @@
+"""Tests for the JSON stores of closed periods."""
+
+from pacioli.backend import ReportBackend
+from pacioli.checkpoints import CheckpointStore
+from pacioli.shards import ShardStore
+
+
+def test_stores_of_one_file_keep_each_others_entries(tmp_path):
+    """It merges in entries another store of the same file wrote."""
+    path = str(tmp_path / "checkpoints" / "store.json")
+    first = CheckpointStore(path, close_after_days=60)
+    second = CheckpointStore(path, close_after_days=60)
+    first.put("2020/1/1", "a", {"Assets:Checking": 1.0})
+    second.put("2020/2/1", "b", {"Assets:Checking": 2.0})
+
+    stored = CheckpointStore(path, close_after_days=60)
+    assert stored.get("2020/1/1") == {"fingerprint": "a", "balances": {"Assets:Checking": 1.0}}
+    assert stored.get("2020/2/1")["fingerprint"] == "b"
+
+
+def test_store_paths_are_per_kind(tmp_path):
+    """It keeps checkpoints and shards of a journal in separate files."""
+    checkpoints = CheckpointStore.store_path(str(tmp_path), "journal.ldg", ["--cleared"])
+    shards = ShardStore.store_path(str(tmp_path), "journal.ldg", ["--cleared"])
+    assert checkpoints.startswith(str(tmp_path / "checkpoints"))
+    assert shards.startswith(str(tmp_path / "shards"))
+    assert checkpoints.rsplit("/", 1)[1] == shards.rsplit("/", 1)[1]
+
+
+def test_reports_of_a_backend_share_stores(tmp_path, monkeypatch):
+    """It gives every report object of a backend the same store instances."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    backend = ReportBackend(config_file="tests/resources/sample_config_closed.yml")
+
+    assert backend.balance_sheet.checkpoints is not None
+    for report in ("income-statement", "cash-flow-statement", "general-ledger"):
+        report_object = backend.get_report(report)
+        assert report_object.checkpoints is backend.balance_sheet.checkpoints
+        assert report_object.shards is backend.balance_sheet.shards
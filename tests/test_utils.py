@@ -2,12 +2,17 @@
 
 import datetime
 import locale
+import os
+import stat
 from unittest.mock import patch
 
 import pytest
 from click.exceptions import UsageError
 
+from pacioli import utils
 from pacioli.utils import (
+    atomic_write,
+    common_periods,
     format_balance,
     format_negative_numbers,
     month_to_dates,
@@ -65,6 +70,16 @@ def test_format_balance_dict_input_returns_formatted_dict():
     assert {"Checking": checking, "Savings": savings} == result
 
 
+def test_format_balance_formats_account_trees():
+    """It formats balances in lists of nested dictionaries."""
+    locale.setlocale(locale.LC_ALL, "")
+    tree = [{"name": "Food", "balance": 11000, "children": [{"name": "Dining", "balance": -5}]}]
+    result = format_balance(tree)
+
+    assert result[0]["balance"] == f"{11000:n}"
+    assert result[0]["children"][0]["balance"] == "(5)"
+
+
 def test_format_negative_numbers_returns_negative_number_in_parentheses():
     """It returns negative numbers in parentheses."""
     n = int(-100)
@@ -255,3 +270,49 @@ def test_period_to_dates_this_month_non_december(mock_datetime) -> None:
     mock_datetime.datetime.now.return_value = datetime.datetime(2024, 5, 15)
     result = period_to_dates("this month")
     assert result == ["2024/5/1", "2024/6/1"]
+
+
+@patch("pacioli.utils.datetime")
+def test_common_periods_in_first_quarter(mock_datetime) -> None:
+    """The last closed quarter is in the previous year during Q1."""
+    mock_datetime.datetime.now.return_value = datetime.datetime(2024, 2, 15)
+    assert common_periods() == [
+        "this month",
+        "last month",
+        "Jan to Feb",
+        "Oct 2023 to Dec 2023",
+    ]
+
+
+@patch("pacioli.utils.datetime")
+def test_common_periods_are_understood_by_period_to_dates(mock_datetime) -> None:
+    """Every common period can be converted to dates."""
+    mock_datetime.datetime.now.return_value = datetime.datetime(2024, 8, 15)
+    periods = common_periods()
+    assert periods[3] == "Apr 2024 to Jun 2024"
+    assert [period_to_dates(period) for period in periods] == [
+        ["2024/8/1", "2024/9/1"],
+        ["2024/7/1", "2024/8/1"],
+        ["2024/1/1", "2024/9/1"],
+        ["2024/4/1", "2024/7/1"],
+    ]
+
+
+def test_atomic_write_keeps_mode_of_replaced_file(tmp_path, monkeypatch):
+    """It gives new files the umask's permissions and keeps those of replaced files."""
+    monkeypatch.setattr(utils, "_umask", None)
+    umask = os.umask(0o027)
+    try:
+        atomic_write(str(tmp_path / "new.tex"), "new")
+        # Reading the umask leaves it as it was
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(umask)
+    existing = tmp_path / "existing.tex"
+    existing.write_text("old")
+    existing.chmod(0o600)
+    atomic_write(str(existing), "new")
+
+    assert stat.S_IMODE((tmp_path / "new.tex").stat().st_mode) == 0o640
+    assert stat.S_IMODE(existing.stat().st_mode) == 0o600
+    assert existing.read_text() == "new"
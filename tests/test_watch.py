@@ -0,0 +1,106 @@
+"""Tests for watch mode."""
+
+import os
+
+import jinja2
+
+from pacioli.backend import ReportBackend
+from pacioli.pacioli import LedgerError
+from pacioli.watch import Watcher
+
+
+def make_watcher(tmp_path, monkeypatch):
+    """Return a watcher whose backend renders without ledger."""
+    backend = ReportBackend(config_file="tests/resources/sample_config.yml")
+    calls = []
+
+    def mock_render(report, start_date, end_date):
+        calls.append((report, start_date, end_date))
+        return f"{report} {start_date} {end_date}"
+
+    monkeypatch.setattr(backend, "render", mock_render)
+    watcher = Watcher(
+        backend,
+        output_dir=str(tmp_path / "out"),
+        reports=["balance-sheet", "income-statement"],
+        periods=["January 2020"],
+    )
+    return watcher, calls
+
+
+def test_poll_writes_every_report_for_every_period(tmp_path, monkeypatch):
+    """It writes one file per report and period."""
+    watcher, calls = make_watcher(tmp_path, monkeypatch)
+    written = watcher.poll()
+
+    assert sorted(os.path.basename(path) for path in written) == [
+        "balance-sheet_january_2020.tex",
+        "income-statement_january_2020.tex",
+    ]
+    assert ("balance-sheet", "", "2020/2/1") in calls
+    assert ("income-statement", "2020/1/1", "2020/2/1") in calls
+    report = tmp_path / "out" / "income-statement_january_2020.tex"
+    assert report.read_text() == "income-statement 2020/1/1 2020/2/1"
+
+
+def test_poll_skips_reports_with_unchanged_inputs(tmp_path, monkeypatch):
+    """It does not re-run reports when nothing changed."""
+    watcher, calls = make_watcher(tmp_path, monkeypatch)
+    watcher.poll()
+    calls.clear()
+
+    assert watcher.poll() == []
+    assert calls == []
+
+
+def test_poll_reruns_reports_when_journal_changes(tmp_path, monkeypatch):
+    """It re-runs reports when the journal fingerprint changes."""
+    watcher, calls = make_watcher(tmp_path, monkeypatch)
+    watcher.poll()
+    calls.clear()
+
+    monkeypatch.setattr(watcher.backend.journal, "fingerprint", lambda: "changed")
+    watcher.poll()
+    assert len(calls) == 2
+
+
+def test_poll_logs_failing_reports_and_keeps_going(tmp_path, monkeypatch, caplog):
+    """It writes the other reports when one fails and retries it when inputs change."""
+    watcher, calls = make_watcher(tmp_path, monkeypatch)
+    render = watcher.backend.render
+
+    def failing_render(report, start_date, end_date):
+        if report == "balance-sheet":
+            raise LedgerError(["ledger", "bal"], 1, "Error: Unbalanced transaction")
+        return render(report, start_date, end_date)
+
+    monkeypatch.setattr(watcher.backend, "render", failing_render)
+    written = watcher.poll()
+
+    assert [os.path.basename(path) for path in written] == ["income-statement_january_2020.tex"]
+    assert "Unbalanced transaction" in caplog.text
+    # The failure isn't retried until something changes
+    calls.clear()
+    assert watcher.poll() == []
+
+    monkeypatch.setattr(watcher.backend, "render", render)
+    monkeypatch.setattr(watcher.backend.journal, "fingerprint", lambda: "fixed")
+    written = watcher.poll()
+    assert "balance-sheet_january_2020.tex" in [os.path.basename(path) for path in written]
+
+
+def test_poll_reruns_reports_when_included_templates_change(tmp_path, monkeypatch):
+    """It re-runs a report when a template its template includes changes."""
+    watcher, calls = make_watcher(tmp_path, monkeypatch)
+    watcher.reports = ["income-statement"]
+    (tmp_path / "header.tex").write_text("Acme LLC")
+    (tmp_path / "income.tex").write_text(r"\BLOCK{include 'header.tex'} \VAR{net_income}")
+    watcher.backend.balance_sheet.latex_jinja_env.loader = jinja2.FileSystemLoader(str(tmp_path))
+    watcher.backend.income_statement.template = "income.tex"
+    watcher.poll()
+    calls.clear()
+
+    assert watcher.poll() == []
+    (tmp_path / "header.tex").write_text("Acme Holdings")
+    watcher.poll()
+    assert calls == [("income-statement", "2020/1/1", "2020/2/1")]